@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from redis import Redis
+from redis.exceptions import RedisError
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+_local_versions: dict[str, int] = {}
+_local_versions_lock = threading.Lock()
+_pending_bumps: set[str] = set()
+_redis_clients: dict[str, Redis] = {}
+_shared_down_until = 0.0
+
+
+def shared_redis() -> Redis:
+    """Raw client of the shared cache's Redis, for commands beyond get/set.
+
+    Uses the same short timeouts as the ``shared`` cache, so callers can
+    treat RedisError and OSError as an outage and move on.
+    """
+    url = settings.CACHE_REDIS_URL
+    if url not in _redis_clients:
+        _redis_clients[url] = Redis.from_url(
+            url, socket_connect_timeout=0.2, socket_timeout=0.2
+        )
+    return _redis_clients[url]
+
+
+def shared_cache_call(method: str, *args, **kwargs) -> Any:
+    """Call the shared (Redis) cache, treating an outage as a miss.
+
+    After a failure the shared tier is skipped for SHARED_CACHE_RETRY
+    seconds, so an outage costs one socket timeout per interval rather
+    than one per call.
+    """
+    global _shared_down_until
+    now = time.monotonic()
+    if now < _shared_down_until:
+        return None
+    try:
+        return getattr(caches["shared"], method)(*args, **kwargs)
+    except (RedisError, OSError) as error:
+        logger.warning("Shared cache %s failed: %s", method, error)
+        _shared_down_until = now + settings.SHARED_CACHE_RETRY
+        return None
+
+
+class TieredCache:
+    """In-process LRU (the ``default`` cache) in front of ``shared``.
+
+    Local entries live at most ``local_timeout`` seconds, which bounds how
+    stale a worker can be while the shared tier is unreachable.
+    """
+
+    def __init__(self, local_timeout: int | None = None) -> None:
+        self._local_timeout = local_timeout
+
+    @property
+    def local_timeout(self) -> int:
+        return self._local_timeout or settings.LOCAL_CACHE_TIMEOUT
+
+    @property
+    def local(self):
+        return caches["default"]
+
+    def get(self, key: str) -> Any:
+        value = self.local.get(key)
+        if value is None:
+            value = shared_cache_call("get", key)
+            if value is not None:
+                self.local.set(key, value, self.local_timeout)
+        return value
+
+    def set(self, key: str, value: Any, timeout: int) -> None:
+        self.local.set(key, value, min(timeout, self.local_timeout))
+        shared_cache_call("set", key, value, timeout)
+
+    def delete(self, key: str) -> None:
+        self.local.delete(key)
+        shared_cache_call("delete", key)
+
+
+def _incr_shared_version(key: str) -> int | bool | None:
+    """Bump a shared version counter; None while Redis is unreachable"""
+    try:
+        return shared_cache_call("incr", key)
+    except ValueError:
+        # Evicted: a fresh timestamp is newer than any version stored.
+        return shared_cache_call("add", key, time.time_ns(), timeout=None)
+
+
+def get_version(namespace: str) -> str:
+    """Current cache version of ``namespace`` across all workers.
+
+    The shared counter starts at a timestamp, so a counter evicted from
+    Redis never comes back to a value older entries were stored under.
+    While Redis is unreachable the version falls back to a per-process
+    counter, seen by this worker's local tier only; bumps made then are
+    applied to the shared counter once Redis answers again.
+    """
+    key = f"{namespace}:version"
+    if namespace in _pending_bumps and _incr_shared_version(key) is not None:
+        _pending_bumps.discard(namespace)
+    shared_version = shared_cache_call("get", key)
+    if shared_version is None:
+        shared_cache_call("add", key, time.time_ns(), timeout=None)
+        shared_version = shared_cache_call("get", key)
+    if shared_version is None:
+        return f"local.{_local_versions.get(namespace, 0)}"
+    return str(shared_version)
+
+
+def bump_version(namespace: str) -> None:
+    with _local_versions_lock:
+        _local_versions[namespace] = _local_versions.get(namespace, 0) + 1
+    if _incr_shared_version(f"{namespace}:version") is None:
+        _pending_bumps.add(namespace)
+
+
+def cache_entry(data: Any) -> dict:
+    """Plain JSON copy of response data together with its strong ETag"""
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return {
+        "etag": '"%s"' % hashlib.sha1(body.encode()).hexdigest(),
+        "data": json.loads(body),
+    }
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class CachedResponseMixin:
+    """Cache successful responses of ``cached_actions`` per namespace.
+
+    Entries are keyed by host, path, query string and the namespace
+    version, so bumping the version with ``bump_version`` drops every
+    cached response at once. Responses carry a strong ETag and a
+    matching ``If-None-Match`` gets an empty 304.
+    """
+
+    cache_namespace: str
+    cached_actions = ("list", "retrieve")
+    response_cache = TieredCache()
+
+    def _cache_key(self, request: Request) -> str:
+        query_string = request.META.get("QUERY_STRING", "")
+        query = "&".join(sorted(query_string.split("&")))
+        raw = f"{request.get_host()}{request.path}?{query}"
+        digest = hashlib.sha1(raw.encode()).hexdigest()
+        version = get_version(self.cache_namespace)
+        return f"{self.cache_namespace}:{version}:{self.action}:{digest}"
+
+    def cached_response(
+        self, request: Request, build: Callable[[], Response]
+    ) -> Response:
+        key = self._cache_key(request)
+        entry = self.response_cache.get(key)
+        if entry is None:
+            response = build()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = cache_entry(response.data)
+            self.response_cache.set(
+                key, entry, settings.RESPONSE_CACHE_TIMEOUT
+            )
+        if etag_matches(request, entry["etag"]):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": entry["etag"]},
+            )
+        return Response(entry["data"], headers={"ETag": entry["etag"]})
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        build = super().list
+        if "list" not in self.cached_actions:
+            return build(request, *args, **kwargs)
+        return self.cached_response(
+            request, lambda: build(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        build = super().retrieve
+        if "retrieve" not in self.cached_actions:
+            return build(request, *args, **kwargs)
+        return self.cached_response(
+            request, lambda: build(request, *args, **kwargs)
+        )
@@ -0,0 +1,127 @@
+from collections import OrderedDict
+
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    PageNumberPagination,
+)
+from rest_framework.response import Response
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 10
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination on the primary key.
+
+    Every page is a range scan starting after the last id seen, so deep
+    pages cost the same as the first one. The total count is only
+    computed when asked for with ``?count=true``.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = "id"
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) in (
+            "1", "true", "True"
+        ):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data) -> Response:
+        response = OrderedDict()
+        if self.count is not None:
+            response["count"] = self.count
+        response["next"] = self.get_next_link()
+        response["previous"] = self.get_previous_link()
+        response["results"] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"] = {
+            "count": {"type": "integer", "example": 123},
+            **response_schema["properties"],
+        }
+        return response_schema
+
+
+class OptInKeysetPagination(BasePagination):
+    """Keep the existing pagination unless the client asks for a cursor.
+
+    Clients opt in with ``?pagination=cursor``; the cursor links carry the
+    flag along. Without it requests are served by ``fallback_class``, or
+    left unpaginated when there is none.
+    """
+
+    fallback_class = None
+    keyset_class = KeysetPagination
+    mode_query_param = "pagination"
+
+    def __init__(self) -> None:
+        self.delegate = None
+
+    def wants_keyset(self, request) -> bool:
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.wants_keyset(request):
+            self.delegate = self.keyset_class()
+        elif self.fallback_class is not None:
+            self.delegate = self.fallback_class()
+        else:
+            self.delegate = None
+            return None
+        return self.delegate.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data) -> Response:
+        return self.delegate.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        if self.fallback_class is None:
+            return schema
+        return self.fallback_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view) -> list:
+        parameters = [
+            {
+                "name": self.mode_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Set to \"cursor\" for keyset pagination",
+                "schema": {"type": "string", "enum": ["cursor"]},
+            },
+            {
+                "name": self.keyset_class.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Include the total count in cursor pages",
+                "schema": {"type": "boolean"},
+            },
+        ]
+        parameters += self.keyset_class().get_schema_operation_parameters(
+            view
+        )
+        if self.fallback_class is not None:
+            fallback = self.fallback_class()
+            parameters += [
+                parameter
+                for parameter in fallback.get_schema_operation_parameters(view)
+                if parameter["name"] not in {p["name"] for p in parameters}
+            ]
+        return parameters
+
+
+class StandardOrKeysetPagination(OptInKeysetPagination):
+    fallback_class = StandardResultsSetPagination
@@ -15,6 +15,8 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 
+from Library_Service_Project.database import database_from_env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -61,6 +63,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "Library_Service_Project.throttling.RateLimitHeadersMiddleware",
 ]
 
 ROOT_URLCONF = "Library_Service_Project.urls"
@@ -87,11 +90,22 @@ WSGI_APPLICATION = "Library_Service_Project.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DATABASE_URL selects the database, e.g.
+# postgres://library:secret@db:5432/library. PostgreSQL connections are
+# kept for DB_CONN_MAX_AGE seconds (60) and checked before reuse unless
+# DB_CONN_HEALTH_CHECKS=false; DB_PGBOUNCER=true (or pgbouncer://) suits
+# transaction pooling. Without it the SQLite file below is used, tuned
+# with SQLITE_PRAGMAS on every connection when SQLITE_PROFILE=true.
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+    "default": database_from_env(BASE_DIR / "db.sqlite3")
+}
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    # Negative sizes are in KiB: 64 MiB of page cache per connection.
+    "cache_size": -64 * 1024,
+    "busy_timeout": 5000,
 }
 
 INTERNAL_IPS = [
@@ -147,29 +161,151 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # Token buckets of Library_Service_Project.throttling: "10/min" is a
+    # burst of 10 refilled at one request every 6 seconds.
+    "DEFAULT_THROTTLE_RATES": {
+        "borrow": "30/min",
+        "return": "60/min",
+        "token": "10/min",
+    },
+    # Proxies in front of the app whose X-Forwarded-For hop is trusted.
+    # At 0, throttles key clients on REMOTE_ADDR and ignore the header,
+    # which any client can set.
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", "0")),
 }
+# Seconds throttles use per-process buckets after Redis fails.
+THROTTLE_REDIS_RETRY = 5
 
 SIMPLE_JWT = {
     "AUTH_HEADER_NAME": "HTTP_AUTHORIZE",
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=300),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
+    "TOKEN_REFRESH_SERIALIZER": (
+        "users.serializers.RevocableTokenRefreshSerializer"
+    ),
+    "TOKEN_VERIFY_SERIALIZER": (
+        "users.serializers.RevocableTokenVerifySerializer"
+    ),
 }
+# Revoked token ids are kept in Redis ("redis") or, for a single process,
+# in memory ("local"). Each worker checks tokens against a Bloom filter
+# of them synced every JWT_REVOCATION_SYNC_INTERVAL seconds.
+JWT_REVOCATION_STORE = os.environ.get("JWT_REVOCATION_STORE", "redis")
+JWT_REVOCATION_SYNC_INTERVAL = 5
+JWT_REVOCATION_FILTER_CAPACITY = 100_000
+JWT_REVOCATION_FILTER_ERROR_RATE = 0.001
 
 CELERY_TIMEZONE = "Europe/Kiev"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
-CELERY_BROKER_URL = "redis://localhost:6379"
-CELERY_RESULT_BACKEND = "redis://localhost:6379"
+# Load tests can point both at "memory://" and "cache+memory://".
+CELERY_BROKER_URL = os.environ.get(
+    "CELERY_BROKER_URL", "redis://localhost:6379"
+)
+CELERY_RESULT_BACKEND = os.environ.get(
+    "CELERY_RESULT_BACKEND", "redis://localhost:6379"
+)
+CELERY_BEAT_SCHEDULE = {
+    "flush-notifications": {
+        "task": "borrowings.tasks.flush_notifications",
+        "schedule": 60.0,
+    },
+    "apply-stripe-events": {
+        "task": "borrowings.tasks.apply_stripe_events",
+        "schedule": 60.0,
+    },
+    # Catches payments whose webhook never arrived.
+    "reconcile-stripe-payments": {
+        "task": "borrowings.tasks.reconcile_stripe_payments",
+        "schedule": 15 * 60.0,
+    },
+    "prune-notifications": {
+        "task": "borrowings.tasks.prune_notifications",
+        "schedule": 24 * 60 * 60.0,
+    },
+}
+
+# Telegram notifications are queued and sent by a Celery worker in batches.
+TELEGRAM_BATCH_WINDOW = 5
+# Seconds between two messages to one chat. The last send time is kept
+# in process memory, so the gap holds per worker process only; run the
+# notification queue on a single worker to hold it overall.
+TELEGRAM_CHAT_MIN_INTERVAL = 1.0
+# A notification that failed this many deliveries is marked failed.
+TELEGRAM_MAX_ATTEMPTS = 5
+# Delivered notifications are deleted once they are this old.
+NOTIFICATION_RETENTION = timedelta(days=7)
+
+# Shared keep-alive clients for outbound integrations. Timeouts are
+# (connect, read) seconds; the breaker opens after failure_threshold
+# consecutive failures and probes again after reset_timeout seconds.
+OUTBOUND_HTTP = {
+    "stripe": {
+        "timeout": (3.05, 20),
+        "pool_size": 10,
+        "failure_threshold": 5,
+        "reset_timeout": 30,
+    },
+    "telegram": {
+        "timeout": (3.05, 10),
+        "pool_size": 4,
+        "failure_threshold": 5,
+        "reset_timeout": 30,
+    },
+}
+
+# "default" is a per-process LRU, "shared" is Redis and sees every worker.
+# Reads go through Library_Service_Project.cache.TieredCache, which falls
+# back to the local tier when Redis is unreachable.
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/1")
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": CACHE_REDIS_URL,
+        "OPTIONS": {
+            "socket_connect_timeout": 0.2,
+            "socket_timeout": 0.2,
+        },
+    },
+}
+LOCAL_CACHE_TIMEOUT = 60
+# Seconds the shared tier is skipped after Redis fails.
+SHARED_CACHE_RETRY = 5
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+# Users resolved from JWTs; a change reaches other workers' local copies
+# within AUTH_USER_LOCAL_CACHE_TIMEOUT seconds.
+AUTH_USER_CACHE_TIMEOUT = 5 * 60
+AUTH_USER_LOCAL_CACHE_TIMEOUT = 10
 
 STRIPE_PUBLISHABLE_KEY = os.environ.get("STRIPE_PUBLISHABLE_KEY")
 STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY")
+# Point both at `manage.py run_fake_remotes` to load-test offline.
+STRIPE_API_BASE = os.environ.get("STRIPE_API_BASE", "https://api.stripe.com")
+TELEGRAM_API_BASE = os.environ.get(
+    "TELEGRAM_API_BASE", "https://api.telegram.org"
+)
+# Webhooks are refused with 503 until this is set.
+STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET", "")
+# Seconds a signed webhook stays valid, against replayed requests.
+STRIPE_WEBHOOK_TOLERANCE = 300
+# Webhook events received within this many seconds are applied together.
+STRIPE_EVENT_BATCH_WINDOW = 2
+# Sessions live for 24 hours, so reconciling the sessions created in the
+# last 25 covers every one that can still change. A run lists at most
+# STRIPE_RECONCILE_MAX_PAGES pages of 100 sessions.
+STRIPE_RECONCILE_WINDOW = timedelta(hours=25)
+STRIPE_RECONCILE_MAX_PAGES = 1000
 
 SPECTACULAR_SETTINGS = {
     "TITLE": "Library Service API",
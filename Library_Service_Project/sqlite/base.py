@@ -0,0 +1,18 @@
+from django.db.backends.signals import connection_created
+from django.db.backends.sqlite3 import base
+
+from Library_Service_Project.sqlite import apply_profile
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Set by write_atomic() for the transaction it is about to begin.
+    begin_immediate = False
+
+    def _start_transaction_under_autocommit(self) -> None:
+        if self.begin_immediate:
+            self.cursor().execute("BEGIN IMMEDIATE")
+        else:
+            super()._start_transaction_under_autocommit()
+
+
+connection_created.connect(apply_profile, sender=DatabaseWrapper)
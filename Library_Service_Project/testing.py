@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Test case mixin failing when a block runs more queries than allowed.
+
+    Unlike ``assertNumQueries`` the budget is an upper bound, so an
+    endpoint may get cheaper without its test being touched, and the
+    failure lists every query that ran.
+    """
+
+    @contextmanager
+    def assertQueryBudget(
+        self, budget: int, using: str = DEFAULT_DB_ALIAS
+    ) -> Iterator[CaptureQueriesContext]:
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = "\n".join(
+                f"{number}. {query['sql']}"
+                for number, query in enumerate(context.captured_queries, 1)
+            )
+            self.fail(
+                f"{executed} queries executed, the budget is {budget}:"
+                f"\n{queries}"
+            )
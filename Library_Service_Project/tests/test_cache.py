@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from redis.exceptions import ConnectionError
+
+from Library_Service_Project import cache
+from Library_Service_Project.cache import (
+    TieredCache,
+    bump_version,
+    get_version,
+)
+
+
+@override_settings(SHARED_CACHE_RETRY=60)
+class SharedCacheOutageTests(SimpleTestCase):
+    def setUp(self):
+        cache._shared_down_until = 0.0
+        self.addCleanup(setattr, cache, "_shared_down_until", 0.0)
+        caches["default"].clear()
+
+    def test_outage_costs_one_call_per_interval(self):
+        tiered = TieredCache()
+
+        with mock.patch.object(
+            caches["shared"], "get", side_effect=ConnectionError("down")
+        ) as shared_get:
+            self.assertIsNone(tiered.get("a"))
+            self.assertIsNone(tiered.get("b"))
+            tiered.set("c", 1, 60)
+
+        shared_get.assert_called_once()
+        self.assertEqual(tiered.get("c"), 1)
+
+    def test_shared_tier_retried_after_interval(self):
+        with mock.patch.object(
+            caches["shared"], "get", side_effect=ConnectionError("down")
+        ):
+            TieredCache().get("a")
+        cache._shared_down_until = 0.0
+
+        with mock.patch.object(
+            caches["shared"], "get", return_value="shared"
+        ) as shared_get:
+            self.assertEqual(TieredCache().get("a"), "shared")
+
+        shared_get.assert_called_once()
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "local",
+        },
+        "shared": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "shared",
+        },
+    }
+)
+class CacheVersionTests(SimpleTestCase):
+    def setUp(self):
+        cache._shared_down_until = 0.0
+        cache._local_versions.clear()
+        cache._pending_bumps.clear()
+        caches["shared"].clear()
+
+    def test_workers_with_different_write_counts_share_versions(self):
+        bump_version("books")
+        bump_version("books")
+        writer_version = get_version("books")
+
+        # Another worker, whose process saw none of these writes.
+        cache._local_versions.clear()
+
+        self.assertEqual(get_version("books"), writer_version)
+
+    def test_bumps_during_outage_reach_shared_counter(self):
+        before = get_version("books")
+        with mock.patch.object(
+            caches["shared"], "incr", side_effect=ConnectionError("down")
+        ):
+            bump_version("books")
+        self.assertEqual(get_version("books"), "local.1")
+
+        cache._shared_down_until = 0.0
+        after = get_version("books")
+
+        self.assertNotEqual(after, before)
+        self.assertFalse(after.startswith("local."))
+        self.assertEqual(get_version("books"), after)
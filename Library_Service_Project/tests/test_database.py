@@ -0,0 +1,82 @@
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from Library_Service_Project.database import (
+    database_config,
+    database_from_env,
+)
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    def test_postgres_url_keeps_connections(self):
+        config = database_config(
+            "postgres://library:p%40ss@db:5432/library?sslmode=require"
+        )
+
+        self.assertEqual(
+            config,
+            {
+                "ENGINE": "django.db.backends.postgresql",
+                "NAME": "library",
+                "USER": "library",
+                "PASSWORD": "p@ss",
+                "HOST": "db",
+                "PORT": "5432",
+                "CONN_MAX_AGE": 60,
+                "CONN_HEALTH_CHECKS": True,
+                "OPTIONS": {"sslmode": "require"},
+            },
+        )
+
+    def test_pgbouncer_disables_server_side_cursors(self):
+        config = database_config("pgbouncer://library@pool:6432/library")
+
+        self.assertEqual(config["ENGINE"], "django.db.backends.postgresql")
+        self.assertTrue(config["DISABLE_SERVER_SIDE_CURSORS"])
+
+    def test_sqlite_paths(self):
+        self.assertEqual(
+            database_config("sqlite:////srv/db.sqlite3")["NAME"],
+            Path("/srv/db.sqlite3"),
+        )
+        self.assertEqual(database_config("sqlite://")["NAME"], ":memory:")
+        self.assertEqual(database_config("sqlite://")["CONN_MAX_AGE"], 0)
+
+    def test_sqlite_options_keep_their_types(self):
+        config = database_config(
+            "sqlite:///db.sqlite3?timeout=20&check_same_thread=false"
+        )
+
+        self.assertEqual(
+            config["OPTIONS"], {"timeout": 20, "check_same_thread": False}
+        )
+
+    def test_default_sqlite_path_is_not_parsed_as_url(self):
+        path = Path("/srv/checkout #2?/50%/db.sqlite3")
+
+        environ = {"DATABASE_URL": "", "SQLITE_PROFILE": "true"}
+        with mock.patch.dict("os.environ", environ):
+            config = database_from_env(path)
+
+        self.assertEqual(config["NAME"], path)
+        self.assertEqual(config["ENGINE"], "Library_Service_Project.sqlite")
+
+    def test_unknown_scheme_rejected(self):
+        with self.assertRaises(ValueError):
+            database_config("mysql://db/library")
+
+    def test_environment_knobs(self):
+        environ = {
+            "DATABASE_URL": "postgres://db/library",
+            "DB_CONN_MAX_AGE": "0",
+            "DB_CONN_HEALTH_CHECKS": "false",
+            "DB_PGBOUNCER": "true",
+        }
+        with mock.patch.dict("os.environ", environ):
+            config = database_from_env(Path("db.sqlite3"))
+
+        self.assertEqual(config["CONN_MAX_AGE"], 0)
+        self.assertFalse(config["CONN_HEALTH_CHECKS"])
+        self.assertTrue(config["DISABLE_SERVER_SIDE_CURSORS"])
@@ -0,0 +1,65 @@
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from django.db import connections, transaction
+from django.test import SimpleTestCase
+
+from Library_Service_Project.database import database_config
+from Library_Service_Project.sqlite import write_atomic
+from Library_Service_Project.sqlite.base import DatabaseWrapper
+
+ALIAS = "tuned_sqlite"
+
+
+class TunedSQLiteTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "db.sqlite3"
+        # Filled with the defaults Django adds to every DATABASES entry.
+        config = connections.configure_settings(
+            {
+                "default": {},
+                ALIAS: database_config(
+                    f"sqlite:///{self.path}", sqlite_profile=True
+                ),
+            }
+        )[ALIAS]
+        self.connection = DatabaseWrapper(config, ALIAS)
+        connections[ALIAS] = self.connection
+        self.addCleanup(connections.__delitem__, ALIAS)
+        self.addCleanup(self.connection.close)
+
+    def other_writer(self) -> sqlite3.Connection:
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        return other
+
+    def test_profile_applied_to_new_connections(self):
+        with self.connection.cursor() as cursor:
+            pragmas = {
+                name: cursor.execute(f"PRAGMA {name}").fetchone()[0]
+                for name in ("journal_mode", "synchronous", "busy_timeout")
+            }
+
+        self.assertEqual(
+            pragmas,
+            {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000},
+        )
+
+    def test_write_atomic_takes_write_lock_up_front(self):
+        other = self.other_writer()
+
+        with transaction.atomic(using=ALIAS):
+            other.execute("BEGIN IMMEDIATE")
+            other.execute("ROLLBACK")
+        with write_atomic(using=ALIAS):
+            with self.assertRaisesMessage(
+                sqlite3.OperationalError, "database is locked"
+            ):
+                other.execute("BEGIN IMMEDIATE")
+
+        other.execute("BEGIN IMMEDIATE")
+        other.execute("ROLLBACK")
+        self.assertFalse(self.connection.begin_immediate)
@@ -0,0 +1,190 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from redis.commands.core import Script
+from redis.exceptions import RedisError
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from Library_Service_Project.cache import shared_redis
+
+logger = logging.getLogger(__name__)
+
+# Refills the bucket for the time since the last request, then takes one
+# token if there is one. Returns whether it did and the tokens left.
+TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+local refilled = math.max(0, now - updated_at) * refill_rate
+tokens = math.min(capacity, tokens + refilled)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call(
+    "HSET", KEYS[1], "tokens", tostring(tokens), "updated_at", tostring(now)
+)
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity / refill_rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+MAX_LOCAL_BUCKETS = 10_000
+
+
+class LocalBuckets:
+    """Buckets of this process, used while Redis is unreachable"""
+
+    def __init__(self, max_entries: int = MAX_LOCAL_BUCKETS) -> None:
+        self.max_entries = max_entries
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(
+        self, key: str, capacity: int, refill_rate: float, now: float
+    ) -> tuple[bool, float]:
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(
+                capacity, tokens + max(0.0, now - updated_at) * refill_rate
+            )
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+local_buckets = LocalBuckets()
+_scripts: dict[str, Script] = {}
+_redis_down_until = 0.0
+
+
+def _take_token_script() -> Script:
+    """TAKE_TOKEN_SCRIPT bound to the current shared Redis client"""
+    url = settings.CACHE_REDIS_URL
+    if url not in _scripts:
+        _scripts[url] = shared_redis().register_script(TAKE_TOKEN_SCRIPT)
+    return _scripts[url]
+
+
+def take_token(
+    key: str, capacity: int, refill_rate: float
+) -> tuple[bool, float]:
+    """Take a token from the shared bucket ``key`` in one atomic step.
+
+    Falls back to ``local_buckets`` for ``THROTTLE_REDIS_RETRY`` seconds
+    after Redis fails, so an outage neither blocks nor slows requests.
+    """
+    global _redis_down_until
+    now = time.time()
+    if now >= _redis_down_until:
+        try:
+            allowed, tokens = _take_token_script()(
+                keys=[key], args=[capacity, refill_rate, now]
+            )
+            return bool(allowed), float(tokens)
+        except (RedisError, OSError) as error:
+            logger.warning("Throttle falls back to local buckets: %s", error)
+            _redis_down_until = now + settings.THROTTLE_REDIS_RETRY
+    return local_buckets.take(key, capacity, refill_rate, now)
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Token bucket holding ``rate`` requests, refilled evenly over it.
+
+    "10/min" allows a burst of 10 requests and one more every 6 seconds.
+    Rates come from ``DEFAULT_THROTTLE_RATES`` under the ``scope`` of the
+    subclass; a scope set to None is not throttled. The bucket state is
+    shared by every worker through Redis.
+    """
+
+    cache_format = "throttle:%(scope)s:%(ident)s"
+
+    def get_rate(self) -> str | None:
+        # Read on every request, so overriding REST_FRAMEWORK applies.
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request: Request, view) -> bool:
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        self.refill_rate = self.num_requests / self.duration
+        allowed, self.tokens = take_token(
+            key, self.num_requests, self.refill_rate
+        )
+        record_rate_limit(
+            request._request,
+            limit=self.num_requests,
+            remaining=int(self.tokens),
+            reset=math.ceil(
+                (self.num_requests - self.tokens) / self.refill_rate
+            ),
+            policy=f"{self.num_requests};w={self.duration}",
+        )
+        return allowed
+
+    def wait(self) -> float:
+        return (1 - self.tokens) / self.refill_rate
+
+
+class UserBucketThrottle(TokenBucketThrottle):
+    """Bucket per authenticated user, per client IP for anonymous ones"""
+
+    def get_cache_key(self, request: Request, view) -> str:
+        if request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class IPBucketThrottle(TokenBucketThrottle):
+    """Bucket per client IP, whoever is logged in"""
+
+    def get_cache_key(self, request: Request, view) -> str:
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": f"ip:{self.get_ident(request)}",
+        }
+
+
+def record_rate_limit(request: HttpRequest, **limit) -> None:
+    """Keep the most restrictive limit checked for the response headers"""
+    current = getattr(request, "rate_limit", None)
+    if current is None or limit["remaining"] < current["remaining"]:
+        request.rate_limit = limit
+
+
+class RateLimitHeadersMiddleware:
+    """Send the limit a throttle checked as RateLimit-* headers"""
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        response = self.get_response(request)
+        limit = getattr(request, "rate_limit", None)
+        if limit is not None:
+            response["RateLimit-Limit"] = limit["limit"]
+            response["RateLimit-Remaining"] = limit["remaining"]
+            response["RateLimit-Reset"] = limit["reset"]
+            response["RateLimit-Policy"] = limit["policy"]
+        return response
@@ -0,0 +1,16 @@
+from django.db import transaction
+
+from Library_Service_Project.cache import bump_version
+
+CATALOG_NAMESPACE = "books"
+
+
+def catalog_changed() -> None:
+    """Drop cached catalog responses after a change to Books.
+
+    The version is bumped right away for this process and again once the
+    transaction commits, so no worker caches a response built from data
+    that was read before the commit became visible.
+    """
+    bump_version(CATALOG_NAMESPACE)
+    transaction.on_commit(lambda: bump_version(CATALOG_NAMESPACE))
@@ -0,0 +1,198 @@
+import csv
+import itertools
+import json
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+from django.db import connection, transaction
+from rest_framework import serializers
+
+from books.cache import catalog_changed
+from books.models import Books
+from books.serializers import BooksSerializer
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+UPDATE_FIELDS = ("cover", "inventory", "daily_fee")
+
+FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: list[dict] = field(default_factory=list)
+
+    def add_error(self, line: int, detail) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": detail})
+
+    def as_dict(self) -> dict:
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[tuple[int, dict | None]]:
+    reader = csv.DictReader(lines)
+    for row in reader:
+        if None in row:
+            yield reader.line_num, None
+            continue
+        # Empty cells fall back to the model defaults, as omitted keys do.
+        yield reader.line_num, {
+            name.strip(): value
+            for name, value in row.items()
+            if value not in (None, "")
+        }
+
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[tuple[int, dict | None]]:
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+def read_rows(
+    lines: Iterable[str], format_: str
+) -> Iterator[tuple[int, dict | None]]:
+    """Parse ``lines`` lazily into (line number, row) pairs.
+
+    Rows that cannot be parsed come out as None so the caller can report
+    them and carry on with the rest of the file.
+    """
+    try:
+        reader = READERS[format_]
+    except KeyError:
+        raise ImportFormatError(f"Unsupported import format: {format_}")
+    return reader(lines)
+
+
+def decode_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Decode a body read line by line, which must be UTF-8"""
+    for line_number, chunk in enumerate(chunks, start=1):
+        try:
+            yield chunk.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ImportFormatError(
+                f"Line {line_number} is not valid UTF-8; the rows before"
+                " it were imported."
+            )
+
+
+def _update_books(books: list[Books]) -> None:
+    """UPDATE ``books`` by primary key with one executemany call.
+
+    QuerySet.bulk_update builds a CASE expression per field and row,
+    which costs more than the import itself on large batches.
+    """
+    if not books:
+        return
+    quote = connection.ops.quote_name
+    fields = [Books._meta.get_field(name) for name in UPDATE_FIELDS]
+    assignments = ", ".join(f"{quote(field.column)} = %s" for field in fields)
+    sql = (
+        f"UPDATE {quote(Books._meta.db_table)} SET {assignments}"
+        f" WHERE {quote(Books._meta.pk.column)} = %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            sql,
+            [
+                [
+                    field.get_db_prep_save(
+                        getattr(book, field.attname), connection
+                    )
+                    for field in fields
+                ]
+                + [book.pk]
+                for book in books
+            ],
+        )
+
+
+def _save_batch(rows: list[tuple[int, dict]], report: ImportReport) -> None:
+    """Upsert one batch of validated rows on (title, author).
+
+    The batch is matched against the catalog with a single query on the
+    titles it contains; new books go into one bulk INSERT and known ones
+    into one bulk UPDATE. A key repeated within the batch keeps its last
+    row.
+    """
+    by_key = {(data["title"], data["author"]): data for _, data in rows}
+    existing = {}
+    for book in Books.objects.filter(
+        title__in={title for title, _ in by_key}
+    ).order_by("-id"):
+        existing[(book.title, book.author)] = book
+
+    to_create, to_update = [], []
+    for key, data in by_key.items():
+        book = existing.get(key)
+        if book is None:
+            to_create.append(Books(**data))
+            continue
+        for name in UPDATE_FIELDS:
+            if name in data:
+                setattr(book, name, data[name])
+        to_update.append(book)
+
+    with transaction.atomic():
+        Books.objects.bulk_create(to_create)
+        _update_books(to_update)
+        catalog_changed()
+    report.created += len(to_create)
+    report.updated += len(to_update)
+
+
+def import_books(
+    rows: Iterable[tuple[int, dict | None]],
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> ImportReport:
+    """Validate and upsert ``rows`` batch by batch.
+
+    Every row goes through BooksSerializer validation, but invalid rows
+    only end up in the report. Memory use is bounded by ``batch_size``
+    whatever the size of the input.
+    """
+    report = ImportReport()
+    # One bound serializer is reused for all rows: building its fields is
+    # most of the cost of instantiating a serializer per row.
+    serializer = BooksSerializer()
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, batch_size)):
+        valid = []
+        for line, row in batch:
+            if row is None:
+                report.add_error(line, ["Malformed row."])
+                continue
+            try:
+                valid.append((line, serializer.run_validation(row)))
+            except serializers.ValidationError as error:
+                report.add_error(line, error.detail)
+        if valid:
+            _save_batch(valid, report)
+    return report
@@ -0,0 +1,96 @@
+import itertools
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from books.models import Books
+from books.search import get_search_backend
+
+SYLLABLES = (
+    "ka ri mo ten la vor shi an del qu ber ion mar sel tor ve na gra"
+    " lin os pe dru hal ce fi zom rak ul"
+).split()
+BENCH_AUTHOR_PREFIX = "Bench Author"
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the catalog with synthetic titles and report search and"
+        " autocomplete latency. The synthetic rows are removed afterwards."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options) -> None:
+        rng = random.Random(options["seed"])
+        self.words = sorted(
+            {
+                "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+                for _ in range(50_000)
+            }
+        )
+        # Zipf-like weights: a few very common words, a long tail.
+        self.weights = list(
+            itertools.accumulate(
+                1 / rank for rank in range(1, len(self.words) + 1)
+            )
+        )
+        started = time.perf_counter()
+        self._populate(options["rows"], rng)
+        self.stdout.write(
+            f"inserted {options['rows']} books"
+            f" in {time.perf_counter() - started:.1f}s"
+        )
+
+        backend = get_search_backend()
+        try:
+            for name, run in (
+                ("search", lambda: backend.search(self._query(rng, 2))),
+                (
+                    "autocomplete",
+                    lambda: backend.autocomplete(self._query(rng, 1)[:4]),
+                ),
+            ):
+                timings = []
+                for _ in range(options["queries"]):
+                    began = time.perf_counter()
+                    run()
+                    timings.append((time.perf_counter() - began) * 1000)
+                timings.sort()
+                self.stdout.write(
+                    f"{name}: p50={statistics.median(timings):.2f}ms"
+                    f" p95={timings[int(len(timings) * 0.95) - 1]:.2f}ms"
+                    f" max={timings[-1]:.2f}ms"
+                )
+        finally:
+            Books.objects.filter(
+                author__startswith=BENCH_AUTHOR_PREFIX
+            ).delete()
+
+    def _query(self, rng: random.Random, words: int) -> str:
+        return " ".join(
+            rng.choices(self.words, cum_weights=self.weights, k=words)
+        )
+
+    def _populate(self, rows: int, rng: random.Random) -> None:
+        batch = []
+        with transaction.atomic():
+            for number in range(rows):
+                batch.append(
+                    Books(
+                        title=self._query(rng, 4).title(),
+                        author=f"{BENCH_AUTHOR_PREFIX} {number % 5000}",
+                        inventory=1,
+                        daily_fee=1,
+                    )
+                )
+                if len(batch) == 5000:
+                    Books.objects.bulk_create(batch)
+                    batch = []
+            Books.objects.bulk_create(batch)
@@ -0,0 +1,55 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.importer import IMPORT_BATCH_SIZE, import_books, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update books from a CSV or NDJSON file, matching rows"
+        " on title and author. Invalid rows are reported and skipped."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("path", type=Path)
+        parser.add_argument(
+            "--format",
+            choices=("csv", "ndjson"),
+            help="defaults to the file extension",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=IMPORT_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options) -> None:
+        path = options["path"]
+        format_ = options["format"] or path.suffix.lstrip(".").lower()
+        if format_ == "jsonl":
+            format_ = "ndjson"
+        if format_ not in ("csv", "ndjson"):
+            raise CommandError(
+                f"Cannot tell the format of {path}, pass --format"
+            )
+
+        started = time.perf_counter()
+        try:
+            with path.open(encoding="utf-8-sig", newline="") as lines:
+                report = import_books(
+                    read_rows(lines, format_), options["batch_size"]
+                )
+        except UnicodeDecodeError as error:
+            raise CommandError(f"{path} is not valid UTF-8: {error}")
+
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if report.failed > len(report.errors):
+            self.stderr.write(
+                f"... {report.failed - len(report.errors)} more errors"
+            )
+        self.stdout.write(
+            f"created {report.created}, updated {report.updated},"
+            f" failed {report.failed}"
+            f" in {time.perf_counter() - started:.1f}s"
+        )
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.5 on 2026-10-18 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("books", "0003_alter_books_inventory"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="books",
+            constraint=models.CheckConstraint(
+                check=models.Q(("inventory__gte", 0)),
+                name="books_inventory_non_negative",
+            ),
+        ),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE books_fts USING fts5("
+    " title, author,"
+    " content='books_books', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6')",
+    "CREATE TRIGGER books_fts_ai AFTER INSERT ON books_books BEGIN"
+    " INSERT INTO books_fts(rowid, title, author)"
+    " VALUES (new.id, new.title, new.author);"
+    " END",
+    "CREATE TRIGGER books_fts_ad AFTER DELETE ON books_books BEGIN"
+    " INSERT INTO books_fts(books_fts, rowid, title, author)"
+    " VALUES ('delete', old.id, old.title, old.author);"
+    " END",
+    "CREATE TRIGGER books_fts_au AFTER UPDATE OF title, author"
+    " ON books_books BEGIN"
+    " INSERT INTO books_fts(books_fts, rowid, title, author)"
+    " VALUES ('delete', old.id, old.title, old.author);"
+    " INSERT INTO books_fts(rowid, title, author)"
+    " VALUES (new.id, new.title, new.author);"
+    " END",
+    "INSERT INTO books_fts(books_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS books_fts_au",
+    "DROP TRIGGER IF EXISTS books_fts_ad",
+    "DROP TRIGGER IF EXISTS books_fts_ai",
+    "DROP TABLE IF EXISTS books_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX books_search_idx ON books_books USING GIN (("
+    "setweight(to_tsvector('simple', title), 'A')"
+    " || setweight(to_tsvector('simple', author), 'B')))",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS books_search_idx",
+]
+
+
+def run_for_vendor(statements: dict):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("books", "0004_books_inventory_non_negative"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(
+                {"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}
+            ),
+            run_for_vendor(
+                {"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD}
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-18 05:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("books", "0005_books_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="books",
+            index=models.Index(
+                fields=["title", "author"], name="books_title_author_idx"
+            ),
+        ),
+    ]
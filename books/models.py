@@ -1,4 +1,65 @@
 from django.db import models
+from django.db.models import Case, F, Q, Value, When
+
+from books.cache import catalog_changed
+
+
+class BooksQuerySet(models.QuerySet):
+    # Queryset updates skip post_save, so they drop cached catalog
+    # responses themselves.
+
+    def take_copy(self, book_id: int) -> bool:
+        """Decrement inventory in one statement if a copy is available"""
+        taken = bool(
+            self.filter(pk=book_id, inventory__gt=0).update(
+                inventory=F("inventory") - 1
+            )
+        )
+        if taken:
+            catalog_changed()
+        return taken
+
+    def take_copies(self, copies: dict[int, int]) -> bool:
+        """Take ``copies[book_id]`` copies of each book, all or nothing.
+
+        One conditional UPDATE decrements every book that has enough
+        copies left; unless that is all of them the caller must roll the
+        transaction back.
+        """
+        if not copies:
+            return True
+        taken = Case(
+            *[
+                When(pk=book_id, then=Value(count))
+                for book_id, count in copies.items()
+            ],
+            output_field=models.IntegerField(),
+        )
+        updated = self.filter(pk__in=copies, inventory__gte=taken).update(
+            inventory=F("inventory") - taken
+        )
+        catalog_changed()
+        return updated == len(copies)
+
+    def return_copy(self, book_id: int) -> None:
+        self.filter(pk=book_id).update(inventory=F("inventory") + 1)
+        catalog_changed()
+
+    def return_copies(self, copies: dict[int, int]) -> None:
+        """Put back ``copies[book_id]`` copies of each book in one UPDATE"""
+        if not copies:
+            return
+        returned = Case(
+            *[
+                When(pk=book_id, then=Value(count))
+                for book_id, count in copies.items()
+            ],
+            output_field=models.IntegerField(),
+        )
+        self.filter(pk__in=copies).update(
+            inventory=F("inventory") + returned
+        )
+        catalog_changed()
 
 
 class Books(models.Model):
@@ -16,5 +77,21 @@ class Books(models.Model):
     inventory = models.IntegerField()
     daily_fee = models.DecimalField(max_digits=8, decimal_places=2)
 
+    objects = BooksQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Natural key used to match rows in bulk imports.
+            models.Index(
+                fields=("title", "author"), name="books_title_author_idx"
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=Q(inventory__gte=0),
+                name="books_inventory_non_negative",
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"{self.title}, Author: {self.author}"
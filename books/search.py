@@ -0,0 +1,134 @@
+import re
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, QuerySet, Value, When
+
+from books.models import Books
+
+SEARCH_MAX_RESULTS = 50
+AUTOCOMPLETE_MAX_RESULTS = 10
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(query: str) -> list[str]:
+    """Split user input into index terms, dropping query-syntax characters"""
+    return _TOKEN.findall(query.lower())[:10]
+
+
+class SearchBackend:
+    """Ranked lookups over Books.title and Books.author.
+
+    ``search`` matches books containing every term; ``autocomplete``
+    treats the last term as a prefix so suggestions keep up while the
+    user types.
+    """
+
+    def ranked_ids(
+        self, terms: list[str], limit: int, prefix: bool
+    ) -> list[int]:
+        raise NotImplementedError
+
+    def search(self, query: str, limit: int = SEARCH_MAX_RESULTS) -> list[int]:
+        terms = tokenize(query)
+        if not terms:
+            return []
+        return self.ranked_ids(terms, limit, prefix=False)
+
+    def autocomplete(
+        self, query: str, limit: int = AUTOCOMPLETE_MAX_RESULTS
+    ) -> list[dict]:
+        terms = tokenize(query)
+        if not terms:
+            return []
+        ids = self.ranked_ids(terms, limit, prefix=True)
+        books = Books.objects.in_bulk(ids)
+        return [
+            {"id": pk, "title": books[pk].title, "author": books[pk].author}
+            for pk in ids
+            if pk in books
+        ]
+
+
+class SqliteFtsBackend(SearchBackend):
+    """SQLite FTS5 table ``books_fts`` kept in sync by triggers"""
+
+    def ranked_ids(
+        self, terms: list[str], limit: int, prefix: bool
+    ) -> list[int]:
+        match = " ".join(f'"{term}"' for term in terms)
+        if prefix:
+            match += "*"
+        with connection.cursor() as cursor:
+            # Every match is scored; SQLite keeps only the best ``limit``
+            # while sorting, so memory does not grow with the matches.
+            cursor.execute(
+                "SELECT rowid FROM books_fts WHERE books_fts MATCH %s"
+                " ORDER BY bm25(books_fts, 10.0, 1.0) LIMIT %s",
+                [match, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """GIN-indexed tsvector over title (weight A) and author (weight B)"""
+
+    vector = (
+        "setweight(to_tsvector('simple', title), 'A')"
+        " || setweight(to_tsvector('simple', author), 'B')"
+    )
+
+    def ranked_ids(
+        self, terms: list[str], limit: int, prefix: bool
+    ) -> list[int]:
+        query = " & ".join(terms)
+        if prefix:
+            query += ":*"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM books_books, to_tsquery('simple', %s) query"
+                f" WHERE ({self.vector}) @@ query"
+                f" ORDER BY ts_rank({self.vector}, query) DESC LIMIT %s",
+                [query, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class LikeSearchBackend(SearchBackend):
+    """Unindexed fallback for databases without a full-text backend"""
+
+    def ranked_ids(
+        self, terms: list[str], limit: int, prefix: bool
+    ) -> list[int]:
+        queryset = Books.objects.all()
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(author__icontains=term)
+            )
+        return list(
+            queryset.order_by("title").values_list("id", flat=True)[:limit]
+        )
+
+
+BACKENDS = {
+    "sqlite": SqliteFtsBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_search_backend() -> SearchBackend:
+    return BACKENDS.get(connection.vendor, LikeSearchBackend)()
+
+
+def in_rank_order(queryset: QuerySet, ids: list[int]) -> QuerySet:
+    """Restrict ``queryset`` to ``ids`` and keep their ranking"""
+    if not ids:
+        return queryset.none()
+    rank = Case(
+        *[
+            When(pk=pk, then=Value(position))
+            for position, pk in enumerate(ids)
+        ],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=ids).order_by(rank)
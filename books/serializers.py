@@ -7,3 +7,5 @@ class BooksSerializer(serializers.ModelSerializer):
     class Meta:
         model = Books
         fields = ("id", "title", "author", "cover", "inventory", "daily_fee")
+        # Mirrors the books_inventory_non_negative constraint.
+        extra_kwargs = {"inventory": {"min_value": 0}}
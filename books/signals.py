@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from books.cache import catalog_changed
+from books.models import Books
+
+
+@receiver(post_save, sender=Books)
+@receiver(post_delete, sender=Books)
+def invalidate_catalog_cache(sender, **kwargs) -> None:
+    catalog_changed()
@@ -1,14 +1,21 @@
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError
 from django.test import TestCase
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from books.importer import import_books
 from books.models import Books
 from books.serializers import BooksSerializer
 
 BOOK_URL = reverse("books:books-list")
+AUTOCOMPLETE_URL = reverse("books:books-autocomplete")
+IMPORT_URL = reverse("books:books-bulk-import")
 
 
 def sample_book(**params):
@@ -29,6 +36,7 @@ def detail_url(book_id):
 
 class UnauthenticatedBookApiTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
 
     def test_unauthenticated_required_book(self):
@@ -53,6 +61,7 @@ class UnauthenticatedBookApiTests(TestCase):
 
 class AuthenticatedBooksApiTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             "test@test.com",
@@ -72,6 +81,22 @@ class AuthenticatedBooksApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_list_books_with_cursor_pagination(self):
+        books = [sample_book(title=f"Book {number}") for number in range(11)]
+
+        res = self.client.get(BOOK_URL, {"pagination": "cursor"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        serializer = BooksSerializer(books[:10], many=True)
+        self.assertEqual(res.data["results"], serializer.data)
+        self.assertIn("pagination=cursor", res.data["next"])
+
+        res = self.client.get(res.data["next"])
+
+        self.assertEqual(
+            res.data["results"], BooksSerializer(books[10:], many=True).data
+        )
+
     def test_retrieve_book_detail(self):
         book = sample_book()
 
@@ -123,6 +148,176 @@ class AuthenticatedBooksApiTests(TestCase):
         self.assertEqual(str(book), "Sample book, Author: Sample Author")
 
 
+class BookSearchApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.dune = sample_book(title="Dune", author="Frank Herbert")
+        self.messiah = sample_book(
+            title="Dune Messiah", author="Frank Herbert"
+        )
+        self.hobbit = sample_book(title="The Hobbit", author="J. R. R. Tolkien")
+
+    def test_search_ranks_matches_by_relevance(self):
+        res = self.client.get(BOOK_URL, {"q": "dune"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [book["id"] for book in res.data],
+            [self.dune.id, self.messiah.id],
+        )
+
+    def test_search_matches_author_and_title_terms(self):
+        res = self.client.get(BOOK_URL, {"q": "herbert messiah"})
+
+        self.assertEqual([book["id"] for book in res.data], [self.messiah.id])
+
+    def test_search_ignores_query_syntax(self):
+        res = self.client.get(BOOK_URL, {"q": 'hobbit" (*'})
+
+        self.assertEqual([book["id"] for book in res.data], [self.hobbit.id])
+
+    def test_search_index_follows_updates_and_deletes(self):
+        Books.objects.filter(id=self.hobbit.id).update(title="Silmarillion")
+        self.dune.delete()
+
+        self.assertEqual(self.client.get(BOOK_URL, {"q": "hobbit"}).data, [])
+        res = self.client.get(BOOK_URL, {"q": "silmarillion"})
+        self.assertEqual([book["id"] for book in res.data], [self.hobbit.id])
+        res = self.client.get(BOOK_URL, {"q": "dune"})
+        self.assertEqual([book["id"] for book in res.data], [self.messiah.id])
+
+    def test_autocomplete_matches_prefix(self):
+        res = self.client.get(AUTOCOMPLETE_URL, {"q": "tolk"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data,
+            [
+                {
+                    "id": self.hobbit.id,
+                    "title": "The Hobbit",
+                    "author": "J. R. R. Tolkien",
+                }
+            ],
+        )
+
+    def test_best_match_found_among_many_older_matches(self):
+        Books.objects.bulk_create(
+            Books(
+                title=f"Tolkien companion volume {number}",
+                author="Various",
+                inventory=1,
+                daily_fee=1,
+            )
+            for number in range(1200)
+        )
+        tolkien = sample_book(title="Tolkien", author="Tolkien")
+
+        search = self.client.get(BOOK_URL, {"q": "tolkien"})
+        suggestions = self.client.get(AUTOCOMPLETE_URL, {"q": "tolk"})
+
+        self.assertEqual(search.data[0]["id"], tolkien.id)
+        self.assertEqual(suggestions.data[0]["id"], tolkien.id)
+
+    def test_search_matches_whole_terms(self):
+        res = self.client.get(BOOK_URL, {"q": "hobb"})
+
+        self.assertEqual(res.data, [])
+
+    def test_autocomplete_without_query(self):
+        res = self.client.get(AUTOCOMPLETE_URL)
+
+        self.assertEqual(res.data, [])
+
+
+class BookInventoryTests(TestCase):
+    def test_take_copy_decrements_available_inventory(self):
+        book = sample_book(inventory=1)
+
+        self.assertTrue(Books.objects.take_copy(book.id))
+        self.assertFalse(Books.objects.take_copy(book.id))
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 0)
+
+    def test_return_copy_increments_inventory(self):
+        book = sample_book(inventory=0)
+
+        Books.objects.return_copy(book.id)
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 1)
+
+    def test_negative_inventory_rejected_by_database(self):
+        book = sample_book(inventory=0)
+
+        with self.assertRaises(IntegrityError):
+            Books.objects.filter(id=book.id).update(inventory=-1)
+
+
+class BookResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.book = sample_book(title="Dune", inventory=2)
+
+    def test_list_served_from_cache(self):
+        self.client.get(BOOK_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(BOOK_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]["title"], "Dune")
+
+    def test_save_invalidates_cached_responses(self):
+        self.client.get(BOOK_URL)
+        self.client.get(detail_url(self.book.id))
+
+        self.book.title = "Dune Messiah"
+        self.book.save()
+
+        res = self.client.get(BOOK_URL)
+        self.assertEqual(res.data[0]["title"], "Dune Messiah")
+        res = self.client.get(detail_url(self.book.id))
+        self.assertEqual(res.data["title"], "Dune Messiah")
+
+    def test_inventory_change_invalidates_cached_responses(self):
+        self.client.get(detail_url(self.book.id))
+
+        Books.objects.take_copy(self.book.id)
+
+        res = self.client.get(detail_url(self.book.id))
+        self.assertEqual(res.data["inventory"], 1)
+
+    def test_delete_invalidates_cached_list(self):
+        self.client.get(BOOK_URL)
+
+        self.book.delete()
+
+        self.assertEqual(self.client.get(BOOK_URL).data, [])
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.client.get(BOOK_URL)["ETag"]
+
+        res = self.client.get(BOOK_URL, HTTP_IF_NONE_MATCH=f"W/{etag}")
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b"")
+        self.assertEqual(res["ETag"], etag)
+
+    def test_stale_etag_returns_full_response(self):
+        etag = self.client.get(BOOK_URL)["ETag"]
+        sample_book(title="Emma")
+
+        res = self.client.get(BOOK_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res["ETag"], etag)
+        self.assertEqual(len(res.data), 2)
+
+
 class AdminBooksApiTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -146,6 +341,17 @@ class AdminBooksApiTests(TestCase):
         for key in payload.keys():
             self.assertEqual(payload[key], getattr(book, key))
 
+    def test_export_books_as_csv(self):
+        sample_book(title="Dune, part one", author="Frank Herbert")
+
+        res = self.client.get(reverse("books:books-export"), {"format": "csv"})
+
+        self.assertEqual(
+            b"".join(res.streaming_content).decode().splitlines()[1:],
+            [f'{Books.objects.get().id},"Dune, part one",Frank Herbert,'
+             f'HARD,1,10.00'],
+        )
+
     def test_put_book_allowed(self):
         payload = {
             "title": "Sample book",
@@ -162,6 +368,25 @@ class AdminBooksApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    def test_negative_inventory_rejected(self):
+        payload = {
+            "title": "Sample book",
+            "author": "Sample Author",
+            "cover": "HARD",
+            "inventory": -1,
+            "daily_fee": 10,
+        }
+        book = sample_book()
+
+        created = self.client.post(BOOK_URL, payload)
+        updated = self.client.put(detail_url(book.id), payload)
+
+        self.assertEqual(created.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(updated.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("inventory", created.data)
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 1)
+
     def test_delete_book_allowed(self):
         book = sample_book()
         url = detail_url(book.id)
@@ -169,3 +394,118 @@ class AdminBooksApiTests(TestCase):
         res = self.client.delete(url)
 
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class BookImportApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@admin.com", "testpass", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_import_csv_creates_and_updates_books(self):
+        existing = sample_book(title="Dune", author="Frank Herbert")
+        body = (
+            "title,author,cover,inventory,daily_fee\n"
+            "Dune,Frank Herbert,SOFT,7,2.50\n"
+            "Emma,Jane Austen,,3,1.00\n"
+        )
+
+        res = self.client.generic(
+            "POST", IMPORT_URL, body, content_type="text/csv"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["created"], 1)
+        self.assertEqual(res.data["updated"], 1)
+        existing.refresh_from_db()
+        self.assertEqual(existing.inventory, 7)
+        self.assertEqual(existing.cover, "SOFT")
+        emma = Books.objects.get(title="Emma")
+        self.assertEqual(emma.cover, "HARD")
+
+    def test_import_ndjson_reports_invalid_rows(self):
+        body = "\n".join(
+            [
+                '{"title": "Emma", "author": "Jane Austen",'
+                ' "inventory": 3, "daily_fee": "1.00"}',
+                '{"title": "Persuasion", "author": "Jane Austen",'
+                ' "inventory": "many", "daily_fee": "1.00"}',
+                "not json",
+            ]
+        )
+
+        res = self.client.generic(
+            "POST", IMPORT_URL, body, content_type="application/x-ndjson"
+        )
+
+        self.assertEqual(res.data["created"], 1)
+        self.assertEqual(res.data["failed"], 2)
+        self.assertEqual(
+            [error["line"] for error in res.data["errors"]], [2, 3]
+        )
+        self.assertIn("inventory", res.data["errors"][0]["errors"])
+        self.assertFalse(Books.objects.filter(title="Persuasion").exists())
+
+    def test_import_reports_negative_inventory(self):
+        res = self.client.generic(
+            "POST",
+            IMPORT_URL,
+            "title,author,cover,inventory,daily_fee\n"
+            "Emma,Jane Austen,HARD,3,1.00\n"
+            "Persuasion,Jane Austen,HARD,-1,1.00\n",
+            content_type="text/csv",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["created"], 1)
+        self.assertEqual(res.data["errors"][0]["line"], 3)
+        self.assertIn("inventory", res.data["errors"][0]["errors"])
+
+    def test_import_rejects_non_utf8_body(self):
+        res = self.client.generic(
+            "POST",
+            IMPORT_URL,
+            "title,author\nMis\u00e9rables,Hugo\n".encode("latin-1"),
+            content_type="text/csv",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Line 2", res.data["detail"])
+        self.assertFalse(Books.objects.exists())
+
+    def test_import_in_batches(self):
+        rows = "".join(
+            f"Book {number},Author,HARD,1,1.00\n" for number in range(5)
+        )
+
+        with patch(
+            "books.views.import_books",
+            side_effect=lambda rows: import_books(rows, batch_size=2),
+        ):
+            self.client.generic(
+                "POST",
+                IMPORT_URL,
+                "title,author,cover,inventory,daily_fee\n" + rows,
+                content_type="text/csv",
+            )
+
+        self.assertEqual(Books.objects.count(), 5)
+
+    def test_import_unsupported_content_type(self):
+        res = self.client.post(IMPORT_URL, {"title": "Emma"}, format="json")
+
+        self.assertEqual(
+            res.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+
+    def test_import_requires_staff(self):
+        self.user.is_staff = False
+        self.user.save()
+
+        res = self.client.generic(
+            "POST", IMPORT_URL, "title,author\n", content_type="text/csv"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
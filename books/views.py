@@ -1,11 +1,113 @@
+from django.db.models import QuerySet
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
 
+from Library_Service_Project.cache import CachedResponseMixin
+from Library_Service_Project.export import StreamingExportMixin
+from Library_Service_Project.pagination import OptInKeysetPagination
+from books.cache import CATALOG_NAMESPACE
+from books.importer import (
+    FORMATS,
+    ImportFormatError,
+    decode_lines,
+    import_books,
+    read_rows,
+)
 from books.models import Books
 from books.permissions import IsAdminOrReadOnly
+from books.search import get_search_backend, in_rank_order
 from books.serializers import BooksSerializer
 
 
-class BooksViewSet(viewsets.ModelViewSet):
+class BooksViewSet(
+    CachedResponseMixin, StreamingExportMixin, viewsets.ModelViewSet
+):
+    cache_namespace = CATALOG_NAMESPACE
+    export_fields = (
+        "id", "title", "author", "cover", "inventory", "daily_fee"
+    )
     queryset = Books.objects.all()
     serializer_class = BooksSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    pagination_class = OptInKeysetPagination
+
+    def get_queryset(self) -> QuerySet[Books]:
+        queryset = super().get_queryset()
+        query = self.request.query_params.get("q")
+        if self.action == "list" and query:
+            ids = get_search_backend().search(query)
+            return in_rank_order(queryset, ids)
+        return queryset
+
+    def paginate_queryset(self, queryset: QuerySet) -> list | None:
+        # Search results are already cut to the best-ranked matches, and
+        # cursor pagination would reorder them by id.
+        if self.request.query_params.get("q"):
+            return None
+        return super().paginate_queryset(queryset)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                description="Full-text search over title and author,"
+                            " best matches first",
+                type=OpenApiTypes.STR,
+            ),
+        ]
+    )
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                description="Beginning of a title or author",
+                type=OpenApiTypes.STR,
+                required=True,
+            ),
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(detail=False, methods=["GET"], pagination_class=None)
+    def autocomplete(self, request: Request) -> Response:
+        """Suggest books whose title or author starts with the given text"""
+        query = request.query_params.get("q", "")
+        return Response(get_search_backend().autocomplete(query))
+
+    @extend_schema(
+        request={
+            "text/csv": OpenApiTypes.STR,
+            "application/x-ndjson": OpenApiTypes.STR,
+        },
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(
+        detail=False,
+        methods=["POST"],
+        url_path="import",
+        permission_classes=(IsAdminUser,),
+    )
+    def bulk_import(self, request: Request) -> Response:
+        """Create or update books from a CSV or NDJSON request body.
+
+        Rows are matched on title and author. The body is read line by
+        line, so files of any size are accepted; rows that fail
+        validation are reported by line number and skipped.
+        """
+        format_ = FORMATS.get(request.content_type.split(";")[0].strip())
+        if format_ is None:
+            raise UnsupportedMediaType(request.content_type)
+        lines = decode_lines(request.stream or [])
+        try:
+            report = import_books(read_rows(lines, format_))
+        except ImportFormatError as error:
+            raise ParseError(str(error))
+        return Response(report.as_dict())
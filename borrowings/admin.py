@@ -1,6 +1,15 @@
 from django.contrib import admin
 
-from borrowings.models import Borrowing, Payment
+from borrowings.models import (
+    Borrowing,
+    CheckoutSession,
+    Notification,
+    Payment,
+    StripeEvent,
+)
 
 admin.site.register(Borrowing)
 admin.site.register(Payment)
+admin.site.register(CheckoutSession)
+admin.site.register(Notification)
+admin.site.register(StripeEvent)
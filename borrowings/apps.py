@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class BorrowingsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "borrowings"
+
+    def ready(self) -> None:
+        from borrowings.http_client import configure_stripe
+
+        configure_stripe()
@@ -0,0 +1,55 @@
+from collections import Counter
+from datetime import datetime
+
+from rest_framework.exceptions import ValidationError
+
+from Library_Service_Project.sqlite import write_atomic
+from books.models import Books
+from borrowings.checkout import record_payments
+from borrowings.models import Borrowing, Payment
+from borrowings.notification import notify
+
+
+def borrow_books(
+    user, book_ids: list[int], expected_return_date: datetime
+) -> tuple[list[Borrowing], list[Payment]]:
+    """Borrow every book of ``book_ids`` for ``user`` in one transaction.
+
+    Inventory of all the books is reserved with a single conditional
+    UPDATE and the borrowings are inserted together; their payments
+    share one checkout session row, so paying opens one Stripe session
+    with a line item per book. Nothing is borrowed if any book is missing or
+    out of stock.
+    """
+    copies = Counter(book_ids)
+    books = Books.objects.in_bulk(copies)
+    missing = sorted(set(copies) - set(books))
+    if missing:
+        raise ValidationError({"books": f"Unknown book ids: {missing}"})
+
+    with write_atomic():
+        if not Books.objects.take_copies(copies):
+            # Raising rolls back the copies that were taken.
+            unavailable = sorted(
+                book_id
+                for book_id, count in copies.items()
+                if books[book_id].inventory < count
+            )
+            raise ValidationError(
+                {"books": f"Not enough copies of books: {unavailable}"}
+            )
+        borrowings = Borrowing.objects.bulk_create(
+            Borrowing(
+                user=user,
+                book=books[book_id],
+                expected_return_date=expected_return_date,
+            )
+            for book_id in book_ids
+        )
+        payments = record_payments(borrowings, type_="PAYMENT")
+        notify(
+            f"Borrowings №: {', '.join(str(b.id) for b in borrowings)}"
+            f" Titles: {'; '.join(b.book.title for b in borrowings)}"
+            f" Expected return date: {expected_return_date}"
+        )
+    return borrowings, list(payments.values())
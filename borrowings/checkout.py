@@ -0,0 +1,218 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import stripe
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from borrowings.models import Borrowing, CheckoutSession, Payment
+from borrowings.pricing import borrowing_price, borrowing_prices
+
+LOCAL_DOMAIN = "http://127.0.0.1:8000/"
+# Held by the request creating a checkout's session, so a double click
+# does not open two sessions for the same payments.
+CHECKOUT_LEASE = timedelta(seconds=30)
+# A session this close to expiring is replaced rather than handed out.
+SESSION_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+class CheckoutInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The checkout session is being created, please retry."
+    default_code = "checkout_in_progress"
+
+
+class CheckoutUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Payments are unavailable right now, please retry."
+    default_code = "checkout_unavailable"
+
+
+def calculate_price(pk: int, type_: str) -> int:
+    """Price in cents of a borrowing that is not loaded yet"""
+    borrowing = Borrowing.objects.select_related("book").get(id=pk)
+    return borrowing_price(borrowing, type_)
+
+
+def record_payment(borrowing: Borrowing, type_: str) -> Payment | None:
+    """Record a pending payment; its Stripe session is opened on demand.
+
+    No remote call is made, the payment only carries the local amount
+    until its owner asks to pay through ``checkout_session``.
+    """
+    price = borrowing_price(borrowing, type_)
+    if price <= 0:
+        # Stripe rejects empty sessions, so there is nothing to collect.
+        return None
+    return Payment.objects.create(
+        borrowing=borrowing,
+        checkout=CheckoutSession.objects.create(),
+        type=type_,
+        money_to_pay=price,
+    )
+
+
+def record_payments(
+    borrowings: list[Borrowing], type_: str
+) -> dict[int, Payment]:
+    """Record pending payments for many loaded borrowings at once.
+
+    Payments of the same user share one checkout and so end up as line
+    items of a single Stripe session. Returns the payments keyed by
+    borrowing id; borrowings with nothing to pay are left out.
+    """
+    prices = borrowing_prices(borrowings, type_)
+    by_user: dict[int, list[Borrowing]] = {}
+    for borrowing in borrowings:
+        if prices[borrowing.pk] > 0:
+            by_user.setdefault(borrowing.user_id, []).append(borrowing)
+    if not by_user:
+        return {}
+
+    checkouts = CheckoutSession.objects.bulk_create(
+        CheckoutSession() for _ in by_user
+    )
+    payments = Payment.objects.bulk_create(
+        Payment(
+            borrowing=borrowing,
+            checkout=checkout,
+            type=type_,
+            money_to_pay=prices[borrowing.pk],
+        )
+        for checkout, user_borrowings in zip(checkouts, by_user.values())
+        for borrowing in user_borrowings
+    )
+    return {payment.borrowing_id: payment for payment in payments}
+
+
+def process_checkout(checkout: CheckoutSession) -> None:
+    """Open a Stripe session for the pending payments of a checkout"""
+    pending = checkout.payments.filter(status=Payment.Status.PENDING)
+    payments = list(pending.select_related("borrowing__book"))
+    checkout_session = stripe.checkout.Session.create(
+        line_items=[
+            {
+                "price_data": {
+                    "currency": "usd",
+                    "unit_amount": int(payment.money_to_pay),
+                    "product_data": {
+                        "name": payment.borrowing.book.title,
+                        "description":
+                            f"Author: {payment.borrowing.book.author}",
+                    },
+                },
+                "quantity": 1,
+            }
+            for payment in payments
+        ],
+        mode="payment",
+        success_url=LOCAL_DOMAIN
+        + "api/borrowings/success?session_id={CHECKOUT_SESSION_ID}",
+        cancel_url=LOCAL_DOMAIN + "api/borrowings/canceled/",
+    )
+    with transaction.atomic():
+        pending.update(
+            session_url=checkout_session.url,
+            session_id=checkout_session.stripe_id,
+        )
+        checkout.processed_at = timezone.now()
+        checkout.session_expires_at = datetime.fromtimestamp(
+            checkout_session.expires_at, tz=dt_timezone.utc
+        )
+        checkout.locked_until = None
+        checkout.last_error = ""
+        checkout.save(
+            update_fields=[
+                "processed_at",
+                "session_expires_at",
+                "locked_until",
+                "last_error",
+            ]
+        )
+
+
+def _session_is_live(payment: Payment, checkout: CheckoutSession) -> bool:
+    expires_at = checkout.session_expires_at
+    return bool(
+        payment.session_url
+        and expires_at
+        and expires_at > timezone.now() + SESSION_REFRESH_MARGIN
+    )
+
+
+def _retire_session(session_id: str) -> None:
+    """Expire a still open session before it is replaced.
+
+    Raises ``CheckoutInProgress`` if the customer completed it meanwhile;
+    its webhook will mark the payment paid.
+    """
+    try:
+        stripe.checkout.Session.expire(session_id)
+    except stripe.error.InvalidRequestError:
+        session = stripe.checkout.Session.retrieve(session_id)
+        if session.status == "complete":
+            raise CheckoutInProgress("The payment is being confirmed.")
+
+
+def checkout_session(payment: Payment) -> Payment:
+    """Return ``payment`` with a Stripe session that is still open.
+
+    The session is created on the first call and reused until it is
+    about to expire, so borrowing never waits for Stripe and customers
+    are never handed a dead link. All pending payments of the payment's
+    checkout are paid through the same session.
+    """
+    if payment.status != Payment.Status.PENDING:
+        raise ValidationError({"status": "Only pending payments can be paid."})
+    checkout = payment.checkout
+    if checkout is None:
+        checkout = CheckoutSession.objects.create()
+        payment.checkout = checkout
+        payment.save(update_fields=["checkout"])
+    if _session_is_live(payment, checkout):
+        return payment
+
+    now = timezone.now()
+    claimable = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    claimed = CheckoutSession.objects.filter(claimable, pk=checkout.pk).update(
+        locked_until=now + CHECKOUT_LEASE, attempts=F("attempts") + 1
+    )
+    if not claimed:
+        raise CheckoutInProgress()
+    checkout.refresh_from_db()
+    payment.refresh_from_db()
+    try:
+        if not _session_is_live(payment, checkout):
+            expires_at = checkout.session_expires_at
+            if payment.session_id and (expires_at is None or expires_at > now):
+                _retire_session(payment.session_id)
+            process_checkout(checkout)
+            payment.refresh_from_db()
+    except stripe.error.StripeError as error:
+        checkout.last_error = str(error)
+        checkout.save(update_fields=["last_error"])
+        raise CheckoutUnavailable()
+    finally:
+        CheckoutSession.objects.filter(pk=checkout.pk).update(
+            locked_until=None
+        )
+    return payment
+
+
+def create_checkout_session(pk: int, type_: str) -> Response | None:
+    """Create a payment and open its Stripe session straight away"""
+    borrowing = Borrowing.objects.select_related("book").get(id=pk)
+    payment = record_payment(borrowing, type_)
+    if payment is None:
+        return None
+    try:
+        process_checkout(payment.checkout)
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
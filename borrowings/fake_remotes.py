@@ -0,0 +1,428 @@
+"""Local stand-ins for the Stripe and Telegram APIs, for load tests.
+
+One threaded HTTP server answers the few endpoints the service calls:
+Stripe checkout sessions and Telegram ``sendMessage``. Each API has its
+own ``Behaviour`` (latency, jitter and the share of requests failing
+with a 5xx or a 429) which can be changed while the server runs, and
+counters of what was served. Point ``STRIPE_API_BASE`` and
+``TELEGRAM_API_BASE`` at ``FakeRemotes.url`` to use it.
+
+Opening a session's ``url`` plays the customer paying: the session is
+marked paid, a signed ``checkout.session.completed`` event is posted to
+``webhook_url`` if one is set, and the browser is redirected to the
+session's ``success_url``.
+"""
+import json
+import random
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from dataclasses import asdict, dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from borrowings.webhooks import SESSION_COMPLETED, sign_payload
+
+STRIPE = "stripe"
+TELEGRAM = "telegram"
+SESSION_LIFETIME = 24 * 60 * 60
+SESSIONS_PATH = "/v1/checkout/sessions"
+SESSION_PATH = re.compile(
+    r"^/v1/checkout/sessions/(?P<id>[\w-]+)(?P<expire>/expire)?$"
+)
+PAY_PATH = re.compile(r"^/pay/(?P<id>[\w-]+)$")
+SEND_MESSAGE_PATH = re.compile(r"^/bot[^/]*/sendMessage$")
+LINE_ITEM_FIELD = re.compile(
+    r"^line_items\[(?P<index>\d+)\]"
+    r"(?:\[price_data\])?\[(?P<field>unit_amount|quantity)\]$"
+)
+
+
+@dataclass
+class Behaviour:
+    """How a fake API misbehaves; times are seconds, rates are 0..1"""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+
+    def update(self, changes: dict) -> None:
+        for field in fields(self):
+            if field.name in changes:
+                setattr(self, field.name, float(changes[field.name]))
+
+
+class RemoteStats:
+    """Request counters of one fake API"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.monotonic()
+            self.requests = 0
+            self.errors = 0
+            self.throttled = 0
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.endpoints: dict[str, int] = {}
+
+    def begin(self, endpoint: str) -> None:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.endpoints[endpoint] = self.endpoints.get(endpoint, 0) + 1
+
+    def end(self, status_code: int) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.errors += status_code >= 500
+            self.throttled += status_code == 429
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "throttled": self.throttled,
+                "max_in_flight": self.max_in_flight,
+                "requests_per_second": round(
+                    self.requests / elapsed if elapsed else 0.0, 2
+                ),
+                "endpoints": dict(self.endpoints),
+            }
+
+
+class FakeRemotes:
+    """Stripe and Telegram stand-in served from a background thread"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        stripe: Behaviour | None = None,
+        telegram: Behaviour | None = None,
+        webhook_url: str = "",
+        webhook_secret: str = "",
+        seed: int | None = None,
+    ) -> None:
+        self.behaviour = {
+            STRIPE: stripe or Behaviour(),
+            TELEGRAM: telegram or Behaviour(),
+        }
+        self.stats = {STRIPE: RemoteStats(), TELEGRAM: RemoteStats()}
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.sessions: dict[str, dict] = {}
+        self._session_ids: list[str] = []
+        self._positions: dict[str, int] = {}
+        self.messages = 0
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.remotes = self
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeRemotes":
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeRemotes":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def configure(self, changes: dict) -> None:
+        """Update behaviours, e.g. ``{"stripe": {"latency": 0.5}}``"""
+        for name, behaviour in changes.items():
+            self.behaviour[name].update(behaviour)
+
+    def snapshot(self) -> dict:
+        return {
+            name: {
+                "behaviour": asdict(self.behaviour[name]),
+                **self.stats[name].snapshot(),
+            }
+            for name in (STRIPE, TELEGRAM)
+        }
+
+    def reset(self) -> None:
+        for stats in self.stats.values():
+            stats.reset()
+
+    def fault(self, name: str) -> int | None:
+        """Sleep like the remote would and pick an injected failure"""
+        behaviour = self.behaviour[name]
+        delay = behaviour.latency + self.random.uniform(0, behaviour.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        roll = self.random.random()
+        if roll < behaviour.error_rate:
+            return 500
+        if roll < behaviour.error_rate + behaviour.throttle_rate:
+            return 429
+        return None
+
+    def create_session(self, form: list[tuple[str, str]]) -> dict:
+        params = dict(form)
+        items: dict[str, dict] = {}
+        for key, value in form:
+            match = LINE_ITEM_FIELD.match(key)
+            if match:
+                items.setdefault(match["index"], {})[match["field"]] = value
+        amount = sum(
+            int(item.get("unit_amount", 0)) * int(item.get("quantity", 1))
+            for item in items.values()
+        )
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+        created = int(time.time())
+        session = {
+            "id": session_id,
+            "object": "checkout.session",
+            "amount_total": amount,
+            "currency": "usd",
+            "mode": params.get("mode", "payment"),
+            "status": "open",
+            "payment_status": "unpaid",
+            "created": created,
+            "expires_at": created + SESSION_LIFETIME,
+            "success_url": params.get("success_url", ""),
+            "cancel_url": params.get("cancel_url", ""),
+            "url": f"{self.url}/pay/{session_id}",
+        }
+        with self._lock:
+            self.sessions[session_id] = session
+            self._positions[session_id] = len(self._session_ids)
+            self._session_ids.append(session_id)
+        return session
+
+    def list_sessions(
+        self, limit: int, starting_after: str, created_gte: int = 0
+    ) -> dict:
+        # Stripe lists newest first and pages with the last id seen.
+        with self._lock:
+            ids = self._session_ids
+            end = self._positions.get(starting_after, len(ids))
+            start = max(end - limit, 0)
+            page = [self.sessions[pk] for pk in reversed(ids[start:end])]
+        recent = [
+            session for session in page if session["created"] >= created_gte
+        ]
+        return {
+            "object": "list",
+            "url": SESSIONS_PATH,
+            "data": recent,
+            "has_more": start > 0 and len(recent) == len(page),
+        }
+
+    def pay(self, session_id: str) -> dict | None:
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            session.update(status="complete", payment_status="paid")
+        if self.webhook_url:
+            self.deliver_event(SESSION_COMPLETED, session)
+        return session
+
+    def expire(self, session_id: str) -> bool:
+        with self._lock:
+            session = self.sessions[session_id]
+            if session["status"] != "open":
+                return False
+            session["status"] = "expired"
+        return True
+
+    def deliver_event(self, type_: str, session: dict) -> None:
+        payload = json.dumps(
+            {
+                "id": f"evt_{uuid.uuid4().hex}",
+                "object": "event",
+                "type": type_,
+                "created": int(time.time()),
+                "data": {"object": session},
+            }
+        ).encode()
+        request = urllib.request.Request(
+            self.webhook_url,
+            data=payload,
+            headers={
+                "Content-Type": "application/json",
+                "Stripe-Signature": sign_payload(
+                    payload, self.webhook_secret
+                ),
+            },
+        )
+        with urllib.request.urlopen(request, timeout=10):
+            pass
+
+    def send_message(self) -> dict:
+        with self._lock:
+            self.messages += 1
+            message_id = self.messages
+        return {"ok": True, "result": {"message_id": message_id}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeRemotes/1.0"
+
+    @property
+    def remotes(self) -> FakeRemotes:
+        return self.server.remotes
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str) -> None:
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        if url.path.startswith("/_fake/"):
+            return self._control(method, url.path, body)
+        if url.path.startswith("/v1/"):
+            return self._remote(STRIPE, method, url, body, self._stripe)
+        if SEND_MESSAGE_PATH.match(url.path):
+            return self._remote(TELEGRAM, method, url, body, self._telegram)
+        match = PAY_PATH.match(url.path)
+        if match and method == "GET":
+            session = self.remotes.pay(match["id"])
+            if session is None:
+                return self._send_json(404, {"detail": "No such session"})
+            location = session["success_url"].replace(
+                "{CHECKOUT_SESSION_ID}", session["id"]
+            )
+            return self._send(302, b"", headers={"Location": location})
+        self._send_json(404, {"detail": "Not found"})
+
+    def _remote(self, name, method, url, body, handler) -> None:
+        stats = self.remotes.stats[name]
+        stats.begin(f"{method} {url.path}")
+        status_code = 500
+        try:
+            status_code = self.remotes.fault(name) or 200
+            if status_code == 200:
+                status_code, payload = handler(method, url, body)
+            else:
+                payload = self._failure(name, status_code)
+            self._send_json(status_code, payload)
+        finally:
+            stats.end(status_code)
+
+    def _stripe(self, method, url, body) -> tuple[int, dict]:
+        query = dict(parse_qsl(url.query))
+        if url.path == SESSIONS_PATH and method == "POST":
+            form = parse_qsl(body.decode(), keep_blank_values=True)
+            return 200, self.remotes.create_session(form)
+        if url.path == SESSIONS_PATH and method == "GET":
+            return 200, self.remotes.list_sessions(
+                min(int(query.get("limit", 10)), 100),
+                query.get("starting_after", ""),
+                int(query.get("created[gte]", 0)),
+            )
+        match = SESSION_PATH.match(url.path)
+        session = match and self.remotes.sessions.get(match["id"])
+        if session and method == "GET" and not match["expire"]:
+            return 200, session
+        if session and method == "POST" and match["expire"]:
+            if self.remotes.expire(session["id"]):
+                return 200, session
+            return 400, {
+                "error": {
+                    "type": "invalid_request_error",
+                    "message": "Only open sessions can be expired.",
+                }
+            }
+        return 404, {
+            "error": {
+                "type": "invalid_request_error",
+                "message": f"Unrecognized request URL ({method} {url.path})",
+            }
+        }
+
+    def _telegram(self, method, url, body) -> tuple[int, dict]:
+        return 200, self.remotes.send_message()
+
+    @staticmethod
+    def _failure(name: str, status_code: int) -> dict:
+        if name == TELEGRAM:
+            if status_code == 429:
+                return {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": 1},
+                }
+            return {
+                "ok": False,
+                "error_code": status_code,
+                "description": "Injected failure",
+            }
+        if status_code == 429:
+            return {
+                "error": {
+                    "type": "invalid_request_error",
+                    "code": "rate_limit",
+                    "message": "Injected rate limit",
+                }
+            }
+        return {"error": {"type": "api_error", "message": "Injected failure"}}
+
+    def _control(self, method: str, path: str, body: bytes) -> None:
+        if path == "/_fake/stats" and method == "GET":
+            return self._send_json(200, self.remotes.snapshot())
+        if path == "/_fake/config" and method == "POST":
+            try:
+                self.remotes.configure(json.loads(body or b"{}"))
+            except (KeyError, TypeError, ValueError) as error:
+                return self._send_json(400, {"detail": str(error)})
+            return self._send_json(200, self.remotes.snapshot())
+        if path == "/_fake/reset" and method == "POST":
+            self.remotes.reset()
+            return self._send_json(200, self.remotes.snapshot())
+        self._send_json(404, {"detail": "Not found"})
+
+    def _send_json(self, status_code: int, payload: dict) -> None:
+        self._send(
+            status_code,
+            json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+
+    def _send(self, status_code: int, body: bytes, headers: dict) -> None:
+        self.send_response(status_code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
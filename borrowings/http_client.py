@@ -0,0 +1,215 @@
+import os
+import threading
+import time
+from typing import Any, Callable
+
+import requests
+import stripe
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of calling a remote that is known to be down"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe.
+
+    After ``failure_threshold`` failures in a row calls are rejected for
+    ``reset_timeout`` seconds; the first call after that is let through
+    and decides whether the circuit closes again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class IntegrationStats:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, failed: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.errors += failed
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def reject(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            average = self.total_latency / self.calls if self.calls else 0.0
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "rejected": self.rejected,
+                "avg_latency_ms": round(average * 1000, 2),
+                "max_latency_ms": round(self.max_latency * 1000, 2),
+            }
+
+
+class OutboundClient:
+    """Keep-alive HTTP session for one remote integration.
+
+    Every call goes through the circuit breaker and is timed, and the
+    connection pool is reused across calls so only the first request to
+    a host pays for the TCP and TLS handshake.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float | tuple[float, float],
+        pool_size: int = 10,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+    ) -> None:
+        self.name = name
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.stats = IntegrationStats()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def call(self, send: Callable[[], tuple[Any, int]]) -> Any:
+        """Run ``send`` under the breaker; it returns (result, status)"""
+        if not self.breaker.allow():
+            self.stats.reject()
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        started = time.perf_counter()
+        try:
+            result, status_code = send()
+        except Exception:
+            self.stats.record(time.perf_counter() - started, failed=True)
+            self.breaker.record_failure()
+            raise
+        failed = status_code >= 500
+        self.stats.record(time.perf_counter() - started, failed=failed)
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return result
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+
+        def send() -> tuple[requests.Response, int]:
+            response = self.session.request(method, url, **kwargs)
+            return response, response.status_code
+
+        return self.call(send)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class StripeHttpClient(stripe.http_client.RequestsClient):
+    """Stripe SDK transport that shares the "stripe" OutboundClient pool"""
+
+    def __init__(self) -> None:
+        super().__init__(timeout=settings.OUTBOUND_HTTP["stripe"]["timeout"])
+
+    def request(self, method, url, headers, post_data=None):
+        outbound = get_client("stripe")
+        self._session = outbound.session
+
+        def send() -> tuple[Any, int]:
+            response = super(StripeHttpClient, self).request(
+                method, url, headers, post_data
+            )
+            return response, response[1]
+
+        try:
+            return outbound.call(send)
+        except CircuitOpenError as error:
+            raise stripe.error.APIConnectionError(str(error))
+
+
+_clients: dict[str, OutboundClient] = {}
+_clients_pid: int | None = None
+_clients_lock = threading.Lock()
+
+
+def get_client(name: str) -> OutboundClient:
+    """Return this process's client for an ``OUTBOUND_HTTP`` integration.
+
+    Clients are rebuilt after a fork so Celery and WSGI workers never
+    share pooled sockets with their parent.
+    """
+    global _clients_pid
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+        if name not in _clients:
+            _clients[name] = OutboundClient(
+                name, **settings.OUTBOUND_HTTP[name]
+            )
+        return _clients[name]
+
+
+def configure_stripe() -> None:
+    """Set the Stripe SDK up once per process instead of once per call"""
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    stripe.api_base = settings.STRIPE_API_BASE
+    stripe.default_http_client = StripeHttpClient()
+
+
+def integration_stats() -> dict:
+    return {
+        name: {"circuit": client.breaker.state, **client.stats.snapshot()}
+        for name, client in _clients.items()
+    }
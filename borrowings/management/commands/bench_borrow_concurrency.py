@@ -0,0 +1,127 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+from books.models import Books
+from borrowings.models import Borrowing
+
+
+class Command(BaseCommand):
+    help = (
+        "Borrow the same book from many threads at once and report"
+        " throughput and oversell. Creates a throwaway book and user in"
+        " the configured database and deletes them afterwards."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument(
+            "--attempts",
+            type=int,
+            default=50,
+            help="borrow attempts per thread",
+        )
+        parser.add_argument("--inventory", type=int, default=100)
+        parser.add_argument(
+            "--mode",
+            choices=("atomic", "read-modify-write"),
+            default="atomic",
+            help="atomic uses the conditional UPDATE from perform_create,"
+                 " read-modify-write reproduces the old get/-=1/save",
+        )
+
+    def handle(self, *args, **options) -> None:
+        user = get_user_model().objects.create_user(
+            f"bench-{time.time_ns()}@example.com", "benchpass"
+        )
+        book = Books.objects.create(
+            title="Concurrency benchmark",
+            author="Benchmark",
+            inventory=options["inventory"],
+            daily_fee=1,
+        )
+        borrow = (
+            self._borrow_atomic
+            if options["mode"] == "atomic"
+            else self._borrow_read_modify_write
+        )
+        counters = {"borrowed": 0, "sold_out": 0, "errors": 0}
+        lock = threading.Lock()
+
+        def worker() -> None:
+            try:
+                for _ in range(options["attempts"]):
+                    try:
+                        outcome = borrow(book, user)
+                    except DatabaseError:
+                        outcome = "errors"
+                    with lock:
+                        counters[outcome] += 1
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker)
+            for _ in range(options["threads"])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        book.refresh_from_db()
+        borrowed = Borrowing.objects.filter(book=book).count()
+        attempts = options["threads"] * options["attempts"]
+        oversell = max(borrowed - options["inventory"], 0)
+        lost_updates = options["inventory"] - borrowed - book.inventory
+
+        self.stdout.write(
+            f"mode={options['mode']} threads={options['threads']}"
+            f" attempts={attempts} elapsed={elapsed:.3f}s"
+            f" throughput={attempts / elapsed:.1f} attempts/s\n"
+            f"borrowed={borrowed} sold_out={counters['sold_out']}"
+            f" db_errors={counters['errors']}"
+            f" final_inventory={book.inventory}\n"
+            f"oversell={oversell} lost_inventory_updates={lost_updates}"
+        )
+        book.delete()
+        user.delete()
+
+    @staticmethod
+    def _borrow_atomic(book: Books, user) -> str:
+        # Like perform_create, the borrowing keeps the book instance that
+        # was validated before the decrement.
+        with transaction.atomic():
+            if not Books.objects.take_copy(book.id):
+                return "sold_out"
+            Borrowing.objects.create(
+                book=book,
+                user=user,
+                expected_return_date=timezone.now() + timedelta(days=7),
+            )
+        return "borrowed"
+
+    @staticmethod
+    def _borrow_read_modify_write(book: Books, user) -> str:
+        with transaction.atomic():
+            # The old serializer validated its own copy of the book, which
+            # the borrowing kept, and perform_create decremented another.
+            validated = Books.objects.get(id=book.id)
+            if validated.inventory <= 0:
+                return "sold_out"
+            stock = Books.objects.get(id=book.id)
+            stock.inventory -= 1
+            stock.save()
+            Borrowing.objects.create(
+                book=validated,
+                user=user,
+                expected_return_date=timezone.now() + timedelta(days=7),
+            )
+        return "borrowed"
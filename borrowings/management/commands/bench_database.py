@@ -0,0 +1,214 @@
+import json
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models import Max
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from books.models import Books
+from borrowings.models import CheckoutSession, Notification
+
+# CONN_MAX_AGE and CONN_HEALTH_CHECKS of each compared configuration.
+CONFIGS = {
+    "per_request": (0, False),
+    "persistent": (600, False),
+    "persistent_checked": (600, True),
+}
+ENDPOINTS = ("borrow", "list")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare borrow and list throughput with a connection per request"
+        " and with persistent connections, with and without health"
+        " checks, against the configured database (DATABASE_URL). Worker"
+        " threads serve requests through the WSGI handler like threaded"
+        " application server workers, so connections are kept between"
+        " requests exactly as in production. Run once per DATABASE_URL"
+        " (e.g. direct and through pgbouncer) to compare backends. Set"
+        " CELERY_BROKER_URL=memory:// and CELERY_RESULT_BACKEND="
+        "cache+memory://. Creates a throwaway book and users and deletes"
+        " them afterwards."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=50,
+            help="borrow and list requests per thread and configuration",
+        )
+        parser.add_argument(
+            "--configs",
+            nargs="+",
+            choices=CONFIGS,
+            default=list(CONFIGS),
+        )
+
+    def handle(self, *args, **options) -> None:
+        database = settings.DATABASES["default"]
+        self.stdout.write(
+            f"engine={database['ENGINE']} host={database['HOST'] or '-'}"
+            f" name={database['NAME']}"
+            f" server_side_cursors="
+            f"{not database.get('DISABLE_SERVER_SIDE_CURSORS', False)}"
+        )
+        stamp = time.time_ns()
+        users = [
+            get_user_model().objects.create_user(
+                f"bench-{stamp}-{index}@example.com", "benchpass"
+            )
+            for index in range(options["threads"])
+        ]
+        book = Books.objects.create(
+            title=f"Database benchmark {stamp}",
+            author="Benchmark",
+            inventory=len(options["configs"])
+            * options["threads"]
+            * options["iterations"],
+            daily_fee=1,
+        )
+        last_ids = {
+            model: model.objects.aggregate(last=Max("id"))["last"] or 0
+            for model in (CheckoutSession, Notification)
+        }
+        original = {
+            key: connections.settings["default"][key]
+            for key in ("CONN_MAX_AGE", "CONN_HEALTH_CHECKS")
+        }
+        try:
+            # Served like production: no query log or debug toolbar.
+            with override_settings(
+                DEBUG=False,
+                INTERNAL_IPS=[],
+                ALLOWED_HOSTS=["testserver"],
+                JWT_REVOCATION_STORE="local",
+                REST_FRAMEWORK={
+                    **settings.REST_FRAMEWORK,
+                    "DEFAULT_THROTTLE_RATES": {},
+                },
+            ):
+                results = {
+                    name: self._run(name, users, book, options)
+                    for name in options["configs"]
+                }
+        finally:
+            connections.settings["default"].update(original)
+            connections.close_all()
+            for model, last_id in last_ids.items():
+                model.objects.filter(id__gt=last_id).delete()
+            book.delete()
+            for user in users:
+                user.delete()
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def _run(self, name, users, book, options) -> dict:
+        max_age, health_checks = CONFIGS[name]
+        connections.close_all()
+        # Connections are built from these settings in each new thread.
+        connections.settings["default"].update(
+            CONN_MAX_AGE=max_age, CONN_HEALTH_CHECKS=health_checks
+        )
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        expected = (timezone.now() + timedelta(days=7)).isoformat()
+        timings = {endpoint: [] for endpoint in ENDPOINTS}
+        failures = {endpoint: 0 for endpoint in ENDPOINTS}
+        connects = []
+        lock = threading.Lock()
+
+        def count_connect(sender, connection, **kwargs) -> None:
+            with lock:
+                connects.append(connection.alias)
+
+        def request(endpoint, build) -> None:
+            statuses = []
+            began = time.perf_counter()
+            response = handler(
+                build().environ,
+                lambda status, headers: statuses.append(status),
+            )
+            b"".join(response)
+            response.close()
+            elapsed = time.perf_counter() - began
+            with lock:
+                timings[endpoint].append(elapsed)
+                failures[endpoint] += not statuses[0].startswith("2")
+
+        def worker(user) -> None:
+            header = f"Bearer {AccessToken.for_user(user)}"
+            try:
+                for _ in range(options["iterations"]):
+                    request(
+                        "borrow",
+                        lambda: factory.post(
+                            reverse("borrowing:borrowing-list"),
+                            {
+                                "book": book.id,
+                                "expected_return_date": expected,
+                            },
+                            HTTP_AUTHORIZE=header,
+                        ),
+                    )
+                    request(
+                        "list",
+                        lambda: factory.get(
+                            reverse("borrowing:borrowing-list"),
+                            HTTP_AUTHORIZE=header,
+                        ),
+                    )
+            finally:
+                connections.close_all()
+
+        connection_created.connect(count_connect)
+        threads = [
+            threading.Thread(target=worker, args=(user,)) for user in users
+        ]
+        started = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            connection_created.disconnect(count_connect)
+        elapsed = time.perf_counter() - started
+
+        result = {
+            "conn_max_age": max_age,
+            "health_checks": health_checks,
+            "connects": len(connects),
+            "elapsed": round(elapsed, 3),
+        }
+        for endpoint in ENDPOINTS:
+            samples = sorted(timings[endpoint])
+            result[endpoint] = {
+                "requests_per_second": round(len(samples) / elapsed, 1),
+                "failed": failures[endpoint],
+                "p50_ms": round(statistics.median(samples) * 1000, 2),
+                "p95_ms": round(
+                    samples[int(len(samples) * 0.95) - 1] * 1000, 2
+                ),
+            }
+        self.stdout.write(
+            f"{name:>18}: connects={len(connects)}"
+            + "".join(
+                f" {endpoint}={result[endpoint]['requests_per_second']}/s"
+                f" (p50 {result[endpoint]['p50_ms']}ms,"
+                f" failed {result[endpoint]['failed']})"
+                for endpoint in ENDPOINTS
+            )
+        )
+        return result
@@ -0,0 +1,274 @@
+import json
+import logging
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Max
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from books.models import Books
+from borrowings.fake_remotes import STRIPE, TELEGRAM, Behaviour, FakeRemotes
+from borrowings.http_client import configure_stripe, integration_stats
+from borrowings.models import (
+    Borrowing,
+    CheckoutSession,
+    Notification,
+    Payment,
+)
+from borrowings.notification import deliver_pending_notifications
+
+STEPS = ("borrow", "pay", "success", "return", "pay_fine", "notify")
+
+
+class Command(BaseCommand):
+    help = (
+        "Borrow, pay for and return books end to end against the fake"
+        " Stripe and Telegram APIs and report per-step latency. Each"
+        " thread plays a customer and the notification worker in turn."
+        " Set CELERY_BROKER_URL=memory:// and"
+        " CELERY_RESULT_BACKEND=cache+memory:// so on-commit wake-ups"
+        " do not wait for a missing broker. Creates a throwaway book"
+        " and users in the configured database and deletes them"
+        " afterwards."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=25,
+            help="borrow/pay/return cycles per thread",
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.05,
+            help="seconds each fake remote takes to answer",
+        )
+        parser.add_argument("--jitter", type=float, default=0.0)
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="share of remote calls answered with a 500",
+        )
+        parser.add_argument(
+            "--throttle-rate",
+            type=float,
+            default=0.0,
+            help="share of remote calls answered with a 429",
+        )
+        parser.add_argument(
+            "--overdue",
+            action="store_true",
+            help="move the return date into the past before returning,"
+                 " so every return is fined and needs a second session",
+        )
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options) -> None:
+        if not settings.CELERY_BROKER_URL.startswith("memory"):
+            self.stderr.write(
+                "CELERY_BROKER_URL is not memory://, every wake-up waits"
+                " for the configured broker."
+            )
+        behaviour = {
+            "latency": options["latency"],
+            "jitter": options["jitter"],
+            "error_rate": options["error_rate"],
+            "throttle_rate": options["throttle_rate"],
+        }
+        remotes = FakeRemotes(
+            stripe=Behaviour(**behaviour),
+            telegram=Behaviour(**behaviour),
+            seed=options["seed"],
+        )
+        # Failed requests are counted per step instead of logged.
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        with remotes, override_settings(
+            ALLOWED_HOSTS=["testserver"],
+            STRIPE_API_BASE=remotes.url,
+            TELEGRAM_API_BASE=remotes.url,
+            STRIPE_SECRET_KEY=settings.STRIPE_SECRET_KEY or "sk_test_fake",
+            TELEGRAM_CHAT_MIN_INTERVAL=0,
+            # Every customer borrows far faster than the throttles allow.
+            REST_FRAMEWORK={
+                **settings.REST_FRAMEWORK,
+                "DEFAULT_THROTTLE_RATES": {},
+            },
+        ):
+            configure_stripe()
+            try:
+                timings, failures, elapsed = self._run(options)
+            finally:
+                configure_stripe()
+            self._report(options, timings, failures, elapsed, remotes)
+
+    def _run(self, options) -> tuple[dict, dict, float]:
+        stamp = time.time_ns()
+        threads = options["threads"]
+        users = [
+            get_user_model().objects.create_user(
+                f"bench-{stamp}-{index}@example.com", "benchpass"
+            )
+            for index in range(threads)
+        ]
+        book = Books.objects.create(
+            title=f"Remote benchmark {stamp}",
+            author="Benchmark",
+            inventory=threads * options["iterations"],
+            daily_fee=1,
+        )
+        last_ids = {
+            model: model.objects.aggregate(last=Max("id"))["last"] or 0
+            for model in (CheckoutSession, Notification)
+        }
+        expected = (timezone.now() + timedelta(days=7)).isoformat()
+        timings = {step: [] for step in STEPS}
+        failures = {step: 0 for step in STEPS}
+        lock = threading.Lock()
+
+        def timed(step, call) -> bool:
+            started = time.perf_counter()
+            try:
+                ok = call()
+            except Exception:
+                ok = False
+            with lock:
+                timings[step].append(time.perf_counter() - started)
+                failures[step] += not ok
+            return ok
+
+        def customer(user) -> None:
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                for _ in range(options["iterations"]):
+                    self._cycle(
+                        client, book, expected, options["overdue"], timed
+                    )
+            finally:
+                connections.close_all()
+
+        workers = [
+            threading.Thread(target=customer, args=(user,))
+            for user in users
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        for model, last_id in last_ids.items():
+            model.objects.filter(id__gt=last_id).delete()
+        book.delete()
+        for user in users:
+            user.delete()
+        return timings, failures, elapsed
+
+    @staticmethod
+    def _cycle(client, book, expected, overdue, timed) -> None:
+        state = {}
+
+        def borrow() -> bool:
+            res = client.post(
+                reverse("borrowing:borrowing-list"),
+                {"book": book.id, "expected_return_date": expected},
+            )
+            state["id"] = res.data.get("id")
+            return res.status_code == 201
+
+        def pay(type_) -> bool:
+            payment = Payment.objects.get(
+                borrowing_id=state["id"], type=type_
+            )
+            res = client.post(
+                reverse("borrowing:payment-pay", args=[payment.id])
+            )
+            state["session"] = res.data.get("session_id")
+            return res.status_code == 200
+
+        def success() -> bool:
+            session = Payment.objects.get(session_id=state["session"])
+            paid = requests.get(session.session_url, allow_redirects=False)
+            res = client.get(
+                "/api/borrowings/success",
+                {"session_id": state["session"]},
+            )
+            return paid.status_code == 302 and res.status_code == 302
+
+        def return_() -> bool:
+            res = client.post(
+                reverse("borrowing:return_borrowing", args=[state["id"]])
+            )
+            return res.status_code == 200
+
+        def notify() -> bool:
+            deliver_pending_notifications()
+            return True
+
+        if not timed("borrow", borrow):
+            return
+        if timed("pay", lambda: pay("PAYMENT")):
+            timed("success", success)
+        if overdue:
+            Borrowing.objects.filter(id=state["id"]).update(
+                expected_return_date=timezone.now() - timedelta(days=2)
+            )
+        timed("return", return_)
+        if Borrowing.objects.filter(
+            id=state["id"], payments__type="FINE"
+        ).exists():
+            timed("pay_fine", lambda: pay("FINE"))
+        timed("notify", notify)
+
+    def _report(self, options, timings, failures, elapsed, remotes) -> None:
+        cycles = options["threads"] * options["iterations"]
+        self.stdout.write(
+            f"threads={options['threads']} cycles={cycles}"
+            f" elapsed={elapsed:.3f}s"
+            f" throughput={cycles / elapsed:.1f} cycles/s"
+            f" remote_latency={options['latency']}s"
+            f" error_rate={options['error_rate']}"
+            f" throttle_rate={options['throttle_rate']}"
+        )
+        for step in STEPS:
+            samples = sorted(timings[step])
+            if not samples:
+                continue
+            p95 = samples[min(int(len(samples) * 0.95), len(samples) - 1)]
+            self.stdout.write(
+                f"{step:>8}: n={len(samples)} failed={failures[step]}"
+                f" p50={statistics.median(samples) * 1000:.1f}ms"
+                f" p95={p95 * 1000:.1f}ms"
+                f" max={samples[-1] * 1000:.1f}ms"
+            )
+        snapshot = remotes.snapshot()
+        self.stdout.write(
+            json.dumps(
+                {
+                    "fake": {
+                        name: {
+                            key: snapshot[name][key]
+                            for key in ("requests", "errors", "throttled")
+                        }
+                        for name in (STRIPE, TELEGRAM)
+                    },
+                    "clients": integration_stats(),
+                },
+                indent=2,
+            )
+        )
@@ -0,0 +1,219 @@
+import json
+import sqlite3
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Max
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Library_Service_Project.database import TUNED_SQLITE_ENGINE
+from books.models import Books
+from borrowings.models import CheckoutSession, Notification
+
+PROFILES = {
+    "default": ("django.db.backends.sqlite3", "DELETE"),
+    "tuned": (TUNED_SQLITE_ENGINE, "WAL"),
+}
+OPERATIONS = ("borrow", "return", "list")
+
+
+class Command(BaseCommand):
+    help = (
+        "Borrow and return books from writer threads while reader threads"
+        " list borrowings, once on the stock SQLite backend (rollback"
+        " journal, deferred transactions) and once with the tuned"
+        " profile (WAL, SQLITE_PRAGMAS, BEGIN IMMEDIATE for writes), and"
+        " report throughput, latency and \"database is locked\" failures."
+        " Runs against the configured SQLite database, which is left in"
+        " the journal mode it had. Set CELERY_BROKER_URL=memory:// and"
+        " CELERY_RESULT_BACKEND=cache+memory://."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=50,
+            help="borrow/return cycles or lists per thread and profile",
+        )
+        parser.add_argument(
+            "--profiles",
+            nargs="+",
+            choices=PROFILES,
+            default=list(PROFILES),
+        )
+
+    def handle(self, *args, **options) -> None:
+        if connection.vendor != "sqlite":
+            raise CommandError("The default database is not SQLite.")
+        self.path = str(settings.DATABASES["default"]["NAME"])
+        journal_mode = self._journal_mode(None)
+        stamp = time.time_ns()
+        users = [
+            get_user_model().objects.create_user(
+                f"bench-{stamp}-{index}@example.com", "benchpass"
+            )
+            for index in range(options["writers"] + options["readers"])
+        ]
+        book = Books.objects.create(
+            title=f"SQLite benchmark {stamp}",
+            author="Benchmark",
+            # Enough that borrowings left by failed returns never run out.
+            inventory=len(options["profiles"])
+            * options["writers"]
+            * options["iterations"],
+            daily_fee=1,
+        )
+        last_ids = {
+            model: model.objects.aggregate(last=Max("id"))["last"] or 0
+            for model in (CheckoutSession, Notification)
+        }
+        engine = connections.settings["default"]["ENGINE"]
+        try:
+            with override_settings(
+                DEBUG=False,
+                INTERNAL_IPS=[],
+                ALLOWED_HOSTS=["testserver"],
+                JWT_REVOCATION_STORE="local",
+                REST_FRAMEWORK={
+                    **settings.REST_FRAMEWORK,
+                    "DEFAULT_THROTTLE_RATES": {},
+                },
+            ):
+                results = {
+                    name: self._run(name, users, book, options)
+                    for name in options["profiles"]
+                }
+        finally:
+            connections.settings["default"]["ENGINE"] = engine
+            self._journal_mode(journal_mode)
+            for model, last_id in last_ids.items():
+                model.objects.filter(id__gt=last_id).delete()
+            book.delete()
+            for user in users:
+                user.delete()
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def _journal_mode(self, mode: str | None) -> str:
+        """Read or set the journal mode, which outlives connections"""
+        connections.close_all()
+        with sqlite3.connect(self.path) as raw:
+            if mode is None:
+                return raw.execute("PRAGMA journal_mode").fetchone()[0]
+            return raw.execute(f"PRAGMA journal_mode = {mode}").fetchone()[0]
+
+    def _run(self, name, users, book, options) -> dict:
+        engine, journal_mode = PROFILES[name]
+        self._journal_mode(journal_mode)
+        # Connections are built from these settings in each new thread.
+        connections.settings["default"]["ENGINE"] = engine
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        expected = (timezone.now() + timedelta(days=7)).isoformat()
+        timings = {operation: [] for operation in OPERATIONS}
+        failures = {operation: 0 for operation in OPERATIONS}
+        lock = threading.Lock()
+
+        def request(operation, build) -> bytes:
+            statuses = []
+            began = time.perf_counter()
+            response = handler(
+                build().environ,
+                lambda status, headers: statuses.append(status),
+            )
+            body = b"".join(response)
+            response.close()
+            elapsed = time.perf_counter() - began
+            ok = statuses[0].startswith("2")
+            with lock:
+                timings[operation].append(elapsed)
+                failures[operation] += not ok
+            return body if ok else b""
+
+        def writer(header) -> None:
+            for _ in range(options["iterations"]):
+                body = request(
+                    "borrow",
+                    lambda: factory.post(
+                        reverse("borrowing:borrowing-list"),
+                        {"book": book.id, "expected_return_date": expected},
+                        HTTP_AUTHORIZE=header,
+                    ),
+                )
+                if body:
+                    borrowing_id = json.loads(body)["id"]
+                    request(
+                        "return",
+                        lambda: factory.post(
+                            reverse(
+                                "borrowing:return_borrowing",
+                                args=[borrowing_id],
+                            ),
+                            HTTP_AUTHORIZE=header,
+                        ),
+                    )
+
+        def reader(header) -> None:
+            for _ in range(options["iterations"]):
+                request(
+                    "list",
+                    lambda: factory.get(
+                        reverse("borrowing:borrowing-list"),
+                        HTTP_AUTHORIZE=header,
+                    ),
+                )
+
+        def run(role, user) -> None:
+            try:
+                role(f"Bearer {AccessToken.for_user(user)}")
+            finally:
+                connections.close_all()
+
+        roles = [writer] * options["writers"] + [reader] * options["readers"]
+        threads = [
+            threading.Thread(target=run, args=(role, user))
+            for role, user in zip(roles, users)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        result = {"engine": engine, "elapsed": round(elapsed, 3)}
+        for operation in OPERATIONS:
+            samples = sorted(timings[operation])
+            if not samples:
+                continue
+            result[operation] = {
+                "per_second": round(len(samples) / elapsed, 1),
+                "failed": failures[operation],
+                "p50_ms": round(statistics.median(samples) * 1000, 2),
+                "p95_ms": round(
+                    samples[max(int(len(samples) * 0.95) - 1, 0)] * 1000, 2
+                ),
+            }
+        self.stdout.write(
+            f"{name:>8}:"
+            + "".join(
+                f" {operation}={result[operation]['per_second']}/s"
+                f" (p95 {result[operation]['p95_ms']}ms,"
+                f" failed {result[operation]['failed']})"
+                for operation in OPERATIONS
+                if operation in result
+            )
+        )
+        return result
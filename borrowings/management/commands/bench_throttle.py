@@ -0,0 +1,70 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from redis.exceptions import RedisError
+
+from Library_Service_Project import throttling
+from Library_Service_Project.cache import shared_redis
+from Library_Service_Project.throttling import LocalBuckets
+
+
+class Command(BaseCommand):
+    help = (
+        "Report the per-request cost of a token bucket check: one Lua"
+        " script call against the shared Redis (CACHE_REDIS_URL) and the"
+        " per-process buckets used while Redis is down. Buckets are"
+        " spread over --keys throwaway keys that are deleted afterwards."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--requests", type=int, default=20_000)
+        parser.add_argument("--keys", type=int, default=1000)
+        parser.add_argument(
+            "--capacity",
+            type=int,
+            default=30,
+            help="bucket size, as the number of a rate like 30/min",
+        )
+
+    def handle(self, *args, **options) -> None:
+        prefix = f"throttle:bench-{uuid.uuid4().hex}"
+        keys = [f"{prefix}:{index}" for index in range(options["keys"])]
+        capacity = options["capacity"]
+        refill_rate = capacity / 60
+        client = shared_redis()
+        try:
+            client.ping()
+        except (RedisError, OSError) as error:
+            raise CommandError(f"Redis is unreachable: {error}")
+
+        script = throttling._take_token_script()
+        local = LocalBuckets()
+        checks = {
+            "redis": lambda key, now: script(
+                keys=[key], args=[capacity, refill_rate, now]
+            ),
+            "local": lambda key, now: local.take(
+                key, capacity, refill_rate, now
+            ),
+        }
+        try:
+            for mode, check in checks.items():
+                # The first round creates the buckets.
+                for key in keys:
+                    check(key, time.time())
+                timings = []
+                for index in range(options["requests"]):
+                    key = keys[index % len(keys)]
+                    began = time.perf_counter()
+                    check(key, time.time())
+                    timings.append((time.perf_counter() - began) * 1e6)
+                timings.sort()
+                self.stdout.write(
+                    f"{mode:>6}: mean={statistics.fmean(timings):.1f}us"
+                    f" p50={statistics.median(timings):.1f}us"
+                    f" p99={timings[int(len(timings) * 0.99) - 1]:.1f}us"
+                )
+        finally:
+            client.delete(*keys)
@@ -0,0 +1,37 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from borrowings.reconciliation import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = (
+        "Settle pending payments against the Stripe checkout sessions"
+        " created in the last hours and print the report, like the"
+        " periodic reconcile_stripe_payments task."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--hours",
+            type=float,
+            help="look back this many hours instead of"
+                 " STRIPE_RECONCILE_WINDOW",
+        )
+        parser.add_argument(
+            "--max-pages",
+            type=int,
+            help="list API calls allowed, 100 sessions each",
+        )
+
+    def handle(self, *args, **options) -> None:
+        since = None
+        if options["hours"]:
+            since = timezone.now() - timedelta(hours=options["hours"])
+        report = reconcile_payments(
+            since=since, max_pages=options["max_pages"]
+        )
+        self.stdout.write(json.dumps(report, indent=2))
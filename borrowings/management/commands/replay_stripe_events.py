@@ -0,0 +1,130 @@
+import json
+import random
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from borrowings.models import Payment
+from borrowings.webhooks import (
+    SESSION_COMPLETED,
+    SESSION_EXPIRED,
+    apply_pending_events,
+    checkout_event,
+    receive_event,
+    sign_payload,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Stand in for Stripe: sign and deliver checkout session events for"
+        " the pending payments, with redeliveries, then apply them and"
+        " report throughput. Sessions beyond the pending payments get"
+        " made-up ids."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--events", type=int, default=5000)
+        parser.add_argument(
+            "--duplicates",
+            type=float,
+            default=0.1,
+            help="share of events delivered a second time",
+        )
+        parser.add_argument(
+            "--expired",
+            type=float,
+            default=0.1,
+            help="share of sessions that expire instead of being paid",
+        )
+        parser.add_argument(
+            "--url",
+            help="POST to a running server's webhook instead of"
+                 " calling the receiver in process",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options) -> None:
+        secret = settings.STRIPE_WEBHOOK_SECRET
+        if not secret:
+            raise CommandError("STRIPE_WEBHOOK_SECRET is not set")
+        rng = random.Random(options["seed"])
+
+        sessions = list(
+            Payment.objects.filter(status=Payment.Status.PENDING)
+            .exclude(session_id="")
+            .values_list("session_id", flat=True)
+            .distinct()[: options["events"]]
+        )
+        sessions += [
+            f"cs_replay_{number}"
+            for number in range(options["events"] - len(sessions))
+        ]
+        payloads = [
+            json.dumps(
+                checkout_event(
+                    SESSION_EXPIRED
+                    if rng.random() < options["expired"]
+                    else SESSION_COMPLETED,
+                    session_id,
+                )
+            ).encode()
+            for session_id in sessions
+        ]
+        payloads += rng.sample(
+            payloads, int(len(payloads) * options["duplicates"])
+        )
+        rng.shuffle(payloads)
+
+        deliver = self._deliver_in_process
+        if options["url"]:
+            session = requests.Session()
+            deliver = lambda payload, signature: self._deliver_http(  # noqa
+                session, options["url"], payload, signature
+            )
+
+        started = time.perf_counter()
+        stored = sum(
+            deliver(payload, sign_payload(payload, secret))
+            for payload in payloads
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"delivered {len(payloads)} events ({stored} new) in"
+            f" {elapsed:.2f}s, {len(payloads) / elapsed:.0f}/s"
+        )
+        if options["url"]:
+            return
+
+        started = time.perf_counter()
+        applied = batch = apply_pending_events()
+        while batch:
+            batch = apply_pending_events()
+            applied += batch
+        self.stdout.write(
+            f"applied {applied} events in"
+            f" {time.perf_counter() - started:.2f}s"
+        )
+
+    @staticmethod
+    def _deliver_in_process(payload: bytes, signature: str) -> bool:
+        # The events are applied below rather than by a worker.
+        return receive_event(payload, signature, wake_worker=False)
+
+    @staticmethod
+    def _deliver_http(
+        session: requests.Session, url: str, payload: bytes, signature: str
+    ) -> bool:
+        response = session.post(
+            url,
+            data=payload,
+            headers={
+                "Content-Type": "application/json",
+                "Stripe-Signature": signature,
+            },
+            timeout=10,
+        )
+        response.raise_for_status()
+        return True
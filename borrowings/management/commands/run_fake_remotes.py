@@ -0,0 +1,95 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from borrowings.fake_remotes import STRIPE, TELEGRAM, Behaviour, FakeRemotes
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve local stand-ins for the Stripe and Telegram APIs with"
+        " configurable latency and injected failures. Run the service"
+        " with STRIPE_API_BASE and TELEGRAM_API_BASE set to the printed"
+        " URL (and any STRIPE_SECRET_KEY) to load-test it offline."
+        " GET /_fake/stats returns the counters, POST /_fake/config"
+        ' with {"stripe": {"latency": 2}} changes behaviour on the fly.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8099)
+        for name in (STRIPE, TELEGRAM):
+            parser.add_argument(
+                f"--{name}-latency",
+                type=float,
+                default=0.0,
+                help="seconds added to every response",
+            )
+            parser.add_argument(
+                f"--{name}-jitter",
+                type=float,
+                default=0.0,
+                help="up to this many random seconds on top of latency",
+            )
+            parser.add_argument(
+                f"--{name}-error-rate",
+                type=float,
+                default=0.0,
+                help="share of requests answered with a 500",
+            )
+            parser.add_argument(
+                f"--{name}-throttle-rate",
+                type=float,
+                default=0.0,
+                help="share of requests answered with a 429",
+            )
+        parser.add_argument(
+            "--webhook-url",
+            default="",
+            help="service URL receiving checkout.session.completed when"
+                 " a session's payment page is opened",
+        )
+        parser.add_argument(
+            "--report",
+            type=float,
+            default=10.0,
+            help="print the counters every this many seconds, 0 to mute",
+        )
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options) -> None:
+        behaviours = {
+            name: Behaviour(
+                latency=options[f"{name}_latency"],
+                jitter=options[f"{name}_jitter"],
+                error_rate=options[f"{name}_error_rate"],
+                throttle_rate=options[f"{name}_throttle_rate"],
+            )
+            for name in (STRIPE, TELEGRAM)
+        }
+        remotes = FakeRemotes(
+            host=options["host"],
+            port=options["port"],
+            webhook_url=options["webhook_url"],
+            webhook_secret=settings.STRIPE_WEBHOOK_SECRET,
+            seed=options["seed"],
+            **behaviours,
+        )
+        self.stdout.write(
+            f"Serving fake Stripe and Telegram APIs at {remotes.url}\n"
+            f"STRIPE_API_BASE={remotes.url}"
+            f" TELEGRAM_API_BASE={remotes.url}"
+        )
+        remotes.start()
+        try:
+            while True:
+                time.sleep(options["report"] or 60)
+                if options["report"]:
+                    self.stdout.write(json.dumps(remotes.snapshot()))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            remotes.stop()
+            self.stdout.write(json.dumps(remotes.snapshot(), indent=2))
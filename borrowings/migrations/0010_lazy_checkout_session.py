@@ -0,0 +1,35 @@
+# Generated by Django 4.2.5 on 2026-10-18 06:07
+
+from django.db import migrations, models
+
+
+def reopen_expired_payments(apps, schema_editor):
+    # Expired sessions are now replaced on demand, the payment stays due.
+    Payment = apps.get_model("borrowings", "Payment")
+    Payment.objects.filter(status="EXPIRED").update(
+        status="PENDING ", session_url="", session_id=""
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("borrowings", "0009_stripe_event"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="checkoutoutbox",
+            name="session_expires_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="payment",
+            name="status",
+            field=models.CharField(
+                choices=[("PENDING ", "Pending"), ("PAID", "Paid")],
+                default="PENDING ",
+                max_length=25,
+            ),
+        ),
+        migrations.RunPython(reopen_expired_payments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("borrowings", "0010_lazy_checkout_session"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="failed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("borrowings", "0011_notification_failed_at"),
+    ]
+
+    operations = [
+        migrations.RenameModel(
+            old_name="CheckoutOutbox",
+            new_name="CheckoutSession",
+        ),
+    ]
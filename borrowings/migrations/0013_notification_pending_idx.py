@@ -0,0 +1,22 @@
+# Generated by Django 4.2.5 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("borrowings", "0012_rename_checkoutoutbox_checkoutsession"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                condition=models.Q(
+                    ("failed_at__isnull", True), ("sent_at__isnull", True)
+                ),
+                fields=["id"],
+                name="notification_pending_idx",
+            ),
+        ),
+    ]
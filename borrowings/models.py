@@ -1,12 +1,52 @@
 from typing import Any
 
 from django.db import models
+from django.db.models import Count, Exists, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from rest_framework.exceptions import ValidationError
 
 from Library_Service_Project import settings
 from books.models import Books
 
 
+class BorrowingQuerySet(models.QuerySet):
+    def with_payment_summary(self) -> "BorrowingQuerySet":
+        """Annotate what each borrowing owes and has paid, in cents.
+
+        Each figure is a correlated subquery on the borrowing's payments
+        instead of a join: the rows are not multiplied or grouped, and
+        ``count()`` (as the paginator runs it) drops the unused
+        subqueries and counts borrowings alone.
+        """
+        payments = Payment.objects.filter(borrowing=OuterRef("pk")).order_by()
+        pending = payments.filter(status=Payment.Status.PENDING)
+        money = models.DecimalField(max_digits=10, decimal_places=2)
+
+        def total(queryset, aggregate, output_field):
+            return Coalesce(
+                Subquery(
+                    queryset.values("borrowing")
+                    .annotate(total=aggregate)
+                    .values("total")
+                ),
+                Value(0, output_field=output_field),
+                output_field=output_field,
+            )
+
+        return self.annotate(
+            amount_due=total(pending, Sum("money_to_pay"), money),
+            amount_paid=total(
+                payments.filter(status=Payment.Status.PAID),
+                Sum("money_to_pay"),
+                money,
+            ),
+            has_pending_fine=Exists(pending.filter(type=Payment.Type.FINE)),
+            payment_count=total(
+                payments, Count("id"), models.IntegerField()
+            ),
+        )
+
+
 class Borrowing(models.Model):
     borrow_date = models.DateTimeField(auto_now=True)
     expected_return_date = models.DateTimeField()
@@ -25,6 +65,8 @@ class Borrowing(models.Model):
     )
     is_active = models.BooleanField(default=True, null=False)
 
+    objects = BorrowingQuerySet.as_manager()
+
     class Meta:
         models.UniqueConstraint(
             fields=[
@@ -34,6 +76,17 @@ class Borrowing(models.Model):
             ],
             name="unique date",
         )
+        indexes = [
+            models.Index(
+                fields=["user", "is_active"],
+                name="borrowing_user_active_idx",
+            ),
+            models.Index(
+                fields=["expected_return_date"],
+                name="borrowing_active_due_idx",
+                condition=models.Q(is_active=True),
+            ),
+        ]
 
     @staticmethod
     def validate_inventory(inventory: int, error_to_raise: Any) -> None:
@@ -74,6 +127,84 @@ class Borrowing(models.Model):
         )
 
 
+class CheckoutSession(models.Model):
+    """Lease on the Stripe checkout session of payments paid together.
+
+    Rows are written in the same transaction as the payments they cover,
+    but nothing is sent to Stripe then: the session is opened lazily
+    when the customer asks to pay, under a short ``locked_until`` lease
+    so concurrent requests do not open two, and replaced once it has
+    expired. ``processed_at`` is when the current one was opened.
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    session_expires_at = models.DateTimeField(blank=True, null=True)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self) -> str:
+        state = "session opened" if self.processed_at else "pending"
+        return f"Checkout №{self.id}: {state}"
+
+
+class Notification(models.Model):
+    """Telegram message waiting to be delivered by the notification worker"""
+
+    chat_id = models.CharField(max_length=255)
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    claim = models.CharField(max_length=32, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    # Set once TELEGRAM_MAX_ATTEMPTS deliveries failed; never retried.
+    failed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"],
+                name="notification_pending_idx",
+                condition=models.Q(
+                    sent_at__isnull=True, failed_at__isnull=True
+                ),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Notification №{self.id} to {self.chat_id}: {self.text}"
+
+
+class StripeEvent(models.Model):
+    """Checkout webhook event stored on receipt and applied by a worker.
+
+    ``event_id`` is unique, so a redelivered event is stored only once.
+    """
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=64)
+    session_id = models.CharField(max_length=255)
+    payment_status = models.CharField(max_length=32, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    claim = models.CharField(max_length=32, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"],
+                name="stripe_event_pending_idx",
+                condition=models.Q(processed_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.type} {self.event_id}"
+
+
 class Payment(models.Model):
     class Status(models.TextChoices):
         PENDING = "PENDING "
@@ -94,10 +225,22 @@ class Payment(models.Model):
     borrowing = models.ForeignKey(
         Borrowing, related_name="payments", on_delete=models.CASCADE
     )
-    session_url = models.URLField()
-    session_id = models.CharField(max_length=255)
+    checkout = models.ForeignKey(
+        CheckoutSession,
+        related_name="payments",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+    )
+    session_url = models.URLField(max_length=1000, blank=True)
+    session_id = models.CharField(max_length=255, blank=True)
     money_to_pay = models.DecimalField(max_digits=8, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["session_id"], name="payment_session_id_idx"),
+        ]
+
     def __str__(self) -> str:
         return (
             f"{self.id}.Status: {self.status},"
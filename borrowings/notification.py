@@ -1,14 +1,226 @@
+import logging
 import os
+import time
+import uuid
+from datetime import timedelta
 
 import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, QuerySet
+from django.utils import timezone
 
+from borrowings.http_client import CircuitOpenError, get_client
+from borrowings.models import Notification
 
-def send_to_telegram(message: str) -> None:
+logger = logging.getLogger(__name__)
+
+# Telegram refuses messages longer than this many characters.
+TELEGRAM_MESSAGE_LIMIT = 4096
+FLUSH_SCHEDULED_KEY = "borrowings:telegram-flush-scheduled"
+NOTIFICATION_LEASE = timedelta(minutes=2)
+
+_last_sent_at: dict[str, float] = {}
+
+
+class TelegramRateLimited(Exception):
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"Telegram asked to retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def send_to_telegram(message: str, chat_id: str | None = None) -> None:
+    """Post one message to Telegram, raising on any delivery failure"""
     apiToken = os.environ.get("TELEGRAM_BOT_API")
-    chatID = os.environ.get("CHAT_ID")
-    apiURL = f"https://api.telegram.org/bot{apiToken}/sendMessage"
+    chatID = chat_id or os.environ.get("CHAT_ID")
+    apiURL = f"{settings.TELEGRAM_API_BASE}/bot{apiToken}/sendMessage"
+
+    response = get_client("telegram").post(
+        apiURL, json={"chat_id": chatID, "text": message}
+    )
+    if response.status_code == 429:
+        parameters = response.json().get("parameters", {})
+        raise TelegramRateLimited(parameters.get("retry_after", 1))
+    response.raise_for_status()
+
+
+def _schedule_flush() -> None:
+    from borrowings.tasks import flush_notifications
 
+    window = settings.TELEGRAM_BATCH_WINDOW
+    # Only the first message of a window schedules a flush; the rest
+    # ride along with it.
+    if not cache.add(FLUSH_SCHEDULED_KEY, True, window):
+        return
     try:
-        requests.post(apiURL, json={"chat_id": chatID, "text": message})
+        flush_notifications.apply_async(countdown=window)
     except Exception as error:
-        print(error)
+        cache.delete(FLUSH_SCHEDULED_KEY)
+        logger.warning("Could not schedule notification flush: %s", error)
+
+
+def notify(message: str) -> None:
+    """Queue a Telegram message; it is sent after the transaction commits"""
+    Notification.objects.create(
+        chat_id=os.environ.get("CHAT_ID", ""), text=message
+    )
+    transaction.on_commit(_schedule_flush)
+
+
+def notify_many(messages: list[str]) -> None:
+    """Queue several Telegram messages with a single INSERT"""
+    if not messages:
+        return
+    chat_id = os.environ.get("CHAT_ID", "")
+    Notification.objects.bulk_create(
+        Notification(chat_id=chat_id, text=message) for message in messages
+    )
+    transaction.on_commit(_schedule_flush)
+
+
+def _coalesce_rows(rows: list[tuple[int, str]]) -> list[tuple[str, list]]:
+    """Join (id, message) rows into Telegram-sized (text, ids) batches"""
+    batches = []
+    current, ids = "", []
+    for row_id, message in rows:
+        message = message[:TELEGRAM_MESSAGE_LIMIT]
+        length = len(current) + 1 + len(message)
+        if current and length > TELEGRAM_MESSAGE_LIMIT:
+            batches.append((current, ids))
+            current, ids = "", []
+        current = f"{current}\n{message}" if current else message
+        ids.append(row_id)
+    if current:
+        batches.append((current, ids))
+    return batches
+
+
+def coalesce(messages: list[str]) -> list[str]:
+    """Join messages into as few Telegram-sized texts as possible"""
+    return [text for text, _ in _coalesce_rows(list(enumerate(messages)))]
+
+
+def _wait_for_chat_slot(chat_id: str) -> None:
+    interval = settings.TELEGRAM_CHAT_MIN_INTERVAL
+    elapsed = time.monotonic() - _last_sent_at.get(chat_id, 0.0)
+    if elapsed < interval:
+        time.sleep(interval - elapsed)
+    _last_sent_at[chat_id] = time.monotonic()
+
+
+def _claimable(now) -> QuerySet[Notification]:
+    # sent_at and failed_at IS NULL, exactly as in the
+    # notification_pending_idx condition, or the planner cannot use the
+    # partial index.
+    return Notification.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        sent_at__isnull=True,
+        failed_at__isnull=True,
+    )
+
+
+def _claim_pending(limit: int) -> str:
+    now = timezone.now()
+    claim = uuid.uuid4().hex
+    pending = _claimable(now).order_by("id").values_list("id", flat=True)
+    _claimable(now).filter(id__in=list(pending[:limit])).update(
+        claim=claim, locked_until=now + NOTIFICATION_LEASE
+    )
+    return claim
+
+
+NOTIFICATION_BATCH_SIZE = 500
+# Delivered notifications deleted per DELETE while pruning.
+PRUNE_CHUNK_SIZE = 10_000
+
+
+def _release_failed(ids: list[int], counted: bool = True) -> None:
+    """Release ``ids`` for another attempt, or give up on them.
+
+    Only ``counted`` failures use up one of TELEGRAM_MAX_ATTEMPTS.
+    """
+    if not counted:
+        Notification.objects.filter(id__in=ids).update(
+            claim="", locked_until=None
+        )
+        return
+    Notification.objects.filter(id__in=ids).update(
+        claim="", locked_until=None, attempts=F("attempts") + 1
+    )
+    given_up = Notification.objects.filter(
+        id__in=ids, attempts__gte=settings.TELEGRAM_MAX_ATTEMPTS
+    ).update(failed_at=timezone.now())
+    if given_up:
+        logger.error(
+            "Gave up on %s notifications after %s attempts",
+            given_up,
+            settings.TELEGRAM_MAX_ATTEMPTS,
+        )
+
+
+def deliver_pending_notifications(
+    limit: int = NOTIFICATION_BATCH_SIZE,
+) -> int:
+    """Send queued notifications as one coalesced message per chat.
+
+    Rows are claimed under a lease, so concurrent flushes never send the
+    same message twice. Each coalesced message is marked sent as soon as
+    Telegram accepts it; when one fails, the rest of that chat's rows are
+    released for the next attempt and the error is re-raised. Rows are
+    marked failed after TELEGRAM_MAX_ATTEMPTS failed sends; an open
+    circuit or a Telegram 429 does not count as one. Returns the
+    number of notifications delivered.
+    """
+    claim = _claim_pending(limit)
+    rows = Notification.objects.filter(claim=claim).order_by("id")
+    by_chat: dict[str, list[tuple[int, str]]] = {}
+    for row_id, chat_id, text in rows.values_list("id", "chat_id", "text"):
+        by_chat.setdefault(chat_id, []).append((row_id, text))
+
+    delivered = 0
+    failure = None
+    for chat_id, chat_rows in by_chat.items():
+        unsent = [row_id for row_id, _ in chat_rows]
+        try:
+            for text, ids in _coalesce_rows(chat_rows):
+                _wait_for_chat_slot(chat_id)
+                send_to_telegram(text, chat_id=chat_id)
+                Notification.objects.filter(id__in=ids).update(
+                    sent_at=timezone.now(), locked_until=None
+                )
+                delivered += len(ids)
+                unsent = unsent[len(ids):]
+        except (requests.RequestException, TelegramRateLimited) as error:
+            # Neither an open circuit nor a 429 means the message itself
+            # could not be delivered.
+            _release_failed(
+                unsent,
+                counted=not isinstance(
+                    error, (CircuitOpenError, TelegramRateLimited)
+                ),
+            )
+            failure = failure or error
+
+    if failure is not None:
+        raise failure
+    return delivered
+
+
+def prune_delivered_notifications(chunk_size: int = PRUNE_CHUNK_SIZE) -> int:
+    """Delete notifications delivered more than NOTIFICATION_RETENTION ago.
+
+    Rows go in chunks of ``chunk_size`` ids, so no single DELETE holds
+    the table for long. Failed rows are kept for inspection. Returns the
+    number of rows deleted.
+    """
+    cutoff = timezone.now() - settings.NOTIFICATION_RETENTION
+    delivered = Notification.objects.filter(sent_at__lt=cutoff)
+    deleted = 0
+    while True:
+        ids = list(
+            delivered.order_by("id").values_list("id", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+        deleted += Notification.objects.filter(id__in=ids).delete()[0]
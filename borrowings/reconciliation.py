@@ -0,0 +1,159 @@
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from borrowings.models import Payment
+from borrowings.notification import notify
+from borrowings.webhooks import PAID_STATUSES, settle_payments
+
+logger = logging.getLogger(__name__)
+
+# The Stripe list API returns at most 100 sessions per call.
+SESSIONS_PAGE_SIZE = 100
+RECONCILE_BATCH_SIZE = 1000
+MAX_REPORTED_SESSIONS = 100
+# Discrepancies that reconciliation cannot repair by itself.
+UNKNOWN_SESSION = "unknown_session"
+AMOUNT_MISMATCH = "amount_mismatch"
+UNPAID_REMOTELY = "unpaid_remotely"
+DISCREPANCIES = (UNKNOWN_SESSION, AMOUNT_MISMATCH, UNPAID_REMOTELY)
+
+
+@dataclass
+class ReconciliationReport:
+    api_calls: int = 0
+    sessions: int = 0
+    paid: int = 0
+    expired: int = 0
+    truncated: bool = False
+    discrepancies: dict[str, int] = field(
+        default_factory=lambda: dict.fromkeys(DISCREPANCIES, 0)
+    )
+    examples: dict[str, list[str]] = field(
+        default_factory=lambda: {kind: [] for kind in DISCREPANCIES}
+    )
+
+    def flag(self, kind: str, session_id: str) -> None:
+        self.discrepancies[kind] += 1
+        if len(self.examples[kind]) < MAX_REPORTED_SESSIONS:
+            self.examples[kind].append(session_id)
+
+    def as_dict(self) -> dict:
+        return {
+            "api_calls": self.api_calls,
+            "sessions": self.sessions,
+            "paid": self.paid,
+            "expired": self.expired,
+            "truncated": self.truncated,
+            "discrepancies": self.discrepancies,
+            "examples": self.examples,
+        }
+
+
+def _reconcile_batch(sessions: list, report: ReconciliationReport) -> None:
+    """Compare one batch of sessions with their payments and settle them.
+
+    One SELECT, then two UPDATEs and a notification INSERT at most.
+    """
+    by_id = {session.id: session for session in sessions}
+    payments: dict[str, list[tuple]] = {}
+    for row in Payment.objects.filter(session_id__in=by_id).values_list(
+        "id", "session_id", "status", "type", "money_to_pay"
+    ):
+        payments.setdefault(row[1], []).append(row)
+
+    paid = []
+    expired = set()
+    for session_id, session in by_id.items():
+        session_paid = (
+            session.status == "complete"
+            and session.payment_status in PAID_STATUSES
+        )
+        rows = payments.get(session_id)
+        if not rows:
+            if session_paid:
+                # Money was taken for a session no payment points at.
+                report.flag(UNKNOWN_SESSION, session_id)
+            continue
+        amount = sum(int(row[4]) for row in rows)
+        amount_total = session.get("amount_total")
+        if amount_total is not None and amount_total != amount:
+            report.flag(AMOUNT_MISMATCH, session_id)
+        pending = [
+            (payment_id, type_, money_to_pay)
+            for payment_id, _, status, type_, money_to_pay in rows
+            if status == Payment.Status.PENDING
+        ]
+        if session_paid:
+            paid += pending
+        elif pending and session.status == "expired":
+            expired.add(session_id)
+        elif len(pending) < len(rows):
+            report.flag(UNPAID_REMOTELY, session_id)
+
+    if paid or expired:
+        with transaction.atomic():
+            settle_payments(paid, expired)
+    report.paid += len(paid)
+    report.expired += len(expired)
+
+
+def reconcile_payments(
+    since: datetime | None = None,
+    batch_size: int = RECONCILE_BATCH_SIZE,
+    max_pages: int | None = None,
+) -> dict:
+    """Bring pending payments in line with the sessions Stripe knows.
+
+    Pages through the checkout sessions created since ``since`` (by
+    default within ``STRIPE_RECONCILE_WINDOW``) with the list API and
+    settles each batch of ``batch_size`` sessions with a fixed number of
+    queries: sessions paid at Stripe mark their pending payments paid,
+    expired ones are dropped so a new session can be opened. A run costs
+    one API call per 100 sessions and stops after ``max_pages`` calls.
+    Sessions that cannot be repaired locally are reported.
+    """
+    since = since or timezone.now() - settings.STRIPE_RECONCILE_WINDOW
+    max_pages = max_pages or settings.STRIPE_RECONCILE_MAX_PAGES
+    params = {
+        "limit": SESSIONS_PAGE_SIZE,
+        "created": {"gte": int(since.timestamp())},
+    }
+    report = ReconciliationReport()
+    batch = []
+    while True:
+        if report.api_calls == max_pages:
+            report.truncated = True
+            break
+        page = stripe.checkout.Session.list(**params)
+        report.api_calls += 1
+        report.sessions += len(page.data)
+        batch += page.data
+        if len(batch) >= batch_size:
+            _reconcile_batch(batch, report)
+            batch = []
+        if not page.has_more or not page.data:
+            break
+        params["starting_after"] = page.data[-1].id
+    if batch:
+        _reconcile_batch(batch, report)
+
+    result = report.as_dict()
+    if any(report.discrepancies.values()):
+        logger.warning("Stripe reconciliation discrepancies: %s", result)
+        notify(
+            "Stripe reconciliation needs attention: "
+            + ", ".join(
+                f"{kind}: {count}"
+                for kind, count in report.discrepancies.items()
+                if count
+            )
+        )
+    else:
+        logger.info("Stripe reconciliation: %s", result)
+    return result
@@ -0,0 +1,91 @@
+from collections import Counter
+
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from Library_Service_Project.sqlite import write_atomic
+from books.models import Books
+from borrowings.checkout import record_payments
+from borrowings.models import Borrowing
+from borrowings.notification import notify_many
+
+RETURNED = "returned"
+ALREADY_RETURNED = "already_returned"
+NOT_FOUND = "not_found"
+
+
+class ReturnConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = (
+        "Some of the borrowings were returned by another request,"
+        " nothing was changed. Please retry."
+    )
+    default_code = "return_conflict"
+
+
+def return_borrowings(queryset: QuerySet[Borrowing], ids: list[int]) -> list:
+    """Return every active borrowing of ``ids`` found in ``queryset``.
+
+    Runs a fixed number of statements whatever the number of ids: one
+    read, one bulk UPDATE of the borrowings, one UPDATE for the
+    inventory of all their books, one batch of fines and one INSERT of
+    notifications. Returns one result per distinct id, in input order.
+    """
+    ids = list(dict.fromkeys(ids))
+    with write_atomic():
+        found = queryset.select_related("book").in_bulk(ids)
+        returned = [
+            found[pk] for pk in ids if pk in found and found[pk].is_active
+        ]
+        now = timezone.now()
+        if returned:
+            updated = Borrowing.objects.filter(
+                id__in=[borrowing.id for borrowing in returned],
+                is_active=True,
+            ).update(is_active=False, actual_return_date=now)
+            if updated != len(returned):
+                raise ReturnConflict()
+            Books.objects.return_copies(
+                Counter(borrowing.book_id for borrowing in returned)
+            )
+            for borrowing in returned:
+                borrowing.is_active = False
+                borrowing.actual_return_date = now
+
+        fines = record_payments(
+            [
+                borrowing
+                for borrowing in returned
+                if now > borrowing.expected_return_date
+            ],
+            type_="FINE",
+        )
+        notify_many(
+            [
+                f"Borrowing №: {borrowing.id},"
+                f" Title: {borrowing.book} was returned at: {now}"
+                for borrowing in returned
+            ]
+        )
+
+    returned_ids = {borrowing.id for borrowing in returned}
+    results = []
+    for pk in ids:
+        if pk not in found:
+            results.append({"id": pk, "status": NOT_FOUND, "fine": None})
+        elif pk not in returned_ids:
+            results.append(
+                {"id": pk, "status": ALREADY_RETURNED, "fine": None}
+            )
+        else:
+            fine = fines.get(pk)
+            results.append(
+                {
+                    "id": pk,
+                    "status": RETURNED,
+                    "fine": fine.money_to_pay if fine else None,
+                }
+            )
+    return results
@@ -81,8 +81,20 @@ class BorrowingDetailSerializer(BorrowingSerializer):
 
 
 class BorrowingListSerializer(BorrowingSerializer):
+    """Borrowing with a payment summary.
+
+    Expects a queryset annotated by ``with_payment_summary()``.
+    """
+
     book = serializers.StringRelatedField(many=False)
-    payments = serializers.StringRelatedField(many=True, read_only=True)
+    amount_due = serializers.DecimalField(
+        max_digits=10, decimal_places=2, read_only=True
+    )
+    amount_paid = serializers.DecimalField(
+        max_digits=10, decimal_places=2, read_only=True
+    )
+    has_pending_fine = serializers.BooleanField(read_only=True)
+    payment_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Borrowing
@@ -93,7 +105,10 @@ class BorrowingListSerializer(BorrowingSerializer):
             "actual_return_date",
             "book",
             "is_active",
-            "payments",
+            "amount_due",
+            "amount_paid",
+            "has_pending_fine",
+            "payment_count",
         )
 
 
@@ -113,3 +128,52 @@ class PaymentsDetailSerializer(PaymentsSerializer):
             "session_id",
             "money_to_pay",
         )
+
+
+class PaymentCheckoutSerializer(serializers.ModelSerializer):
+    session_expires_at = serializers.DateTimeField(
+        source="checkout.session_expires_at", read_only=True
+    )
+
+    class Meta:
+        model = Payment
+        fields = (
+            "id",
+            "status",
+            "money_to_pay",
+            "session_url",
+            "session_id",
+            "session_expires_at",
+        )
+
+
+class BorrowingCartSerializer(serializers.Serializer):
+    books = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=20,
+    )
+    expected_return_date = serializers.DateTimeField()
+
+
+class BorrowingCartResultSerializer(serializers.Serializer):
+    borrowings = BorrowingSerializer(many=True)
+    payments = PaymentsListSerializer(many=True)
+
+
+class BorrowingBulkReturnSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=200,
+    )
+
+
+class BorrowingReturnResultSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(
+        choices=("returned", "already_returned", "not_found")
+    )
+    fine = serializers.IntegerField(
+        allow_null=True, help_text="Fine in cents, if one is due"
+    )
@@ -1,22 +1,174 @@
+import logging
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterator
+
+import requests
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils import timezone
+
 from borrowings.models import Borrowing
 
-from celery import shared_task
-from datetime import date, timedelta
-from borrowings.notification import send_to_telegram
+from celery import chord, shared_task
+from datetime import date, datetime, time, timedelta
+from borrowings.reconciliation import reconcile_payments
+from borrowings.webhooks import EVENT_BATCH_SIZE, apply_pending_events
+from borrowings.notification import (
+    NOTIFICATION_BATCH_SIZE,
+    TelegramRateLimited,
+    deliver_pending_notifications,
+    notify,
+    notify_many,
+    prune_delivered_notifications,
+)
+
+logger = logging.getLogger(__name__)
+
+# Due borrowings per digest task; one chunk has to be digested well
+# within CELERY_TASK_TIME_LIMIT.
+OVERDUE_CHUNK_SIZE = 10_000
+
+
+def _due_borrowings(due: date) -> QuerySet[Borrowing]:
+    due_at = timezone.make_aware(datetime.combine(due, time.min))
+    # is_active=True, exactly as in the borrowing_active_due_idx
+    # condition, or the planner cannot use the partial index.
+    return Borrowing.objects.filter(
+        is_active=True, expected_return_date__lt=due_at
+    )
+
+
+def user_ranges(
+    queryset: QuerySet[Borrowing], chunk_size: int
+) -> Iterator[tuple[int | None, int | None]]:
+    """Split ``queryset`` into ranges of user ids of about ``chunk_size`` rows.
+
+    Ranges are (after, up_to] pairs; a range never splits one user's
+    borrowings, so each user ends up in exactly one chunk. Boundaries are
+    found by skipping ``chunk_size`` rows along the user index instead of
+    loading the rows.
+    """
+    user_ids = queryset.order_by("user_id").values_list("user_id", flat=True)
+    after = None
+    while True:
+        remaining = user_ids
+        if after is not None:
+            remaining = user_ids.filter(user_id__gt=after)
+        boundary = remaining[chunk_size - 1:chunk_size].first()
+        if boundary is None:
+            if remaining.exists():
+                yield after, None
+            return
+        yield after, boundary
+        after = boundary
+
+
+def overdue_digest(user_id: int, rows: list[tuple]) -> str:
+    lines = [f"Customer{user_id}: {len(rows)} book(s) due for return"]
+    lines += [
+        f"Title: {title}, expected return date: {expected_return_date}"
+        for _, title, expected_return_date in rows
+    ]
+    return "\n".join(lines)
+
+
+@shared_task
+def send_message_about_borrowing_books() -> int:
+    """Queue one reminder digest per user with borrowings due soon.
+
+    The due borrowings are cut into user ranges that are digested by
+    parallel ``send_overdue_digests`` tasks; ``report_overdue_reminders``
+    totals their results. Returns the number of chunks dispatched.
+    """
+    due = date.today() + timedelta(days=2)
+    ranges = list(user_ranges(_due_borrowings(due), OVERDUE_CHUNK_SIZE))
+    if not ranges:
+        notify("No borrowings overdue today!")
+        return 0
+    chord(
+        send_overdue_digests.s(after, up_to, due.isoformat())
+        for after, up_to in ranges
+    )(report_overdue_reminders.s())
+    return len(ranges)
 
 
 @shared_task
-def send_message_about_borrowing_books() -> None:
-    tomorrow = date.today() + timedelta(days=2)
-    borrowing_book = Borrowing.objects.filter(
-        is_active=True, expected_return_date__lt=tomorrow
+def send_overdue_digests(
+    after: int | None, up_to: int | None, due: str
+) -> dict:
+    """Queue reminder digests for the users in the range (after, up_to]"""
+    queryset = _due_borrowings(date.fromisoformat(due))
+    if after is not None:
+        queryset = queryset.filter(user_id__gt=after)
+    if up_to is not None:
+        queryset = queryset.filter(user_id__lte=up_to)
+    rows = (
+        queryset.order_by("user_id", "id")
+        .values_list("user_id", "book__title", "expected_return_date")
+        .iterator(chunk_size=2000)
     )
-    if len(borrowing_book) > 0:
-        for book in borrowing_book:
-            send_to_telegram(
-                f"Title: {book.book.title},"
-                f" expected return date: {book.expected_return_date},"
-                f" Customer{book.user.id}"
-            )
-    else:
-        send_to_telegram("No borrowings overdue today!")
+    digests = []
+    users = borrowings = 0
+    for user_id, user_rows in groupby(rows, key=itemgetter(0)):
+        user_rows = list(user_rows)
+        users += 1
+        borrowings += len(user_rows)
+        digests.append(overdue_digest(user_id, user_rows))
+        if len(digests) >= NOTIFICATION_BATCH_SIZE:
+            notify_many(digests)
+            digests = []
+    notify_many(digests)
+    return {"users": users, "borrowings": borrowings}
+
+
+@shared_task
+def report_overdue_reminders(results: list[dict]) -> dict:
+    total = {
+        "users": sum(result["users"] for result in results),
+        "borrowings": sum(result["borrowings"] for result in results),
+    }
+    logger.info("Queued overdue reminders: %s", total)
+    notify(
+        f"Overdue reminders: {total['borrowings']} borrowings"
+        f" of {total['users']} customers"
+    )
+    return total
+
+
+@shared_task
+def apply_stripe_events() -> int:
+    """Apply received Stripe webhook events to payments, batch by batch"""
+    applied = batch = apply_pending_events()
+    while batch == EVENT_BATCH_SIZE:
+        batch = apply_pending_events()
+        applied += batch
+    return applied
+
+
+@shared_task
+def reconcile_stripe_payments() -> dict:
+    """Settle pending payments against recent Stripe checkout sessions"""
+    return reconcile_payments()
+
+
+@shared_task(bind=True, max_retries=8)
+def flush_notifications(self) -> int:
+    """Deliver queued Telegram messages, coalesced per chat"""
+    try:
+        delivered = deliver_pending_notifications()
+    except TelegramRateLimited as error:
+        raise self.retry(exc=error, countdown=error.retry_after)
+    except requests.RequestException as error:
+        countdown = settings.TELEGRAM_BATCH_WINDOW * 2 ** self.request.retries
+        raise self.retry(exc=error, countdown=countdown)
+    if delivered == NOTIFICATION_BATCH_SIZE:
+        # A full batch means more is waiting; don't leave it for beat.
+        flush_notifications.apply_async()
+    return delivered
+
+
+@shared_task
+def prune_notifications() -> int:
+    """Delete notifications delivered longer ago than the retention"""
+    return prune_delivered_notifications()
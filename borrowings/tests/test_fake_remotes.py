@@ -0,0 +1,131 @@
+import json
+from datetime import timedelta
+
+import requests
+import stripe
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from books.models import Books
+from borrowings import http_client
+from borrowings.checkout import checkout_session, record_payment
+from borrowings.fake_remotes import Behaviour, FakeRemotes
+from borrowings.http_client import configure_stripe
+from borrowings.models import Borrowing, CheckoutSession
+from borrowings.notification import TelegramRateLimited, send_to_telegram
+
+
+class FakeRemotesTests(TestCase):
+    def setUp(self):
+        http_client._clients.clear()
+        self.remotes = FakeRemotes(seed=1).start()
+        self.addCleanup(self.remotes.stop)
+        overrides = override_settings(
+            STRIPE_API_BASE=self.remotes.url,
+            TELEGRAM_API_BASE=self.remotes.url,
+            STRIPE_SECRET_KEY="sk_test_fake",
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        configure_stripe()
+        self.addCleanup(configure_stripe)
+        self.addCleanup(http_client._clients.clear)
+
+    def sample_borrowing(self):
+        user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        book = Books.objects.create(
+            title="Dune", author="Frank Herbert", inventory=1, daily_fee=10
+        )
+        return Borrowing.objects.create(
+            user=user,
+            book=book,
+            expected_return_date=timezone.now() + timedelta(days=2),
+        )
+
+    def test_checkout_session_created_by_fake(self):
+        payment = checkout_session(
+            record_payment(self.sample_borrowing(), type_="PAYMENT")
+        )
+
+        session = self.remotes.sessions[payment.session_id]
+        self.assertEqual(session["amount_total"], int(payment.money_to_pay))
+        self.assertEqual(payment.session_url, session["url"])
+        self.assertEqual(self.remotes.snapshot()["stripe"]["requests"], 1)
+
+    def test_expiring_session_replaced(self):
+        payment = checkout_session(
+            record_payment(self.sample_borrowing(), type_="PAYMENT")
+        )
+        old_session = payment.session_id
+        CheckoutSession.objects.filter(pk=payment.checkout_id).update(
+            session_expires_at=timezone.now() + timedelta(minutes=1)
+        )
+
+        payment = checkout_session(payment)
+
+        self.assertNotEqual(payment.session_id, old_session)
+        self.assertEqual(self.remotes.sessions[old_session]["status"], "expired")
+
+    def test_paying_redirects_to_success_url(self):
+        session = stripe.checkout.Session.create(
+            success_url="http://testserver/success?session_id="
+                        "{CHECKOUT_SESSION_ID}",
+            mode="payment",
+        )
+
+        res = requests.get(session.url, allow_redirects=False)
+
+        self.assertEqual(res.status_code, 302)
+        self.assertTrue(res.headers["Location"].endswith(session.id))
+        retrieved = stripe.checkout.Session.retrieve(session.id)
+        self.assertEqual(retrieved.payment_status, "paid")
+
+    def test_sessions_listed_newest_first_in_pages(self):
+        created = [
+            stripe.checkout.Session.create(mode="payment").id
+            for _ in range(3)
+        ]
+
+        listed = [
+            session.id
+            for session in stripe.checkout.Session.list(
+                limit=2
+            ).auto_paging_iter()
+        ]
+
+        self.assertEqual(listed, created[::-1])
+
+    def test_telegram_message_sent(self):
+        send_to_telegram("hello", chat_id="1")
+
+        stats = self.remotes.snapshot()["telegram"]
+        self.assertEqual(stats["requests"], 1)
+        self.assertEqual(stats["errors"], 0)
+
+    def test_injected_failures_counted(self):
+        self.remotes.configure(
+            {"telegram": {"throttle_rate": 1}, "stripe": {"error_rate": 1}}
+        )
+
+        with self.assertRaises(TelegramRateLimited):
+            send_to_telegram("hello", chat_id="1")
+        with self.assertRaises(stripe.error.APIError):
+            stripe.checkout.Session.create(mode="payment")
+
+        snapshot = self.remotes.snapshot()
+        self.assertEqual(snapshot["telegram"]["throttled"], 1)
+        self.assertEqual(snapshot["stripe"]["errors"], 1)
+
+    def test_control_endpoints(self):
+        res = requests.post(
+            f"{self.remotes.url}/_fake/config",
+            data=json.dumps({"stripe": {"latency": 0.01}}),
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.remotes.behaviour["stripe"], Behaviour(0.01))
+        stats = requests.get(f"{self.remotes.url}/_fake/stats").json()
+        self.assertEqual(stats["stripe"]["behaviour"]["latency"], 0.01)
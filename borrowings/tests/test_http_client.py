@@ -0,0 +1,132 @@
+from unittest.mock import patch
+
+import requests
+import stripe
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from borrowings import http_client
+from borrowings.http_client import (
+    CircuitBreaker,
+    CircuitOpenError,
+    OutboundClient,
+    StripeHttpClient,
+    get_client,
+)
+
+INTEGRATIONS_URL = reverse("borrowing:integrations_status")
+
+
+def http_response(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+class CircuitBreakerTests(TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+    def test_half_open_lets_single_probe_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+
+
+class OutboundClientTests(TestCase):
+    def setUp(self):
+        self.client = OutboundClient(
+            "test", timeout=(1, 2), failure_threshold=2, reset_timeout=60
+        )
+
+    @patch("requests.Session.request")
+    def test_request_uses_default_timeout_and_counts(self, mock_request):
+        mock_request.return_value = http_response(200)
+
+        self.client.post("https://example.com", json={})
+
+        self.assertEqual(mock_request.call_args.kwargs["timeout"], (1, 2))
+        stats = self.client.stats.snapshot()
+        self.assertEqual(stats["calls"], 1)
+        self.assertEqual(stats["errors"], 0)
+
+    @patch("requests.Session.request")
+    def test_fails_fast_once_remote_is_down(self, mock_request):
+        mock_request.side_effect = requests.ConnectTimeout("timeout")
+
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectTimeout):
+                self.client.post("https://example.com")
+        with self.assertRaises(CircuitOpenError):
+            self.client.post("https://example.com")
+
+        self.assertEqual(mock_request.call_count, 2)
+        stats = self.client.stats.snapshot()
+        self.assertEqual(stats["errors"], 2)
+        self.assertEqual(stats["rejected"], 1)
+
+    @patch("requests.Session.request")
+    def test_server_errors_count_as_failures(self, mock_request):
+        mock_request.return_value = http_response(503)
+
+        self.client.post("https://example.com")
+        self.client.post("https://example.com")
+
+        self.assertEqual(self.client.breaker.state, "open")
+
+
+class StripeHttpClientTests(TestCase):
+    def setUp(self):
+        http_client._clients.clear()
+
+    def test_open_circuit_surfaces_as_stripe_error(self):
+        get_client("stripe").breaker.opened_at = float("inf")
+
+        with self.assertRaises(stripe.error.APIConnectionError):
+            StripeHttpClient().request("post", "https://api.stripe.com", {})
+
+    def test_sdk_is_configured_once(self):
+        self.assertIsInstance(stripe.default_http_client, StripeHttpClient)
+
+
+class IntegrationsStatusApiTests(TestCase):
+    def setUp(self):
+        http_client._clients.clear()
+        self.client = APIClient()
+
+    def test_integrations_status_requires_staff(self):
+        user = get_user_model().objects.create_user("test@test.com", "pass")
+        self.client.force_authenticate(user)
+
+        res = self.client.get(INTEGRATIONS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_integrations_status_reports_counters(self):
+        user = get_user_model().objects.create_user(
+            "admin@admin.com", "pass", is_staff=True
+        )
+        self.client.force_authenticate(user)
+        get_client("telegram")
+
+        res = self.client.get(INTEGRATIONS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["telegram"]["circuit"], "closed")
+        self.assertEqual(res.data["telegram"]["calls"], 0)
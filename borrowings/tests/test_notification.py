@@ -0,0 +1,181 @@
+import json
+from datetime import timedelta
+from unittest.mock import patch
+
+import requests
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from borrowings import http_client
+from borrowings.http_client import CircuitOpenError
+from borrowings.models import Notification
+from borrowings.notification import (
+    TELEGRAM_MESSAGE_LIMIT,
+    TelegramRateLimited,
+    coalesce,
+    deliver_pending_notifications,
+    notify,
+    prune_delivered_notifications,
+)
+
+
+def telegram_response(status_code=200, payload=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(payload or {}).encode()
+    return response
+
+
+@override_settings(TELEGRAM_CHAT_MIN_INTERVAL=0)
+class NotificationPipelineTests(TestCase):
+    def setUp(self):
+        http_client._clients.clear()
+
+    @patch("requests.Session.request")
+    def test_notify_only_queues_message(self, mock_post):
+        notify("Borrowing №: 1")
+
+        mock_post.assert_not_called()
+        notification = Notification.objects.get()
+        self.assertEqual(notification.text, "Borrowing №: 1")
+        self.assertIsNone(notification.sent_at)
+
+    @patch("requests.Session.request")
+    def test_deliver_coalesces_queued_messages(self, mock_post):
+        mock_post.return_value = telegram_response()
+        for number in range(3):
+            notify(f"Borrowing №: {number}")
+
+        delivered = deliver_pending_notifications()
+
+        self.assertEqual(delivered, 3)
+        mock_post.assert_called_once()
+        self.assertEqual(
+            mock_post.call_args.kwargs["json"]["text"],
+            "Borrowing №: 0\nBorrowing №: 1\nBorrowing №: 2",
+        )
+        self.assertFalse(Notification.objects.filter(sent_at__isnull=True))
+        self.assertEqual(deliver_pending_notifications(), 0)
+
+    @patch("requests.Session.request")
+    def test_failed_delivery_releases_messages(self, mock_post):
+        mock_post.side_effect = requests.ConnectionError("down")
+        notify("Borrowing №: 1")
+
+        with self.assertRaises(requests.ConnectionError):
+            deliver_pending_notifications()
+
+        notification = Notification.objects.get()
+        self.assertIsNone(notification.sent_at)
+        self.assertIsNone(notification.locked_until)
+        self.assertEqual(notification.attempts, 1)
+
+    @patch("requests.Session.request")
+    def test_delivered_chunks_stay_sent_when_a_later_one_fails(
+        self, mock_post
+    ):
+        mock_post.side_effect = [
+            telegram_response(),
+            requests.ConnectionError("down"),
+        ]
+        first = Notification.objects.create(
+            chat_id="1", text="a" * TELEGRAM_MESSAGE_LIMIT
+        )
+        second = Notification.objects.create(chat_id="1", text="b")
+
+        with self.assertRaises(requests.ConnectionError):
+            deliver_pending_notifications()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIsNotNone(first.sent_at)
+        self.assertIsNone(second.sent_at)
+        self.assertEqual(second.attempts, 1)
+
+    @override_settings(TELEGRAM_MAX_ATTEMPTS=2)
+    @patch("requests.Session.request")
+    def test_delivery_given_up_after_max_attempts(self, mock_post):
+        mock_post.side_effect = requests.ConnectionError("down")
+        notify("Borrowing №: 1")
+
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectionError):
+                deliver_pending_notifications()
+
+        notification = Notification.objects.get()
+        self.assertIsNotNone(notification.failed_at)
+        self.assertEqual(deliver_pending_notifications(), 0)
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch("requests.Session.request")
+    def test_rate_limit_reports_retry_after(self, mock_post):
+        mock_post.return_value = telegram_response(
+            429, {"ok": False, "parameters": {"retry_after": 7}}
+        )
+        notify("Borrowing №: 1")
+
+        with self.assertRaises(TelegramRateLimited) as context:
+            deliver_pending_notifications()
+
+        self.assertEqual(context.exception.retry_after, 7)
+
+    @override_settings(TELEGRAM_MAX_ATTEMPTS=1)
+    @patch("requests.Session.request")
+    def test_rate_limit_does_not_use_up_attempts(self, mock_post):
+        mock_post.return_value = telegram_response(
+            429, {"ok": False, "parameters": {"retry_after": 7}}
+        )
+        notify("Borrowing №: 1")
+
+        with self.assertRaises(TelegramRateLimited):
+            deliver_pending_notifications()
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.attempts, 0)
+        self.assertIsNone(notification.failed_at)
+        self.assertIsNone(notification.locked_until)
+
+    @override_settings(TELEGRAM_MAX_ATTEMPTS=1)
+    @patch("borrowings.notification.send_to_telegram")
+    def test_open_circuit_does_not_use_up_attempts(self, mock_send):
+        mock_send.side_effect = CircuitOpenError("telegram circuit is open")
+        notify("Borrowing №: 1")
+
+        with self.assertRaises(CircuitOpenError):
+            deliver_pending_notifications()
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.attempts, 0)
+        self.assertIsNone(notification.failed_at)
+
+    @override_settings(NOTIFICATION_RETENTION=timedelta(days=7))
+    def test_prune_deletes_only_old_delivered_notifications(self):
+        now = timezone.now()
+        old = now - timedelta(days=8)
+        for _ in range(3):
+            Notification.objects.create(chat_id="1", text="old", sent_at=old)
+        recent = Notification.objects.create(
+            chat_id="1", text="recent", sent_at=now
+        )
+        pending = Notification.objects.create(chat_id="1", text="pending")
+        failed = Notification.objects.create(
+            chat_id="1", text="failed", failed_at=old
+        )
+
+        deleted = prune_delivered_notifications(chunk_size=2)
+
+        self.assertEqual(deleted, 3)
+        self.assertQuerySetEqual(
+            Notification.objects.order_by("id"),
+            [recent, pending, failed],
+        )
+
+    def test_coalesce_respects_telegram_limit(self):
+        messages = ["x" * 3000, "y" * 3000, "z"]
+
+        batches = coalesce(messages)
+
+        self.assertEqual(batches, ["x" * 3000, "y" * 3000 + "\nz"])
+        self.assertTrue(
+            all(len(batch) <= TELEGRAM_MESSAGE_LIMIT for batch in batches)
+        )
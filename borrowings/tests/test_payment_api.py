@@ -1,14 +1,21 @@
+import json
 from datetime import timedelta, datetime
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 from decimal import Decimal
 from rest_framework.test import APIClient
 from rest_framework import status
 from books.models import Books
-from borrowings.models import Borrowing, Payment
+import stripe
+
+from Library_Service_Project.testing import QueryBudgetMixin
+
+from borrowings.checkout import record_payment
+from borrowings.models import Borrowing, CheckoutSession, Payment
 from borrowings.serializers import PaymentsListSerializer, PaymentsDetailSerializer
 from borrowings.views import create_checkout_session
 
@@ -58,6 +65,22 @@ def detail_url(payments_id):
     return reverse("borrowing:payment-detail", args=[payments_id])
 
 
+def pay_url(payments_id):
+    return reverse("borrowing:payment-pay", args=[payments_id])
+
+
+def stripe_session(session_id, expires_in=timedelta(hours=24)):
+    return type(
+        "Session",
+        (object,),
+        {
+            "url": f"https://example.com/{session_id}",
+            "stripe_id": session_id,
+            "expires_at": int((timezone.now() + expires_in).timestamp()),
+        },
+    )()
+
+
 class UnauthenticatedPaymentApiTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -67,7 +90,7 @@ class UnauthenticatedPaymentApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class AuthenticatedPaymentApiTests(TestCase):
+class AuthenticatedPaymentApiTests(QueryBudgetMixin, TestCase):
     def setUp(self):
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
@@ -103,6 +126,21 @@ class AuthenticatedPaymentApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_payment_endpoints_query_budget(self):
+        for _ in range(3):
+            borrowing = sample_borrowing(user=self.user)
+            for _ in range(4):
+                payment = sample_payment(borrowing=borrowing)
+
+        with self.assertQueryBudget(2):
+            res = self.client.get(detail_url(payment.id))
+        self.assertEqual(len(res.data["borrowing"]["payments"]), 4)
+        self.assertEqual(res.data["borrowing"]["book"]["title"], "Sample book")
+
+        with self.assertQueryBudget(2):
+            res = self.client.get(PAYMENT_URL)
+        self.assertEqual(res.data["count"], 12)
+
     def test_create_payment(self):
         user = self.user
         borrowing = sample_borrowing(user=user)
@@ -131,6 +169,7 @@ class AuthenticatedPaymentApiTests(TestCase):
             "url": "https://example.com/checkout",
             "stripe_id": "stripe_session_id",
             "amount_total": Decimal(2000),
+            "expires_at": 1_900_000_000,
         }
         session_instance = type("Session", (object,), session_data)()
         mock_checkout_session.return_value = session_instance
@@ -150,7 +189,7 @@ class AuthenticatedPaymentApiTests(TestCase):
                 {
                     "price_data": {
                         "currency": "usd",
-                        "unit_amount_decimal": Decimal(2000),
+                        "unit_amount": 2000,
                         "product_data": {
                             "name": borrowing.book.title,
                             "description": f"Author: {borrowing.book.author}",
@@ -173,6 +212,7 @@ class AuthenticatedPaymentApiTests(TestCase):
             "url": "https://example.com/checkout",
             "stripe_id": "stripe_session_id",
             "amount_total": Decimal(6000),
+            "expires_at": 1_900_000_000,
         }
         session_instance = type("Session", (object,), session_data)()
         mock_checkout_session.return_value = session_instance
@@ -192,7 +232,7 @@ class AuthenticatedPaymentApiTests(TestCase):
                 {
                     "price_data": {
                         "currency": "usd",
-                        "unit_amount_decimal": Decimal(6000),
+                        "unit_amount": 6000,
                         "product_data": {
                             "name": borrowing.book.title,
                             "description": f"Author: {borrowing.book.author}",
@@ -206,6 +246,99 @@ class AuthenticatedPaymentApiTests(TestCase):
             cancel_url="http://127.0.0.1:8000/api/borrowings/canceled/",
         )
 
+class LazyCheckoutTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "testpass",
+        )
+        self.client.force_authenticate(self.user)
+        self.borrowing = sample_borrowing(user=self.user)
+
+    def test_record_payment_without_stripe(self):
+        with patch("borrowings.checkout.stripe.checkout.Session.create") as mock_create:
+            payment = record_payment(self.borrowing, type_="FINE")
+
+        mock_create.assert_not_called()
+        self.assertEqual(payment.session_id, "")
+        self.assertEqual(payment.session_url, "")
+        self.assertIsNone(payment.checkout.processed_at)
+
+    @patch("borrowings.checkout.stripe.checkout.Session.create")
+    def test_pay_opens_session_once(self, mock_create):
+        payment = record_payment(self.borrowing, type_="FINE")
+        mock_create.return_value = stripe_session("cs_1")
+
+        first = self.client.post(pay_url(payment.id))
+        second = self.client.post(pay_url(payment.id))
+
+        mock_create.assert_called_once()
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["session_id"], "cs_1")
+        self.assertEqual(second.data, first.data)
+        checkout = CheckoutSession.objects.get(pk=payment.checkout_id)
+        self.assertIsNotNone(checkout.session_expires_at)
+        self.assertIsNone(checkout.locked_until)
+
+    @patch("borrowings.checkout.stripe.checkout.Session.expire")
+    @patch("borrowings.checkout.stripe.checkout.Session.create")
+    def test_pay_replaces_expiring_session(self, mock_create, mock_expire):
+        payment = record_payment(self.borrowing, type_="FINE")
+        mock_create.return_value = stripe_session(
+            "cs_old", expires_in=timedelta(minutes=1)
+        )
+        self.client.post(pay_url(payment.id))
+        mock_create.return_value = stripe_session("cs_new")
+
+        res = self.client.post(pay_url(payment.id))
+
+        mock_expire.assert_called_once_with("cs_old")
+        self.assertEqual(res.data["session_id"], "cs_new")
+        payment.refresh_from_db()
+        self.assertEqual(payment.session_url, "https://example.com/cs_new")
+
+    @patch("borrowings.checkout.stripe.checkout.Session.create")
+    def test_pay_stripe_error_releases_checkout(self, mock_create):
+        payment = record_payment(self.borrowing, type_="FINE")
+        mock_create.side_effect = stripe.error.APIConnectionError("down")
+
+        res = self.client.post(pay_url(payment.id))
+
+        checkout = CheckoutSession.objects.get(pk=payment.checkout_id)
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(checkout.attempts, 1)
+        self.assertEqual(checkout.last_error, "down")
+        self.assertIsNone(checkout.locked_until)
+
+    def test_pay_in_progress_conflict(self):
+        payment = record_payment(self.borrowing, type_="FINE")
+        CheckoutSession.objects.filter(pk=payment.checkout_id).update(
+            locked_until=timezone.now() + timedelta(seconds=30)
+        )
+
+        res = self.client.post(pay_url(payment.id))
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+    def test_pay_paid_payment_rejected(self):
+        payment = sample_payment(
+            borrowing=self.borrowing, status=Payment.Status.PAID
+        )
+
+        res = self.client.post(pay_url(payment.id))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pay_other_users_payment_not_found(self):
+        other = get_user_model().objects.create_user("other@test.com", "pass")
+        payment = record_payment(sample_borrowing(user=other), type_="FINE")
+
+        res = self.client.post(pay_url(payment.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
 class AdminPaymentApiTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -232,6 +365,17 @@ class AdminPaymentApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
 
+    def test_export_payments_as_ndjson(self):
+        borrowing = sample_borrowing(user=self.user)
+        payment = sample_payment(borrowing=borrowing)
+
+        res = self.client.get(reverse("borrowing:payment-export"))
+
+        row = json.loads(b"".join(res.streaming_content))
+        self.assertEqual(row["id"], payment.id)
+        self.assertEqual(row["borrowing_id"], borrowing.id)
+        self.assertEqual(row["money_to_pay"], "1000.00")
+
     def test_delete_payment_not_allowed(self):
         user = self.user
         borrowing = sample_borrowing(user=user)
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from books.models import Books
+from borrowings.models import Borrowing
+from borrowings.pricing import (
+    billable_days,
+    borrowing_price,
+    borrowing_prices,
+    iter_prices,
+    total_price,
+)
+
+
+class PricingTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        self.book = Books.objects.create(
+            title="Dune",
+            author="Frank Herbert",
+            inventory=5,
+            daily_fee=Decimal("0.35"),
+        )
+
+    def borrowing(self, days, late_days=0):
+        borrowing = Borrowing.objects.create(
+            book=self.book,
+            user=self.user,
+            expected_return_date=timezone.now() + timedelta(days=days),
+        )
+        if late_days:
+            borrowing.actual_return_date = (
+                borrowing.expected_return_date + timedelta(days=late_days)
+            )
+            borrowing.save()
+        return borrowing
+
+    def test_billable_days_count_calendar_days(self):
+        start = timezone.make_aware(datetime(2023, 9, 1, 23, 59))
+        end = timezone.make_aware(datetime(2023, 9, 3, 0, 1))
+
+        self.assertEqual(billable_days(start, end), 2)
+        self.assertEqual(billable_days(end, start), 0)
+        self.assertEqual(billable_days(start, None), 0)
+
+    def test_payment_and_fine_in_exact_cents(self):
+        borrowing = self.borrowing(days=3, late_days=4)
+
+        self.assertEqual(borrowing_price(borrowing, "PAYMENT"), 105)
+        self.assertEqual(borrowing_price(borrowing, "FINE"), 280)
+
+    def test_unknown_type_rejected(self):
+        with self.assertRaises(ValueError):
+            borrowing_price(self.borrowing(days=1), "REFUND")
+
+    def test_batch_prices_match_single_prices(self):
+        borrowings = [self.borrowing(days=days) for days in (1, 2, 7)]
+        queryset = Borrowing.objects.all()
+
+        with self.assertNumQueries(1):
+            prices = dict(iter_prices(queryset, "PAYMENT"))
+
+        self.assertEqual(prices, borrowing_prices(borrowings, "PAYMENT"))
+        self.assertEqual(total_price(queryset, "PAYMENT"), 35 * 10)
@@ -0,0 +1,77 @@
+from datetime import date, timedelta
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from books.models import Books
+from borrowings.models import Borrowing, Payment
+from borrowings.notification import _claimable
+from borrowings.tasks import _due_borrowings
+
+BORROWINGS_URL = reverse("borrowing:borrowing-list")
+
+
+@skipUnless(connection.vendor == "sqlite", "plans below are SQLite's")
+class HotQueryPlanTests(TestCase):
+    """EXPLAIN the hot queries and check each one searches its index"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "testpass",
+        )
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f"USING INDEX {index_name}", plan, plan)
+
+    def test_borrowing_list_uses_user_active_index(self):
+        book = Books.objects.create(
+            title="Sample book",
+            author="Sample Author",
+            inventory=1,
+            daily_fee=1,
+        )
+        Borrowing.objects.create(
+            book=book,
+            user=self.user,
+            expected_return_date=date.today() + timedelta(days=2),
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with CaptureQueriesContext(connection) as context:
+            client.get(BORROWINGS_URL, {"is_active": "true"})
+
+        sql = next(
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("SELECT")
+            and "FROM \"borrowings_borrowing\"" in query["sql"]
+            and not query["sql"].startswith("SELECT COUNT(")
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            plan = " ".join(str(row) for row in cursor.fetchall())
+        self.assertIn("USING INDEX borrowing_user_active_idx", plan, plan)
+
+    def test_overdue_scan_uses_partial_due_date_index(self):
+        queryset = _due_borrowings(date.today() + timedelta(days=2))
+
+        self.assertUsesIndex(queryset, "borrowing_active_due_idx")
+
+    def test_payment_lookup_uses_session_id_index(self):
+        queryset = Payment.objects.filter(session_id="cs_test_1")
+
+        self.assertUsesIndex(queryset, "payment_session_id_idx")
+
+    def test_notification_claim_uses_pending_index(self):
+        queryset = _claimable(timezone.now()).order_by("id")[:500]
+
+        self.assertUsesIndex(queryset, "notification_pending_idx")
@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from books.models import Books
+from borrowings import http_client
+from borrowings.checkout import checkout_session, record_payment
+from borrowings.fake_remotes import FakeRemotes
+from borrowings.http_client import configure_stripe
+from borrowings.models import Borrowing, Notification, Payment
+from borrowings.reconciliation import (
+    AMOUNT_MISMATCH,
+    UNKNOWN_SESSION,
+    UNPAID_REMOTELY,
+    reconcile_payments,
+)
+
+
+class ReconcilePaymentsTests(TestCase):
+    def setUp(self):
+        http_client._clients.clear()
+        self.remotes = FakeRemotes().start()
+        self.addCleanup(self.remotes.stop)
+        overrides = override_settings(
+            STRIPE_API_BASE=self.remotes.url,
+            STRIPE_SECRET_KEY="sk_test_fake",
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        configure_stripe()
+        self.addCleanup(configure_stripe)
+        self.addCleanup(http_client._clients.clear)
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+
+    def opened_payment(self, title):
+        book = Books.objects.create(
+            title=title, author="Author", inventory=1, daily_fee=10
+        )
+        borrowing = Borrowing.objects.create(
+            user=self.user,
+            book=book,
+            expected_return_date=timezone.now() + timedelta(days=2),
+        )
+        return checkout_session(record_payment(borrowing, type_="PAYMENT"))
+
+    def test_pending_payments_settled_and_discrepancies_reported(self):
+        paid = self.opened_payment("Dune")
+        expired = self.opened_payment("Emma")
+        waiting = self.opened_payment("Persuasion")
+        paid_locally = self.opened_payment("Ulysses")
+        self.remotes.pay(paid.session_id)
+        self.remotes.expire(expired.session_id)
+        Payment.objects.filter(id=waiting.id).update(money_to_pay=1)
+        Payment.objects.filter(id=paid_locally.id).update(
+            status=Payment.Status.PAID
+        )
+        unknown = self.remotes.create_session([])["id"]
+        self.remotes.pay(unknown)
+
+        with self.assertLogs("borrowings.reconciliation", "WARNING"):
+            report = reconcile_payments()
+
+        self.assertEqual(report["api_calls"], 1)
+        self.assertEqual(report["sessions"], 5)
+        self.assertEqual((report["paid"], report["expired"]), (1, 1))
+        self.assertEqual(
+            report["examples"],
+            {
+                UNKNOWN_SESSION: [unknown],
+                AMOUNT_MISMATCH: [waiting.session_id],
+                UNPAID_REMOTELY: [paid_locally.session_id],
+            },
+        )
+        paid.refresh_from_db()
+        expired.refresh_from_db()
+        self.assertEqual(paid.status, Payment.Status.PAID)
+        self.assertEqual(expired.status, Payment.Status.PENDING)
+        self.assertEqual(expired.session_id, "")
+        texts = list(Notification.objects.values_list("text", flat=True))
+        self.assertIn(f"Payment №{paid.id}", texts[0])
+        self.assertIn("reconciliation needs attention", texts[1])
+
+        with self.assertLogs("borrowings.reconciliation", "WARNING"):
+            self.assertEqual(reconcile_payments()["paid"], 0)
+
+    def test_batch_costs_fixed_queries(self):
+        payments = [self.opened_payment(f"Book {n}") for n in range(20)]
+        for payment in payments:
+            self.remotes.pay(payment.session_id)
+
+        with self.assertNumQueries(5):
+            report = reconcile_payments()
+
+        self.assertEqual(report["paid"], 20)
+        self.assertFalse(
+            Payment.objects.filter(status=Payment.Status.PENDING).exists()
+        )
+
+    def test_pages_are_bounded(self):
+        for _ in range(150):
+            self.remotes.create_session([])
+
+        report = reconcile_payments(max_pages=1)
+
+        self.assertEqual(report["api_calls"], 1)
+        self.assertEqual(report["sessions"], 100)
+        self.assertTrue(report["truncated"])
+
+    def test_old_sessions_not_listed(self):
+        self.remotes.create_session([])
+
+        report = reconcile_payments(since=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(report["sessions"], 0)
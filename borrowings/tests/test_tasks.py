@@ -0,0 +1,110 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from books.models import Books
+from borrowings.models import Borrowing, Notification
+from borrowings.tasks import (
+    send_message_about_borrowing_books,
+    send_overdue_digests,
+    user_ranges,
+)
+
+
+def sample_borrowing(user, title="Sample book", days=1, **params):
+    book = Books.objects.create(
+        title=title,
+        author="Sample Author",
+        cover="HARD",
+        inventory=1,
+        daily_fee=10,
+    )
+    defaults = {
+        "expected_return_date": timezone.now() + timedelta(days=days),
+        "book": book,
+        "user": user,
+        "is_active": True,
+    }
+    defaults.update(params)
+    return Borrowing.objects.create(**defaults)
+
+
+class OverdueReminderTests(TestCase):
+    def setUp(self):
+        self.alice = get_user_model().objects.create_user(
+            "alice@test.com", "testpass"
+        )
+        self.bob = get_user_model().objects.create_user(
+            "bob@test.com", "testpass"
+        )
+
+    def test_user_ranges_never_split_a_user(self):
+        for _ in range(3):
+            sample_borrowing(self.alice)
+        sample_borrowing(self.bob)
+
+        ranges = list(user_ranges(Borrowing.objects.all(), chunk_size=2))
+
+        self.assertEqual(
+            ranges, [(None, self.alice.id), (self.alice.id, None)]
+        )
+
+    def test_digest_per_user_in_constant_queries(self):
+        sample_borrowing(self.alice, title="Dune")
+        sample_borrowing(self.alice, title="Emma")
+        sample_borrowing(self.bob, title="Persuasion")
+        sample_borrowing(self.bob, title="Returned", is_active=False)
+        sample_borrowing(self.bob, title="Later", days=10)
+        due = (timezone.now() + timedelta(days=2)).date().isoformat()
+
+        with self.assertNumQueries(2):
+            result = send_overdue_digests(None, None, due)
+
+        self.assertEqual(result, {"users": 2, "borrowings": 3})
+        alice, bob = Notification.objects.order_by("id")
+        self.assertIn(f"Customer{self.alice.id}: 2 book(s)", alice.text)
+        self.assertIn("Title: Dune", alice.text)
+        self.assertIn("Title: Emma", alice.text)
+        self.assertIn("Title: Persuasion", bob.text)
+        self.assertNotIn("Later", bob.text)
+
+    def test_digest_range_bounds(self):
+        sample_borrowing(self.alice)
+        sample_borrowing(self.bob)
+        due = (timezone.now() + timedelta(days=2)).date().isoformat()
+
+        result = send_overdue_digests(self.alice.id, None, due)
+
+        self.assertEqual(result, {"users": 1, "borrowings": 1})
+        self.assertIn(
+            f"Customer{self.bob.id}", Notification.objects.get().text
+        )
+
+    @patch("borrowings.tasks.chord")
+    def test_dispatch_fans_out_one_task_per_range(self, mock_chord):
+        sample_borrowing(self.alice)
+        sample_borrowing(self.bob)
+
+        with patch("borrowings.tasks.OVERDUE_CHUNK_SIZE", 1):
+            chunks = send_message_about_borrowing_books()
+
+        self.assertEqual(chunks, 2)
+        header = list(mock_chord.call_args.args[0])
+        self.assertEqual(
+            [signature.args[:2] for signature in header],
+            [(None, self.alice.id), (self.alice.id, self.bob.id)],
+        )
+
+    @patch("borrowings.tasks.chord")
+    def test_nothing_due(self, mock_chord):
+        sample_borrowing(self.alice, days=10)
+
+        self.assertEqual(send_message_about_borrowing_books(), 0)
+
+        mock_chord.assert_not_called()
+        self.assertEqual(
+            Notification.objects.get().text, "No borrowings overdue today!"
+        )
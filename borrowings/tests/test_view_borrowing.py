@@ -1,17 +1,34 @@
+import json
 from datetime import timedelta, datetime
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework.test import APIClient
 from rest_framework import status
+
+from Library_Service_Project.testing import QueryBudgetMixin
+from Library_Service_Project.throttling import local_buckets
 from books.models import Books
-from borrowings.models import Borrowing
+from borrowings.checkout import checkout_session
+from borrowings.models import (
+    Borrowing,
+    CheckoutSession,
+    Notification,
+    Payment,
+)
 from borrowings.serializers import BorrowingListSerializer, BorrowingDetailSerializer
+from borrowings.views import BorrowingListViewSet
 
 
 BORROWINGS_URL = reverse("borrowing:borrowing-list")
+EXPORT_URL = reverse("borrowing:borrowing-export")
+BULK_RETURN_URL = reverse("borrowing:borrowing-bulk-return")
+CART_URL = reverse("borrowing:borrowing-cart")
 
 
 def sample_book(**params):
@@ -38,6 +55,10 @@ def sample_borrowing(**params):
 
     return Borrowing.objects.create(**defaults)
 
+def with_summary(borrowing):
+    return Borrowing.objects.with_payment_summary().get(id=borrowing.id)
+
+
 def detail_url(borrowings_id):
     return reverse("borrowing:borrowing-detail", args=[borrowings_id])
 
@@ -51,7 +72,7 @@ class UnauthenticatedBorrowingApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class AuthenticatedBorrowingApiTests(TestCase):
+class AuthenticatedBorrowingApiTests(QueryBudgetMixin, TestCase):
     def setUp(self):
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
@@ -67,12 +88,57 @@ class AuthenticatedBorrowingApiTests(TestCase):
 
         res = self.client.get(BORROWINGS_URL)
 
-        borrowing = Borrowing.objects.order_by("id")
+        borrowing = Borrowing.objects.with_payment_summary().order_by("id")
         serializer = BorrowingListSerializer(borrowing, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data["results"], serializer.data)
 
+    def test_list_borrowings_summarizes_payments(self):
+        borrowing = sample_borrowing(user=self.user)
+        for type_, status_, money in (
+            ("PAYMENT", "PAID", 500),
+            ("FINE", "PENDING ", 150),
+            ("FINE", "PENDING ", 50),
+        ):
+            Payment.objects.create(
+                borrowing=borrowing,
+                type=type_,
+                status=status_,
+                money_to_pay=money,
+            )
+        sample_borrowing(user=self.user)
+
+        with self.assertNumQueries(2) as context:
+            res = self.client.get(BORROWINGS_URL)
+
+        count_sql = context.captured_queries[0]["sql"]
+        self.assertTrue(count_sql.startswith("SELECT COUNT("), count_sql)
+        self.assertNotIn("borrowings_payment", count_sql)
+        summaries = [
+            {key: row[key] for key in (
+                "amount_due", "amount_paid", "has_pending_fine",
+                "payment_count",
+            )}
+            for row in res.data["results"]
+        ]
+        self.assertEqual(
+            summaries,
+            [
+                {
+                    "amount_due": "200.00",
+                    "amount_paid": "500.00",
+                    "has_pending_fine": True,
+                    "payment_count": 3,
+                },
+                {
+                    "amount_due": "0.00",
+                    "amount_paid": "0.00",
+                    "has_pending_fine": False,
+                    "payment_count": 0,
+                },
+            ],
+        )
 
     def test_filter_borrowing_by_active(self):
         user = self.user
@@ -85,14 +151,50 @@ class AuthenticatedBorrowingApiTests(TestCase):
             BORROWINGS_URL, {"is_active": True}
         )
 
-        serializer1 = BorrowingListSerializer(borrowing1)
-        serializer2 = BorrowingListSerializer(borrowing2)
-        serializer3 = BorrowingListSerializer(borrowing3)
+        serializer1 = BorrowingListSerializer(with_summary(borrowing1))
+        serializer2 = BorrowingListSerializer(with_summary(borrowing2))
+        serializer3 = BorrowingListSerializer(with_summary(borrowing3))
 
         self.assertIn(serializer1.data, res.data["results"])
         self.assertIn(serializer2.data, res.data["results"])
         self.assertNotIn(serializer3.data, res.data["results"])
 
+    def test_list_borrowings_with_cursor_pagination(self):
+        for _ in range(12):
+            sample_borrowing(user=self.user)
+
+        res = self.client.get(BORROWINGS_URL, {"pagination": "cursor"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", res.data)
+        self.assertIsNone(res.data["previous"])
+        first_page = [item["id"] for item in res.data["results"]]
+        self.assertEqual(len(first_page), 10)
+
+        res = self.client.get(res.data["next"])
+
+        second_page = [item["id"] for item in res.data["results"]]
+        self.assertEqual(len(second_page), 2)
+        self.assertIsNone(res.data["next"])
+        self.assertEqual(
+            first_page + second_page,
+            list(Borrowing.objects.order_by("id").values_list("id", flat=True)),
+        )
+
+    def test_cursor_pagination_count_is_optional(self):
+        sample_borrowing(user=self.user)
+
+        res = self.client.get(
+            BORROWINGS_URL, {"pagination": "cursor", "count": "true"}
+        )
+
+        self.assertEqual(res.data["count"], 1)
+
+    def test_filter_borrowing_by_invalid_active_flag(self):
+        res = self.client.get(BORROWINGS_URL, {"is_active": "maybe"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_retrieve_borrowing_detail(self):
         user = self.user
         borrowing = sample_borrowing(user=user)
@@ -104,15 +206,73 @@ class AuthenticatedBorrowingApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_retrieve_borrowing_detail_query_budget(self):
+        borrowing = sample_borrowing(user=self.user)
+        for _ in range(5):
+            Payment.objects.create(borrowing=borrowing, money_to_pay=100)
+
+        with self.assertQueryBudget(2):
+            res = self.client.get(detail_url(borrowing.id))
+
+        self.assertEqual(len(res.data["payments"]), 5)
+        self.assertEqual(res.data["book"]["title"], "Sample book")
+
+    def test_query_budget_overrun_fails(self):
+        with self.assertRaisesMessage(AssertionError, "the budget is 0"):
+            with self.assertQueryBudget(0):
+                Borrowing.objects.count()
+
     def test_create_borrowing(self):
         book = sample_book()
         payload = {
-            "expected_return_date": "2023-09-15T15:39:57.710Z",
+            "expected_return_date": datetime.now() + timedelta(days=3),
             "book": book.id,
         }
-        res = self.client.post(BORROWINGS_URL, payload)
+        with patch("borrowings.checkout.stripe.checkout.Session.create") as mock_create:
+            res = self.client.post(BORROWINGS_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        mock_create.assert_not_called()
+        payment = Payment.objects.get(borrowing_id=res.data["id"])
+        self.assertEqual(payment.type, "PAYMENT")
+        self.assertIsNotNone(payment.checkout)
+
+    def test_create_borrowing_throttled_per_user(self):
+        self.addCleanup(local_buckets.clear)
+        book = sample_book(inventory=5)
+        payload = {
+            "expected_return_date": datetime.now() + timedelta(days=3),
+            "book": book.id,
+        }
+        rates = {**settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]}
+        rates["borrow"] = "2/min"
+        # Buckets stay local, and are cleared, even with a Redis running.
+        with override_settings(
+            CACHE_REDIS_URL="redis://127.0.0.1:1",
+            REST_FRAMEWORK={
+                **settings.REST_FRAMEWORK,
+                "DEFAULT_THROTTLE_RATES": rates,
+            }
+        ):
+            responses = [
+                self.client.post(BORROWINGS_URL, payload) for _ in range(3)
+            ]
+
+        self.assertEqual(
+            [res.status_code for res in responses],
+            [
+                status.HTTP_201_CREATED,
+                status.HTTP_201_CREATED,
+                status.HTTP_429_TOO_MANY_REQUESTS,
+            ],
+        )
+        self.assertEqual(
+            [res["RateLimit-Remaining"] for res in responses], ["1", "0", "0"]
+        )
+        self.assertEqual(responses[0]["RateLimit-Limit"], "2")
+        self.assertEqual(responses[0]["RateLimit-Policy"], "2;w=60")
+        self.assertEqual(responses[2]["Retry-After"], "30")
+        self.assertEqual(Books.objects.get(id=book.id).inventory, 3)
 
     def test_create_borrowing_validation(self):
         book = sample_book(inventory=0)
@@ -124,6 +284,20 @@ class AuthenticatedBorrowingApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_borrowing_takes_last_copy_once(self):
+        book = sample_book(inventory=1)
+        payload = {
+            "expected_return_date": datetime.now() + timedelta(days=3),
+            "book": book.id,
+        }
+
+        with patch("borrowings.views.Books.objects.take_copy") as take_copy:
+            take_copy.return_value = False
+            res = self.client.post(BORROWINGS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Borrowing.objects.filter(book=book).exists())
+
     def test_create_borrowing_without_book(self):
         payload = {
             "expected_return_date": "2023-09-15T15:39:57.710Z",
@@ -150,6 +324,146 @@ class AuthenticatedBorrowingApiTests(TestCase):
         self.assertFalse(updated_borrowing.is_active)
         self.assertEqual(updated_borrowing.book.inventory, 2)
 
+    @patch("borrowings.checkout.stripe.checkout.Session.create")
+    def test_cart_borrows_books_with_one_checkout(self, mock_create):
+        dune = sample_book(title="Dune", inventory=2)
+        emma = sample_book(title="Emma", inventory=1)
+        payload = {
+            "books": [dune.id, emma.id, dune.id],
+            "expected_return_date": timezone.now() + timedelta(days=3),
+        }
+
+        with self.assertNumQueries(8):
+            res = self.client.post(CART_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data["borrowings"]), 3)
+        self.assertEqual(
+            [payment["money_to_pay"] for payment in res.data["payments"]],
+            ["3000.00", "3000.00", "3000.00"],
+        )
+        dune.refresh_from_db()
+        emma.refresh_from_db()
+        self.assertEqual((dune.inventory, emma.inventory), (0, 0))
+        self.assertEqual(CheckoutSession.objects.count(), 1)
+
+        mock_create.return_value = type(
+            "Session",
+            (),
+            {
+                "url": "https://example.com",
+                "stripe_id": "cs",
+                "expires_at": 1_900_000_000,
+            },
+        )()
+        checkout_session(Payment.objects.first())
+
+        mock_create.assert_called_once()
+        line_items = mock_create.call_args.kwargs["line_items"]
+        self.assertEqual(
+            [item["price_data"]["product_data"]["name"]
+             for item in line_items],
+            ["Dune", "Emma", "Dune"],
+        )
+        self.assertEqual(
+            set(Payment.objects.values_list("session_id", flat=True)),
+            {"cs"},
+        )
+
+    def test_cart_out_of_stock_borrows_nothing(self):
+        dune = sample_book(title="Dune", inventory=2)
+        emma = sample_book(title="Emma", inventory=1)
+        payload = {
+            "books": [dune.id, emma.id, emma.id],
+            "expected_return_date": timezone.now() + timedelta(days=3),
+        }
+
+        res = self.client.post(CART_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(emma.id), str(res.data["books"]))
+        dune.refresh_from_db()
+        self.assertEqual(dune.inventory, 2)
+        self.assertFalse(Borrowing.objects.exists())
+        self.assertFalse(Payment.objects.exists())
+
+    def test_cart_unknown_book(self):
+        payload = {
+            "books": [999],
+            "expected_return_date": timezone.now() + timedelta(days=3),
+        }
+
+        res = self.client.post(CART_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_return(self):
+        book = sample_book(inventory=2)
+        on_time = sample_borrowing(user=self.user, book=book)
+        late = sample_borrowing(
+            user=self.user,
+            book=book,
+            expected_return_date=timezone.now() - timedelta(days=3),
+        )
+        done = sample_borrowing(user=self.user, is_active=False)
+        other_user = get_user_model().objects.create_user(
+            "other@test.com", "testpass"
+        )
+        foreign = sample_borrowing(user=other_user)
+        ids = [on_time.id, late.id, done.id, foreign.id, on_time.id]
+
+        with self.assertNumQueries(8):
+            res = self.client.post(
+                BULK_RETURN_URL, {"ids": ids}, format="json"
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data,
+            [
+                {"id": on_time.id, "status": "returned", "fine": None},
+                {"id": late.id, "status": "returned", "fine": 6000},
+                {"id": done.id, "status": "already_returned", "fine": None},
+                {"id": foreign.id, "status": "not_found", "fine": None},
+            ],
+        )
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 4)
+        self.assertFalse(Borrowing.objects.get(id=late.id).is_active)
+        self.assertTrue(Borrowing.objects.get(id=foreign.id).is_active)
+        fine = Payment.objects.get(borrowing=late)
+        self.assertEqual(fine.type, "FINE")
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_bulk_return_query_count_is_constant(self):
+        late = timezone.now() - timedelta(days=3)
+        ids = [
+            sample_borrowing(user=self.user, expected_return_date=late).id
+            for _ in range(20)
+        ]
+
+        with self.assertNumQueries(8):
+            res = self.client.post(
+                BULK_RETURN_URL, {"ids": ids}, format="json"
+            )
+
+        self.assertEqual(
+            {result["status"] for result in res.data}, {"returned"}
+        )
+        self.assertEqual(
+            Payment.objects.filter(type="FINE").count(), len(ids)
+        )
+
+    def test_bulk_return_requires_ids(self):
+        res = self.client.post(BULK_RETURN_URL, {"ids": []}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_requires_staff(self):
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
     def test_return_already_returned_borrowing(self):
         user = self.user
         already_returned_borrowing = sample_borrowing(
@@ -192,14 +506,49 @@ class AdminBorrowingApiTests(TestCase):
             BORROWINGS_URL, {"user_id": f"{user1.id},{user2.id}"}
         )
 
-        serializer1 = BorrowingListSerializer(borrowing1)
-        serializer2 = BorrowingListSerializer(borrowing2)
-        serializer3 = BorrowingListSerializer(borrowing3)
+        serializer1 = BorrowingListSerializer(with_summary(borrowing1))
+        serializer2 = BorrowingListSerializer(with_summary(borrowing2))
+        serializer3 = BorrowingListSerializer(with_summary(borrowing3))
 
         self.assertIn(serializer1.data, res.data["results"])
         self.assertIn(serializer2.data, res.data["results"])
         self.assertNotIn(serializer3.data, res.data["results"])
 
+    def test_export_applies_list_filters(self):
+        other = get_user_model().objects.create_user(
+            "test1@test.com", "testpass"
+        )
+        active = sample_borrowing(user=self.user, is_active=True)
+        sample_borrowing(user=self.user, is_active=False)
+        sample_borrowing(user=other, is_active=True)
+
+        res = self.client.get(
+            EXPORT_URL, {"user_id": self.user.id, "is_active": "true"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        rows = [
+            json.loads(line)
+            for line in b"".join(res.streaming_content).splitlines()
+        ]
+        self.assertEqual([row["id"] for row in rows], [active.id])
+        self.assertEqual(rows[0]["book_id"], active.book_id)
+
+    def test_export_streams_every_chunk_as_csv(self):
+        borrowings = [sample_borrowing(user=self.user) for _ in range(5)]
+
+        with patch.object(BorrowingListViewSet, "export_chunk_size", 2):
+            res = self.client.get(EXPORT_URL, {"format": "csv"})
+
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual(res["Content-Type"], "text/csv")
+        self.assertTrue(lines[0].startswith("id,borrow_date,"))
+        self.assertEqual(
+            [int(line.split(",")[0]) for line in lines[1:]],
+            [borrowing.id for borrowing in borrowings],
+        )
+
     def test_put_borrowing_not_allowed(self):
         book = sample_book()
         user = self.user
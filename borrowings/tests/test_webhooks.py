@@ -0,0 +1,188 @@
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from books.models import Books
+from borrowings.models import Borrowing, Notification, Payment, StripeEvent
+from borrowings.webhooks import (
+    SESSION_ASYNC_FAILED,
+    SESSION_ASYNC_SUCCEEDED,
+    SESSION_COMPLETED,
+    SESSION_EXPIRED,
+    apply_pending_events,
+    checkout_event,
+    sign_payload,
+)
+
+WEBHOOK_URL = reverse("borrowing:stripe_webhook")
+SECRET = "whsec_test"
+
+
+def sample_payment(session_id, **params):
+    user = get_user_model().objects.create_user(
+        f"{session_id}@test.com", "testpass"
+    )
+    book = Books.objects.create(
+        title="Dune", author="Frank Herbert", inventory=1, daily_fee=10
+    )
+    borrowing = Borrowing.objects.create(
+        user=user,
+        book=book,
+        expected_return_date=timezone.now() + timedelta(days=2),
+    )
+    defaults = {
+        "borrowing": borrowing,
+        "session_id": session_id,
+        "money_to_pay": 2000,
+    }
+    defaults.update(params)
+    return Payment.objects.create(**defaults)
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=SECRET)
+class StripeWebhookTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def post_event(self, event, secret=SECRET):
+        payload = json.dumps(event).encode()
+        return self.client.generic(
+            "POST",
+            WEBHOOK_URL,
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=sign_payload(payload, secret),
+        )
+
+    def test_event_stored_once(self):
+        event = checkout_event(SESSION_COMPLETED, "cs_1")
+
+        first = self.post_event(event)
+        second = self.post_event(event)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        stored = StripeEvent.objects.get()
+        self.assertEqual(stored.session_id, "cs_1")
+        self.assertIsNone(stored.processed_at)
+
+    def test_invalid_signature_rejected(self):
+        res = self.post_event(
+            checkout_event(SESSION_COMPLETED, "cs_1"), secret="whsec_other"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    @override_settings(STRIPE_WEBHOOK_SECRET="")
+    def test_unset_secret_refuses_events(self):
+        res = self.post_event(
+            checkout_event(SESSION_COMPLETED, "cs_1"), secret=""
+        )
+
+        self.assertEqual(
+            res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_other_event_types_ignored(self):
+        res = self.post_event(checkout_event("invoice.paid", "in_1"))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_apply_events_in_one_batch(self):
+        paid = sample_payment("cs_paid")
+        expired = sample_payment("cs_expired")
+        waiting = sample_payment("cs_unpaid")
+        for event in (
+            checkout_event(SESSION_COMPLETED, "cs_paid"),
+            checkout_event(SESSION_EXPIRED, "cs_expired"),
+            checkout_event(SESSION_COMPLETED, "cs_unpaid", "unpaid"),
+            checkout_event(SESSION_COMPLETED, "cs_unknown"),
+        ):
+            self.post_event(event)
+
+        with self.assertNumQueries(10):
+            self.assertEqual(apply_pending_events(), 4)
+
+        statuses = dict(Payment.objects.values_list("id", "status"))
+        self.assertEqual(statuses[paid.id], Payment.Status.PAID)
+        self.assertEqual(statuses[expired.id], Payment.Status.PENDING)
+        self.assertEqual(statuses[waiting.id], Payment.Status.PENDING)
+        self.assertFalse(
+            StripeEvent.objects.filter(processed_at__isnull=True).exists()
+        )
+        expired.refresh_from_db()
+        self.assertEqual(expired.session_id, "")
+        self.assertIn(
+            f"Payment №{paid.id}", Notification.objects.get().text
+        )
+        self.assertEqual(apply_pending_events(), 0)
+
+    def test_async_payment_settled_by_later_event(self):
+        settled = sample_payment("cs_async")
+        failed = sample_payment("cs_failed")
+        for event in (
+            checkout_event(SESSION_COMPLETED, "cs_async", "unpaid"),
+            checkout_event(SESSION_COMPLETED, "cs_failed", "unpaid"),
+        ):
+            self.post_event(event)
+        apply_pending_events()
+        settled.refresh_from_db()
+        self.assertEqual(settled.status, Payment.Status.PENDING)
+
+        for event in (
+            checkout_event(SESSION_ASYNC_SUCCEEDED, "cs_async"),
+            checkout_event(SESSION_ASYNC_FAILED, "cs_failed", "unpaid"),
+        ):
+            self.post_event(event)
+        self.assertEqual(apply_pending_events(), 2)
+
+        settled.refresh_from_db()
+        failed.refresh_from_db()
+        self.assertEqual(settled.status, Payment.Status.PAID)
+        self.assertEqual(failed.status, Payment.Status.PENDING)
+        self.assertEqual(failed.session_id, "")
+
+    def test_replay_command(self):
+        sample_payment("cs_1")
+
+        call_command(
+            "replay_stripe_events", events=50, expired=0, stdout=StringIO()
+        )
+
+        self.assertEqual(StripeEvent.objects.count(), 50)
+        self.assertEqual(Payment.objects.get().status, Payment.Status.PAID)
+
+
+class OrderSuccessTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    @patch("borrowings.views.stripe.checkout.Session.retrieve")
+    def test_success_redirect_is_local(self, mock_retrieve):
+        sample_payment("cs_1")
+
+        res = self.client.get("/api/borrowings/success?session_id=cs_1")
+
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        mock_retrieve.assert_not_called()
+
+    def test_success_unknown_session(self):
+        res = self.client.get("/api/borrowings/success?session_id=cs_x")
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
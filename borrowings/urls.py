@@ -8,6 +8,8 @@ from borrowings.views import (
     PaymentsViewSet,
     order_success,
     order_canceled,
+    integrations_status,
+    stripe_webhook,
 )
 
 app_name = "borrowing"
@@ -25,4 +27,10 @@ urlpatterns = [
     ),
     path("success", order_success),
     path("canceled/", order_canceled),
+    path("webhooks/stripe/", stripe_webhook, name="stripe_webhook"),
+    path(
+        "integrations/",
+        integrations_status,
+        name="integrations_status"
+    ),
 ]
@@ -1,55 +1,88 @@
-import os
 from datetime import datetime
 from typing import Type
 
 import stripe
-from django.db import transaction
 from django.http import  HttpResponse
 from django.utils import timezone
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import mixins, status, serializers
-from rest_framework.decorators import api_view
+from rest_framework.decorators import (
+    action,
+    api_view,
+    authentication_classes,
+    permission_classes,
+    throttle_classes,
+)
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import AllowAny, IsAdminUser
 from django.shortcuts import get_object_or_404, redirect
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 from django.db.models.query import QuerySet
+from Library_Service_Project.export import StreamingExportMixin
+from Library_Service_Project.pagination import (
+    StandardOrKeysetPagination,
+    StandardResultsSetPagination,
+)
+from Library_Service_Project.sqlite import write_atomic
+from Library_Service_Project.throttling import UserBucketThrottle
 from books.models import Books
 from borrowings.models import Borrowing, Payment
+from borrowings.cart import borrow_books
+from borrowings.returns import return_borrowings
 from borrowings.serializers import (
+    BorrowingBulkReturnSerializer,
+    BorrowingCartResultSerializer,
+    BorrowingCartSerializer,
     BorrowingListSerializer,
+    BorrowingReturnResultSerializer,
     BorrowingCreateSerializer,
     BorrowingSerializer,
     BorrowingDetailSerializer,
+    PaymentCheckoutSerializer,
     PaymentsListSerializer,
     PaymentsDetailSerializer,
     PaymentsSerializer,
 )
-from .notification import send_to_telegram
+from borrowings.checkout import (
+    calculate_price,
+    checkout_session,
+    create_checkout_session,
+    record_payment,
+)
+from borrowings.http_client import integration_stats
+from borrowings.webhooks import InvalidWebhook, receive_event
+from .notification import notify
+
 
+class BorrowThrottle(UserBucketThrottle):
+    scope = "borrow"
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = "page_size"
-    max_page_size = 10
+
+class ReturnThrottle(UserBucketThrottle):
+    scope = "return"
 
 
 class BorrowingListViewSet(
+    StreamingExportMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.CreateModelMixin,
     GenericViewSet,
 ):
-    queryset = (
-        Borrowing.objects.all()
-        .select_related(
-            "book",
-        )
-        .prefetch_related("payments")
+    queryset = Borrowing.objects.all()
+    pagination_class = StandardOrKeysetPagination
+    export_fields = (
+        "id",
+        "borrow_date",
+        "expected_return_date",
+        "actual_return_date",
+        "is_active",
+        "book_id",
+        "user_id",
     )
-    pagination_class = StandardResultsSetPagination
 
     @staticmethod
     def _params_to_ints(queryset: list) -> list:
@@ -65,10 +98,28 @@ class BorrowingListViewSet(
                 actors_ids = self._params_to_ints(user)
                 queryset = queryset.filter(user__id__in=actors_ids)
         else:
-            queryset = Borrowing.objects.filter(user=self.request.user)
+            queryset = self.queryset.filter(user=self.request.user)
+
+        if self.action == "list":
+            # The list shows payment totals, not the payments themselves.
+            queryset = (
+                queryset.select_related("book")
+                .with_payment_summary()
+                .order_by("id")
+            )
+        elif self.action == "retrieve":
+            queryset = queryset.select_related("book").prefetch_related(
+                "payments"
+            )
 
         if is_active:
-            return queryset.filter(is_active=is_active)
+            is_active = serializers.BooleanField().to_internal_value(
+                is_active
+            )
+            # "is_active IN (...)" is an equality term SQLite can match
+            # against borrowing_user_active_idx; a bare boolean column
+            # is not.
+            return queryset.filter(is_active__in=[is_active])
         return queryset
 
     def get_serializer_class(self) -> Type[
@@ -76,6 +127,8 @@ class BorrowingListViewSet(
         | BorrowingDetailSerializer
         | BorrowingCreateSerializer
         | BorrowingSerializer
+        | BorrowingBulkReturnSerializer
+        | BorrowingCartSerializer
     ]:
         if self.action == "list":
             return BorrowingListSerializer
@@ -83,9 +136,21 @@ class BorrowingListViewSet(
             return BorrowingDetailSerializer
         if self.action == "create":
             return BorrowingCreateSerializer
+        if self.action == "bulk_return":
+            return BorrowingBulkReturnSerializer
+        if self.action == "cart":
+            return BorrowingCartSerializer
 
         return BorrowingSerializer
 
+    def get_throttles(self) -> list[UserBucketThrottle]:
+        # Borrowing opens Stripe and Telegram calls, returning may too.
+        if self.action in ("create", "cart"):
+            return [BorrowThrottle()]
+        if self.action == "bulk_return":
+            return [ReturnThrottle()]
+        return super().get_throttles()
+
     @extend_schema(
         request=BorrowingCreateSerializer,
         responses={status.HTTP_201_CREATED: BorrowingSerializer},
@@ -101,14 +166,14 @@ class BorrowingListViewSet(
         )
 
     def perform_create(self, serializer: serializers) -> None:
-        with transaction.atomic():
+        with write_atomic():
             data = self.request.data
-            book = Books.objects.get(id=int(data["book"]))
-            book.inventory -= 1
-            book.save()
-            serializer.save(user=self.request.user)
-            create_checkout_session(serializer.data["id"], type_="PAYMENT")
-            send_to_telegram(
+            book = serializer.validated_data["book"]
+            if not Books.objects.take_copy(book.id):
+                Borrowing.validate_inventory(0, ValidationError)
+            borrowing = serializer.save(user=self.request.user)
+            record_payment(borrowing, type_="PAYMENT")
+            notify(
                 f"Borrowing №: {serializer.data['id']} "
                 f"Title: {book.title} Borrowing at:{datetime.now()}."
                 f" Expected return date: {data['expected_return_date']}"
@@ -133,27 +198,76 @@ class BorrowingListViewSet(
          and filtering by user id only for admin users"""
         return super().list(request)
 
+    @extend_schema(
+        request=BorrowingCartSerializer,
+        responses={status.HTTP_201_CREATED: BorrowingCartResultSerializer},
+    )
+    @action(detail=False, methods=["POST"])
+    def cart(self, request: Request) -> Response:
+        """Borrow several books at once and pay for them in one session"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        borrowings, payments = borrow_books(
+            request.user,
+            serializer.validated_data["books"],
+            serializer.validated_data["expected_return_date"],
+        )
+        result = BorrowingCartResultSerializer(
+            {"borrowings": borrowings, "payments": payments}
+        )
+        return Response(result.data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        request=BorrowingBulkReturnSerializer,
+        responses={
+            status.HTTP_200_OK: BorrowingReturnResultSerializer(many=True)
+        },
+    )
+    @action(
+        detail=False,
+        methods=["POST"],
+        url_path="return",
+    )
+    def bulk_return(self, request: Request) -> Response:
+        """Return several borrowings at once, reporting each one's outcome.
+
+        Staff can return any borrowing, other users only their own.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        queryset = Borrowing.objects.all()
+        if not request.user.is_staff:
+            queryset = queryset.filter(user=request.user)
+        results = return_borrowings(
+            queryset, serializer.validated_data["ids"]
+        )
+        return Response(
+            BorrowingReturnResultSerializer(results, many=True).data
+        )
+
 
 @extend_schema(responses={status.HTTP_200_OK: BorrowingDetailSerializer})
 @api_view(["POST"])
+@throttle_classes([ReturnThrottle])
 def return_borrowing(request: Request, pk: int) -> Response:
-    with transaction.atomic():
-        borrowing = get_object_or_404(Borrowing, id=pk)
-        if borrowing.is_active:
-            book = borrowing.book
-            book.inventory += 1
-            book.save()
-            borrowing.actual_return_date = datetime.now()
-            aware_actual_return_date = timezone.make_aware(
-                borrowing.actual_return_date
-            )
+    with write_atomic():
+        borrowing = get_object_or_404(
+            Borrowing.objects.select_related("book"), id=pk
+        )
+        actual_return_date = timezone.now()
+        returned = Borrowing.objects.filter(id=pk, is_active=True).update(
+            is_active=False, actual_return_date=actual_return_date
+        )
+        if returned:
+            Books.objects.return_copy(borrowing.book_id)
+            borrowing.book.inventory += 1
+            borrowing.actual_return_date = actual_return_date
             borrowing.is_active = False
 
-            borrowing.save()
             serializer = BorrowingDetailSerializer(borrowing)
-            if aware_actual_return_date > borrowing.expected_return_date:
-                create_checkout_session(borrowing.pk, type_="FINE")
-            send_to_telegram(
+            if actual_return_date > borrowing.expected_return_date:
+                record_payment(borrowing, type_="FINE")
+            notify(
                 f"Borrowing №: {borrowing.id},"
                 f" Title: {borrowing.book} was returned"
                 f" at: {borrowing.actual_return_date}"
@@ -166,17 +280,34 @@ def return_borrowing(request: Request, pk: int) -> Response:
 
 
 class PaymentsViewSet(
+    StreamingExportMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     GenericViewSet,
 ):
     queryset = Payment.objects.all()
-    pagination_class = StandardResultsSetPagination
+    pagination_class = StandardOrKeysetPagination
+    export_fields = (
+        "id",
+        "status",
+        "type",
+        "borrowing_id",
+        "session_url",
+        "session_id",
+        "money_to_pay",
+    )
 
     def get_queryset(self) -> QuerySet:
         queryset = self.queryset
         if self.request.user.is_staff is False:
             queryset = self.queryset.filter(borrowing__user=self.request.user)
+        if self.action == "retrieve":
+            # The nested borrowing shows its book and every payment.
+            queryset = queryset.select_related(
+                "borrowing__book"
+            ).prefetch_related("borrowing__payments")
+        elif self.action == "pay":
+            queryset = queryset.select_related("checkout")
         return queryset
 
     def get_serializer_class(
@@ -186,62 +317,23 @@ class PaymentsViewSet(
             return PaymentsListSerializer
         if self.action == "retrieve":
             return PaymentsDetailSerializer
+        if self.action == "pay":
+            return PaymentCheckoutSerializer
         return PaymentsSerializer
 
+    @extend_schema(
+        request=None,
+        responses={status.HTTP_200_OK: PaymentCheckoutSerializer},
+    )
+    @action(detail=True, methods=["POST"])
+    def pay(self, request: Request, pk: int = None) -> Response:
+        """Open the Stripe checkout session of a pending payment.
 
-def calculate_price(pk: int, type_: str) -> int:
-    borrowing = Borrowing.objects.get(id=pk)
-    price = borrowing.book.daily_fee
-    expected_return_date = borrowing.expected_return_date
-    if type_ == "PAYMENT":
-        actual_date = borrowing.borrow_date
-        delta = expected_return_date - actual_date
-        number_of_days = delta.days
-        return number_of_days * price * 100
-    elif type_ == "FINE":
-        actual_date = borrowing.actual_return_date
-        delta = actual_date - expected_return_date
-        number_of_days = delta.days
-        return number_of_days * price * 2 * 100
-
-
-def create_checkout_session(pk: int, type_: str) -> Response:
-    borrowing = Borrowing.objects.get(id=pk)
-    price = calculate_price(pk, type_)
-    LOCAL_DOMAIN = "http://127.0.0.1:8000/"
-    try:
-        stripe.api_key = os.environ.get("STRIPE_SECRET_KEY")
-        checkout_session = stripe.checkout.Session.create(
-            line_items=[
-                {
-                    "price_data": {
-                        "currency": "usd",
-                        "unit_amount_decimal": price,
-                        "product_data": {
-                            "name": borrowing.book.title,
-                            "description": f"Author: {borrowing.book.author}",
-                        },
-                    },
-                    "quantity": 1,
-                }
-            ],
-            mode="payment",
-            success_url=LOCAL_DOMAIN
-            + "api/borrowings/success?session_id={CHECKOUT_SESSION_ID}",
-            cancel_url=LOCAL_DOMAIN + "api/borrowings/canceled/",
-        )
-        Payment.objects.create(
-            borrowing=borrowing,
-            session_url=checkout_session.url,
-            session_id=checkout_session.stripe_id,
-            type=type_,
-            money_to_pay=checkout_session.amount_total,
-        )
-    except Exception as e:
-        return Response(
-            {"error": str(e)},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+        The session is reused until it is about to expire and then
+        replaced, so the returned session_url can always be paid.
+        """
+        payment = checkout_session(self.get_object())
+        return Response(self.get_serializer(payment).data)
 
 
 @extend_schema(
@@ -251,20 +343,38 @@ def create_checkout_session(pk: int, type_: str) -> Response:
 )
 @api_view(["GET"])
 def order_success(request: Request) -> redirect:
-    session = stripe.checkout.Session.retrieve(
-        request.query_params["session_id"]
-    )
-    payment = Payment.objects.get(session_id=session.stripe_id)
-    payment.status = "PAID"
-    payment.save()
-    send_to_telegram(
-        f"Payment №{payment.id},"
-        f" Payment type: {payment.type},"
-        f" Amount: {payment.money_to_pay} result: Success"
-    )
+    # Payment status is updated by the Stripe webhook, so the redirect
+    # only checks that the session is one of ours.
+    session_id = request.query_params.get("session_id", "")
+    if not session_id or not Payment.objects.filter(
+        session_id=session_id
+    ).exists():
+        raise NotFound("Unknown checkout session.")
     return redirect("borrowing:borrowing-list")
 
 
+@extend_schema(
+    description="Stripe webhook receiving checkout.session.completed,"
+                " checkout.session.expired and the"
+                " checkout.session.async_payment_* events",
+    request=OpenApiTypes.OBJECT,
+    responses={status.HTTP_200_OK: None},
+)
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def stripe_webhook(request: Request) -> Response:
+    try:
+        receive_event(
+            request.body, request.headers.get("Stripe-Signature", "")
+        )
+    except InvalidWebhook as error:
+        return Response(
+            {"detail": str(error)}, status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(status=status.HTTP_200_OK)
+
+
 @extend_schema(
     description="return payment paused message,"
                 " if customer don`t want continue paid,"
@@ -275,6 +385,18 @@ def order_success(request: Request) -> redirect:
 def order_canceled(request: Request) -> HttpResponse:
     cancel_message = (
         "Payment can be paid a bit later,"
-        " but the session is available for only 24 hours."
+        " a new session is opened from the payment's pay link"
+        " once this one expires."
     )
     return HttpResponse(cancel_message)
+
+
+@extend_schema(
+    description="latency and error counters of outbound integrations"
+                " for the worker process serving the request",
+    methods=["GET"],
+)
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def integrations_status(request: Request) -> Response:
+    return Response(integration_stats())
@@ -0,0 +1,217 @@
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from borrowings.models import Payment, StripeEvent
+from borrowings.notification import notify_many
+
+logger = logging.getLogger(__name__)
+
+SESSION_COMPLETED = "checkout.session.completed"
+SESSION_EXPIRED = "checkout.session.expired"
+SESSION_ASYNC_SUCCEEDED = "checkout.session.async_payment_succeeded"
+SESSION_ASYNC_FAILED = "checkout.session.async_payment_failed"
+HANDLED_EVENTS = (
+    SESSION_COMPLETED,
+    SESSION_EXPIRED,
+    SESSION_ASYNC_SUCCEEDED,
+    SESSION_ASYNC_FAILED,
+)
+# Events that can settle a payment, if the session reports it paid.
+# "unpaid" completions wait for an async payment method and are left
+# pending until its async_payment_succeeded event.
+PAYING_EVENTS = (SESSION_COMPLETED, SESSION_ASYNC_SUCCEEDED)
+# After these the session can no longer be paid.
+DEAD_SESSION_EVENTS = (SESSION_EXPIRED, SESSION_ASYNC_FAILED)
+PAID_STATUSES = ("paid", "no_payment_required")
+EVENT_LEASE = timedelta(minutes=2)
+EVENT_BATCH_SIZE = 1000
+APPLY_SCHEDULED_KEY = "borrowings:stripe-apply-scheduled"
+
+
+class InvalidWebhook(Exception):
+    pass
+
+
+class WebhookNotConfigured(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Stripe webhooks are not configured."
+    default_code = "webhook_not_configured"
+
+
+def sign_payload(
+    payload: bytes, secret: str, timestamp: int | None = None
+) -> str:
+    """Build a ``Stripe-Signature`` header the way Stripe signs webhooks"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signed = f"{timestamp}.".encode() + payload
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def checkout_event(
+    type_: str, session_id: str, payment_status: str = "paid"
+) -> dict:
+    """Minimal checkout session event as Stripe sends it"""
+    return {
+        "id": f"evt_{uuid.uuid4().hex}",
+        "object": "event",
+        "type": type_,
+        "created": int(time.time()),
+        "data": {
+            "object": {
+                "id": session_id,
+                "object": "checkout.session",
+                "payment_status": payment_status,
+            }
+        },
+    }
+
+
+def receive_event(
+    payload: bytes, signature: str, wake_worker: bool = True
+) -> bool:
+    """Verify and store a webhook event; return whether it was new.
+
+    Only the signature HMAC, a JSON parse and one INSERT happen on the
+    request path. A redelivered event fails the unique event id and is
+    dropped; stored events are applied later by ``apply_pending_events``.
+    Without STRIPE_WEBHOOK_SECRET nothing can be verified, so every
+    event is refused rather than accepted unsigned.
+    """
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        raise WebhookNotConfigured()
+    try:
+        stripe.WebhookSignature.verify_header(
+            payload.decode(),
+            signature,
+            settings.STRIPE_WEBHOOK_SECRET,
+            settings.STRIPE_WEBHOOK_TOLERANCE,
+        )
+        event = json.loads(payload)
+    except (stripe.error.SignatureVerificationError, ValueError) as error:
+        raise InvalidWebhook(str(error))
+
+    if event.get("type") not in HANDLED_EVENTS:
+        return False
+    session = event["data"]["object"]
+    try:
+        with transaction.atomic():
+            StripeEvent.objects.create(
+                event_id=event["id"],
+                type=event["type"],
+                session_id=session["id"],
+                payment_status=session.get("payment_status") or "",
+            )
+    except IntegrityError:
+        return False
+    if wake_worker:
+        transaction.on_commit(_schedule_apply)
+    return True
+
+
+def _schedule_apply() -> None:
+    from borrowings.tasks import apply_stripe_events
+
+    # Events arriving within one window are applied by a single task.
+    window = settings.STRIPE_EVENT_BATCH_WINDOW
+    if not cache.add(APPLY_SCHEDULED_KEY, True, window):
+        return
+    try:
+        apply_stripe_events.apply_async(countdown=window)
+    except Exception as error:
+        cache.delete(APPLY_SCHEDULED_KEY)
+        # The periodic run applies the event once the broker is back.
+        logger.warning("Could not schedule Stripe event worker: %s", error)
+
+
+def _claim_events(limit: int) -> QuerySet[StripeEvent]:
+    """Lease up to ``limit`` pending events and return them"""
+    now = timezone.now()
+    claim = uuid.uuid4().hex
+    claimable = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    pending = list(
+        StripeEvent.objects.filter(claimable, processed_at__isnull=True)
+        .order_by("id")
+        .values_list("id", flat=True)[:limit]
+    )
+    StripeEvent.objects.filter(
+        claimable, id__in=pending, processed_at__isnull=True
+    ).update(claim=claim, locked_until=now + EVENT_LEASE)
+    return StripeEvent.objects.filter(id__in=pending, claim=claim)
+
+
+def settle_payments(paid: list[tuple], expired: set[str]) -> None:
+    """Mark ``paid`` (id, type, amount) payments paid, drop ``expired``.
+
+    Two UPDATEs and one notification INSERT whatever the batch size.
+    Only pending payments are touched; those whose session expired or
+    whose async payment failed stay due and get a fresh session when
+    paid again.
+    """
+    pending = Payment.objects.filter(status=Payment.Status.PENDING)
+    pending.filter(id__in=[row[0] for row in paid]).update(
+        status=Payment.Status.PAID
+    )
+    pending.filter(session_id__in=expired).update(
+        session_url="", session_id=""
+    )
+    notify_many(
+        [
+            f"Payment №{payment_id},"
+            f" Payment type: {type_},"
+            f" Amount: {money_to_pay} result: Success"
+            for payment_id, type_, money_to_pay in paid
+        ]
+    )
+
+
+def apply_pending_events(limit: int = EVENT_BATCH_SIZE) -> int:
+    """Apply a batch of stored events to their payments.
+
+    A batch costs a fixed number of statements: paid and expired
+    sessions each become one UPDATE of the pending payments they cover.
+    Returns the number of events applied.
+    """
+    claimed = _claim_events(limit)
+    events = list(
+        claimed.values_list("id", "type", "session_id", "payment_status")
+    )
+    if not events:
+        return 0
+    paid = {
+        session_id
+        for _, type_, session_id, payment_status in events
+        if type_ in PAYING_EVENTS and payment_status in PAID_STATUSES
+    }
+    expired = {
+        session_id
+        for _, type_, session_id, _ in events
+        if type_ in DEAD_SESSION_EVENTS
+    } - paid
+
+    with transaction.atomic():
+        pending = Payment.objects.filter(status=Payment.Status.PENDING)
+        settle_payments(
+            list(
+                pending.filter(session_id__in=paid).values_list(
+                    "id", "type", "money_to_pay"
+                )
+            ),
+            expired,
+        )
+        claimed.update(processed_at=timezone.now(), locked_until=None)
+    return len(events)
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.db import transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+
+from Library_Service_Project.cache import TieredCache
+from users.revocation import token_revoked
+
+# What permissions and querysets read from request.user. Anything else,
+# the password hash included, is deferred and loaded on first access.
+CACHED_USER_FIELDS = (
+    "id",
+    "email",
+    "first_name",
+    "last_name",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+)
+
+user_cache = TieredCache(local_timeout=settings.AUTH_USER_LOCAL_CACHE_TIMEOUT)
+
+
+def user_cache_key(user_id) -> str:
+    return f"auth-user:{user_id}"
+
+
+def user_changed(user_id) -> None:
+    """Forget the cached user, now and once the transaction commits"""
+    key = user_cache_key(user_id)
+    user_cache.delete(key)
+    transaction.on_commit(lambda: user_cache.delete(key))
+
+
+class RevocableJWTAuthentication(JWTAuthentication):
+    """JWT authentication refusing tokens revoked before they expire"""
+
+    def get_validated_token(self, raw_token: bytes) -> Token:
+        validated_token = super().get_validated_token(raw_token)
+        if token_revoked(validated_token):
+            raise InvalidToken("Token has been revoked")
+        return validated_token
+
+
+class CachedJWTAuthentication(RevocableJWTAuthentication):
+    """JWT authentication resolving the user from a short-lived cache.
+
+    The verified token names the user and the cache holds the fields in
+    ``CACHED_USER_FIELDS``, so authenticated requests do not query the
+    users table until the entry expires or the user is saved. The user
+    is a partial instance: views that save it should keep
+    ``RevocableJWTAuthentication``.
+    """
+
+    def get_user(self, validated_token: Token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                "Token contained no recognizable user identification"
+            )
+        key = user_cache_key(user_id)
+        values = user_cache.get(key)
+        if values is None:
+            user = super().get_user(validated_token)
+            values = {
+                field: getattr(user, field) for field in CACHED_USER_FIELDS
+            }
+            user_cache.set(key, values, settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+        # from_db() expects the values in the model's field order.
+        names = [
+            field.attname
+            for field in self.user_model._meta.concrete_fields
+            if field.attname in values
+        ]
+        return self.user_model.from_db(
+            "default", names, [values[name] for name in names]
+        )
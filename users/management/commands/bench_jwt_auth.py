@@ -0,0 +1,115 @@
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users import revocation
+from users.authentication import CachedJWTAuthentication
+from users.revocation import revocation_list
+
+
+class UnrevocableAuthentication(CachedJWTAuthentication):
+    def get_validated_token(self, raw_token: bytes):
+        return JWTAuthentication.get_validated_token(self, raw_token)
+
+
+class StoreLookupAuthentication(CachedJWTAuthentication):
+    """Asks the store about every token, as if there were no filter"""
+
+    def get_validated_token(self, raw_token: bytes):
+        token = JWTAuthentication.get_validated_token(self, raw_token)
+        revocation_list().store.contains(token[api_settings.JTI_CLAIM])
+        return token
+
+
+MODES = {
+    "db": JWTAuthentication,
+    "cached": UnrevocableAuthentication,
+    "revocable": CachedJWTAuthentication,
+    "store_lookup": StoreLookupAuthentication,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Report the per-request cost of JWT authentication: with the"
+        " user read from the database, from the cache, from the cache"
+        " behind the revocation filter, and with a store lookup on every"
+        " request. Revokes --revoked random token ids first and creates"
+        " a throwaway user that is deleted afterwards."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--requests", type=int, default=20_000)
+        parser.add_argument("--revoked", type=int, default=10_000)
+        parser.add_argument("--tokens", type=int, default=100)
+        parser.add_argument(
+            "--store",
+            choices=("local", "redis"),
+            default="local",
+            help="where revoked token ids are kept",
+        )
+
+    def handle(self, *args, **options) -> None:
+        user = get_user_model().objects.create_user(
+            f"bench-{time.time_ns()}@example.com", "benchpass"
+        )
+        try:
+            with override_settings(JWT_REVOCATION_STORE=options["store"]):
+                revocation._lists.pop(options["store"], None)
+                self._run(user, options)
+                revocation._lists.pop(options["store"], None)
+        finally:
+            user.delete()
+
+    def _run(self, user, options) -> None:
+        revoked = revocation_list()
+        # Long enough for the run, short enough to drop out of Redis soon.
+        expires_at = time.time() + 600
+        started = time.perf_counter()
+        for _ in range(options["revoked"]):
+            revoked.revoke(uuid.uuid4().hex, expires_at)
+        self.stdout.write(
+            f"revoked {options['revoked']} token ids in"
+            f" {time.perf_counter() - started:.2f}s"
+            f" store={options['store']}"
+        )
+        factory = APIRequestFactory()
+        requests = [
+            factory.get(
+                "/", HTTP_AUTHORIZE=f"Bearer {AccessToken.for_user(user)}"
+            )
+            for _ in range(options["tokens"])
+        ]
+
+        for mode, authentication_class in MODES.items():
+            authentication = authentication_class()
+            # The first round warms the user cache and the filter.
+            for request in requests:
+                authentication.authenticate(request)
+            lookups = revoked.lookups
+            timings = []
+            with CaptureQueriesContext(connection) as queries:
+                for index in range(options["requests"]):
+                    request = requests[index % len(requests)]
+                    began = time.perf_counter()
+                    authentication.authenticate(request)
+                    timings.append((time.perf_counter() - began) * 1e6)
+            timings.sort()
+            self.stdout.write(
+                f"{mode:>12}: mean={statistics.fmean(timings):.1f}us"
+                f" p50={statistics.median(timings):.1f}us"
+                f" p99={timings[int(len(timings) * 0.99) - 1]:.1f}us"
+                f" queries/request="
+                f"{len(queries.captured_queries) / len(timings):.2f}"
+                f" filter_hits={revoked.lookups - lookups}"
+            )
@@ -0,0 +1,232 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from redis.exceptions import RedisError
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+
+from Library_Service_Project.cache import shared_redis
+
+logger = logging.getLogger(__name__)
+
+# Sorted set of revoked jtis scored by their token's expiry, and a
+# counter bumped on every revocation so workers know when to re-sync.
+REVOKED_KEY = "jwt:revoked"
+VERSION_KEY = "jwt:revoked:version"
+STORE_ERRORS = (RedisError, OSError)
+
+
+class RevocationUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Tokens cannot be revoked right now, please retry."
+    default_code = "revocation_unavailable"
+
+
+class BloomFilter:
+    """Fixed-size set of strings answering "maybe" or "certainly not".
+
+    Sized for ``capacity`` members with ``error_rate`` false positives;
+    a member that was added is always found.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        capacity = max(capacity, 1)
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, member: str):
+        digest = hashlib.blake2b(member.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        return (
+            (first + index * step) % self.size
+            for index in range(self.hashes)
+        )
+
+    def add(self, member: str) -> None:
+        for position in self._positions(member):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, member: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(member)
+        )
+
+
+class LocalRevocationStore:
+    """Revoked jtis of this process only, for tests and single workers"""
+
+    def __init__(self) -> None:
+        self._revoked: dict[str, float] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def add(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._version += 1
+
+    def contains(self, jti: str) -> bool:
+        return self._revoked.get(jti, 0) > time.time()
+
+    def version(self) -> int:
+        return self._version
+
+    def members(self) -> list[str]:
+        now = time.time()
+        with self._lock:
+            self._revoked = {
+                member: expiry
+                for member, expiry in self._revoked.items()
+                if expiry > now
+            }
+            return list(self._revoked)
+
+
+class RedisRevocationStore:
+    """Revoked jtis shared by every worker, dropped once they expire"""
+
+    @property
+    def client(self):
+        return shared_redis()
+
+    def add(self, jti: str, expires_at: float) -> None:
+        pipe = self.client.pipeline()
+        pipe.zadd(REVOKED_KEY, {jti: expires_at})
+        pipe.zremrangebyscore(REVOKED_KEY, "-inf", time.time())
+        pipe.incr(VERSION_KEY)
+        pipe.execute()
+
+    def contains(self, jti: str) -> bool:
+        expires_at = self.client.zscore(REVOKED_KEY, jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def version(self) -> int:
+        return int(self.client.get(VERSION_KEY) or 0)
+
+    def members(self) -> list[str]:
+        return [
+            member.decode()
+            for member in self.client.zrangebyscore(
+                REVOKED_KEY, time.time(), "+inf"
+            )
+        ]
+
+
+class RevocationList:
+    """Revoked token ids with a per-process Bloom filter in front.
+
+    The filter holds every revoked jti known at the last sync, so a token
+    it does not contain passes without asking the store; the rest, false
+    positives included, are confirmed with the store. The filter is
+    synced at most every ``sync_interval`` seconds, which costs one
+    version read unless something was revoked meanwhile, so a token
+    revoked by another worker is rejected here within that interval.
+    """
+
+    def __init__(
+        self,
+        store,
+        sync_interval: float,
+        capacity: int,
+        error_rate: float,
+    ) -> None:
+        self.store = store
+        self.sync_interval = sync_interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.lookups = 0
+        self.rebuilds = 0
+        self._filter = BloomFilter(capacity, error_rate)
+        self._version = None
+        self._synced_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def sync(self, force: bool = False) -> None:
+        if not force and (
+            time.monotonic() - self._synced_at < self.sync_interval
+        ):
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._synced_at < self.sync_interval:
+                return
+            self._synced_at = now
+            try:
+                version = self.store.version()
+                if version == self._version:
+                    return
+                members = self.store.members()
+            except STORE_ERRORS as error:
+                logger.warning("Revocation list sync failed: %s", error)
+                return
+            bloom = BloomFilter(
+                max(self.capacity, 2 * len(members)), self.error_rate
+            )
+            for member in members:
+                bloom.add(member)
+            self._filter, self._version = bloom, version
+            self.rebuilds += 1
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        try:
+            self.store.add(jti, expires_at)
+        except STORE_ERRORS as error:
+            logger.warning("Token revocation failed: %s", error)
+            raise RevocationUnavailable()
+        self._filter.add(jti)
+
+    def is_revoked(self, jti: str) -> bool:
+        self.sync()
+        if jti not in self._filter:
+            return False
+        self.lookups += 1
+        try:
+            return self.store.contains(jti)
+        except STORE_ERRORS as error:
+            # The filter says it may be revoked and nobody can tell
+            # otherwise, so the token is refused.
+            logger.warning("Revocation lookup failed: %s", error)
+            return True
+
+
+_lists: dict[str, RevocationList] = {}
+_lists_lock = threading.Lock()
+
+
+def revocation_list() -> RevocationList:
+    """The process-wide list for the ``JWT_REVOCATION_STORE`` in use"""
+    name = settings.JWT_REVOCATION_STORE
+    if name not in _lists:
+        with _lists_lock:
+            if name not in _lists:
+                if name == "local":
+                    store = LocalRevocationStore()
+                else:
+                    store = RedisRevocationStore()
+                _lists[name] = RevocationList(
+                    store,
+                    settings.JWT_REVOCATION_SYNC_INTERVAL,
+                    settings.JWT_REVOCATION_FILTER_CAPACITY,
+                    settings.JWT_REVOCATION_FILTER_ERROR_RATE,
+                )
+    return _lists[name]
+
+
+def revoke_token(token: Token) -> None:
+    revocation_list().revoke(token[api_settings.JTI_CLAIM], token["exp"])
+
+
+def token_revoked(token: Token) -> bool:
+    jti = token.get(api_settings.JTI_CLAIM)
+    return jti is not None and revocation_list().is_revoked(jti)
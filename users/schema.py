@@ -0,0 +1,9 @@
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+
+
+class RevocableJWTScheme(SimpleJWTScheme):
+    """Document the project's JWT authentications as the jwtAuth scheme"""
+
+    target_class = "users.authentication.RevocableJWTAuthentication"
+    # CachedJWTAuthentication, the default, subclasses it.
+    match_subclasses = True
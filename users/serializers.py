@@ -1,5 +1,13 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import (
+    TokenRefreshSerializer,
+    TokenVerifySerializer,
+)
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
+
+from users.revocation import token_revoked
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -22,3 +30,39 @@ class UserSerializer(serializers.ModelSerializer):
             user.save()
 
         return user
+
+
+class TokenField(serializers.CharField):
+    """A signed, unexpired JWT, returned as its token object"""
+
+    def __init__(self, token_class=UntypedToken, **kwargs) -> None:
+        self.token_class = token_class
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            return self.token_class(super().to_internal_value(data))
+        except TokenError as error:
+            raise serializers.ValidationError(str(error))
+
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = TokenField(token_class=RefreshToken, required=False)
+
+
+class RevokeTokenSerializer(serializers.Serializer):
+    token = TokenField()
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs: dict) -> dict:
+        if token_revoked(self.token_class(attrs["refresh"])):
+            raise TokenError("Token has been revoked")
+        return super().validate(attrs)
+
+
+class RevocableTokenVerifySerializer(TokenVerifySerializer):
+    def validate(self, attrs: dict) -> dict:
+        if token_revoked(UntypedToken(attrs["token"])):
+            raise TokenError("Token has been revoked")
+        return super().validate(attrs)
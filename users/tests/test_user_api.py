@@ -1,14 +1,34 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
-from rest_framework.test import APIClient
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from rest_framework.test import APIClient, APIRequestFactory
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from Library_Service_Project.throttling import local_buckets
+from users import revocation
+from users.authentication import (
+    CachedJWTAuthentication,
+    RevocableJWTAuthentication,
+)
+from users.revocation import (
+    BloomFilter,
+    LocalRevocationStore,
+    RevocationList,
+)
 
 
 CREATE_USER_URL = reverse("users:create")
 TOKEN_URL = reverse("users:token_obtain_pair")
 ME_URL = reverse("users:manage")
+REFRESH_URL = reverse("users:token_refresh")
+VERIFY_URL = reverse("users:token_verify")
+REVOKE_URL = reverse("users:token_revoke")
+LOGOUT_URL = reverse("users:logout")
 
 
 def create_user(**params):
@@ -44,6 +64,58 @@ class UnauthenticatedUserApiTests(TestCase):
         self.assertIn("access", res.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    def test_create_token_throttled_per_ip(self):
+        """Test that token requests from one IP are limited"""
+        self.addCleanup(local_buckets.clear)
+        payload = {"email": "test@test.com", "password": "test123"}
+        rates = {**settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]}
+        rates["token"] = "1/min"
+        with override_settings(
+            CACHE_REDIS_URL="redis://127.0.0.1:1",
+            REST_FRAMEWORK={
+                **settings.REST_FRAMEWORK,
+                "DEFAULT_THROTTLE_RATES": rates,
+            }
+        ):
+            first = self.client.post(TOKEN_URL, payload)
+            second = self.client.post(TOKEN_URL, payload)
+            other_ip = self.client.post(
+                TOKEN_URL, payload, REMOTE_ADDR="10.0.0.2"
+            )
+
+        self.assertEqual(first.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(
+            second.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(other_ip.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_throttle_ignores_spoofed_forwarded_for(self):
+        self.addCleanup(local_buckets.clear)
+        payload = {"email": "test@test.com", "password": "test123"}
+        rates = {**settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]}
+        rates["token"] = "2/min"
+        with override_settings(
+            CACHE_REDIS_URL="redis://127.0.0.1:1",
+            REST_FRAMEWORK={
+                **settings.REST_FRAMEWORK,
+                "DEFAULT_THROTTLE_RATES": rates,
+            },
+        ):
+            responses = [
+                self.client.post(
+                    TOKEN_URL, payload, HTTP_X_FORWARDED_FOR=f"10.1.0.{n}"
+                )
+                for n in range(3)
+            ]
+
+        self.assertEqual(
+            [res.status_code for res in responses],
+            [
+                status.HTTP_401_UNAUTHORIZED,
+                status.HTTP_401_UNAUTHORIZED,
+                status.HTTP_429_TOO_MANY_REQUESTS,
+            ],
+        )
 
     def test_create_token_no_user(self):
         """Test that token is not created if user doesn't exist"""
@@ -159,4 +231,135 @@ class AuthenticatedUserApiTests(TestCase):
 
         res = self.client.post(CREATE_USER_URL, payload)
 
-        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(JWT_REVOCATION_STORE="local")
+class CachedJWTAuthenticationTests(TestCase):
+    """Test resolving the token's user from the cache"""
+
+    def setUp(self):
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        self.user = create_user(email="test@test.com", password="testpass")
+        self.header = f"Bearer {AccessToken.for_user(self.user)}"
+
+    def authenticate(self):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZE=self.header)
+        user, _ = CachedJWTAuthentication().authenticate(request)
+        return user
+
+    def test_documented_as_jwt_scheme(self):
+        for authentication in (
+            CachedJWTAuthentication(),
+            RevocableJWTAuthentication(),
+        ):
+            scheme = OpenApiAuthenticationExtension.get_match(authentication)
+            self.assertEqual(scheme.name, "jwtAuth")
+
+    def test_cached_user_needs_no_query(self):
+        self.authenticate()
+
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.email, self.user.email)
+        self.assertFalse(user.is_staff)
+
+    def test_saving_user_drops_cached_user(self):
+        self.authenticate()
+        self.user.is_staff = True
+        self.user.save()
+
+        self.assertTrue(self.authenticate().is_staff)
+
+    def test_update_profile_with_token(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZE=self.header)
+        client.get(ME_URL)
+
+        res = client.patch(ME_URL, {"password": "newpassword123"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("newpassword123"))
+        self.assertEqual(self.user.email, "test@test.com")
+
+
+@override_settings(JWT_REVOCATION_STORE="local")
+class TokenRevocationTests(TestCase):
+    """Test revoking tokens before they expire"""
+
+    def setUp(self):
+        revocation._lists.clear()
+        self.addCleanup(revocation._lists.clear)
+        self.user = create_user(email="test@test.com", password="testpass")
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZE=f"Bearer {self.refresh.access_token}"
+        )
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        res = self.client.post(LOGOUT_URL, {"refresh": str(self.refresh)})
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            self.client.get(ME_URL).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        res = APIClient().post(REFRESH_URL, {"refresh": str(self.refresh)})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        res = APIClient().post(VERIFY_URL, {"token": str(self.refresh)})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke_only_own_tokens_unless_staff(self):
+        other = create_user(email="other@test.com", password="testpass")
+        token = str(AccessToken.for_user(other))
+
+        res = self.client.post(REVOKE_URL, {"token": token})
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        res = self.client.post(REVOKE_URL, {"token": token})
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        res = self.client.post(REVOKE_URL, {"token": "not-a-token"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(
+        JWT_REVOCATION_STORE="redis", CACHE_REDIS_URL="redis://127.0.0.1:1"
+    )
+    def test_revocation_store_unavailable(self):
+        with self.assertLogs("users.revocation", "WARNING"):
+            res = self.client.post(LOGOUT_URL)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    def test_filter_synced_from_shared_store(self):
+        store = LocalRevocationStore()
+        revoking = RevocationList(store, 0, 100, 0.01)
+        checking = RevocationList(store, 0, 100, 0.01)
+        self.assertFalse(checking.is_revoked("kept"))
+
+        revoking.revoke("gone", expires_at=2**40)
+        revoking.revoke("expired", expires_at=1)
+
+        self.assertTrue(checking.is_revoked("gone"))
+        self.assertFalse(checking.is_revoked("expired"))
+        self.assertFalse(checking.is_revoked("kept"))
+        self.assertEqual(checking.rebuilds, 2)
+
+    def test_bloom_filter_finds_every_member(self):
+        bloom = BloomFilter(1000, 0.01)
+        for number in range(1000):
+            bloom.add(f"jti-{number}")
+
+        self.assertTrue(all(f"jti-{n}" in bloom for n in range(1000)))
+        false_positives = sum(
+            f"other-{number}" in bloom for number in range(10000)
+        )
+        self.assertLess(false_positives, 300)
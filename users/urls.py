@@ -1,18 +1,26 @@
 from django.urls import path
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-    TokenVerifyView,
-)
+from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
 
-from users.views import CreateUserView, ManageUserView
+from users.views import (
+    CreateUserView,
+    LogoutView,
+    ManageUserView,
+    RevokeTokenView,
+    ThrottledTokenObtainPairView,
+)
 
 app_name = "users"
 
 urlpatterns = [
     path("", CreateUserView.as_view(), name="create"),
-    path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path(
+        "token/",
+        ThrottledTokenObtainPairView.as_view(),
+        name="token_obtain_pair",
+    ),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
+    path("token/revoke/", RevokeTokenView.as_view(), name="token_revoke"),
+    path("logout/", LogoutView.as_view(), name="logout"),
     path("me/", ManageUserView.as_view(), name="manage"),
 ]
@@ -1,8 +1,30 @@
-from rest_framework import generics
+from rest_framework import generics, status
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+from rest_framework_simplejwt.views import TokenObtainPairView
 
-from users.serializers import UserSerializer
+from Library_Service_Project.throttling import IPBucketThrottle
+from users.authentication import RevocableJWTAuthentication
+from users.revocation import revoke_token
+from users.serializers import (
+    LogoutSerializer,
+    RevokeTokenSerializer,
+    UserSerializer,
+)
+
+
+class TokenThrottle(IPBucketThrottle):
+    scope = "token"
+
+
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    """Token pair endpoint limited per client IP, as it hashes passwords"""
+
+    throttle_classes = (TokenThrottle,)
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -11,8 +33,45 @@ class CreateUserView(generics.CreateAPIView):
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (RevocableJWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):
         return self.request.user
+
+
+class LogoutView(generics.GenericAPIView):
+    """Revoke the access token of the request and the given refresh token"""
+
+    serializer_class = LogoutSerializer
+
+    def post(self, request: Request) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        refresh = serializer.validated_data.get("refresh")
+        if refresh is not None:
+            check_owner(request, refresh)
+            revoke_token(refresh)
+        if isinstance(request.auth, Token):
+            revoke_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class RevokeTokenView(generics.GenericAPIView):
+    """Revoke an access or refresh token of the user, or any for staff"""
+
+    serializer_class = RevokeTokenSerializer
+
+    def post(self, request: Request) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = serializer.validated_data["token"]
+        if not request.user.is_staff:
+            check_owner(request, token)
+        revoke_token(token)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def check_owner(request: Request, token: Token) -> None:
+    if token.get(api_settings.USER_ID_CLAIM) != request.user.pk:
+        raise PermissionDenied("The token belongs to another user.")